@@ -1,9 +1,12 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import Response, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from typing import List
+from typing import List, Optional
 import pandas as pd
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 # 导入本地模块
 # 假设从 'backend' 或根目录运行。如果在根目录，需要 'backend.models'。
@@ -13,24 +16,45 @@ from contextlib import asynccontextmanager
 
 try:
     from models import DetectionRequest, MaDetectionRequest, DetectionResponse, SignalResult
-    from services.indicators import get_market_data, calculate_dkx, check_dkx_signal, calculate_ma, check_ma_signal
+    from services.indicators import get_market_data, calculate_dkx, calculate_ma, signal_timeline
     from services.db import init_db, save_signal, get_history
     from services.metadata import search_symbols, get_symbol_name
     from services.export_service import create_export_zip, create_dkx_plot, create_ma_plot
+    from services import warmup, minute_archiver, live_updater, bar_validation, frame_cache, shared_bars
+    from services.source_registry import registry as source_registry
+    from services.fetch_scheduler import scheduler as fetch_scheduler
+    from services.time_index import format_times
     from routers import backtest, symbols
 except ImportError:
     # 如果从根目录运行，尝试绝对导入
     from backend.models import DetectionRequest, MaDetectionRequest, DetectionResponse, SignalResult
-    from backend.services.indicators import get_market_data, calculate_dkx, check_dkx_signal, calculate_ma, check_ma_signal
+    from backend.services.indicators import get_market_data, calculate_dkx, calculate_ma, signal_timeline
     from backend.services.db import init_db, save_signal, get_history
     from backend.services.metadata import search_symbols, get_symbol_name
     from backend.services.export_service import create_export_zip, create_dkx_plot, create_ma_plot
+    from backend.services import warmup, minute_archiver, live_updater, bar_validation, frame_cache, shared_bars
+    from backend.services.source_registry import registry as source_registry
+    from backend.services.fetch_scheduler import scheduler as fetch_scheduler
+    from backend.services.time_index import format_times
     from backend.routers import backtest, symbols
 
+# 信号检测的并发度 (同时处理的标的数)，可通过环境变量 DETECT_CONCURRENCY 配置
+DETECT_CONCURRENCY = max(1, int(os.environ.get('DETECT_CONCURRENCY', '8')))
+_detect_executor = ThreadPoolExecutor(max_workers=DETECT_CONCURRENCY, thread_name_prefix="detect")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    # 后台预热热门品种与指数成分股的行情缓存，不阻塞服务启动
+    warmup_task = asyncio.create_task(warmup.warmup_loop()) if warmup.WARMUP_ENABLED else None
+    # 定期归档期货分钟线，积累超出数据源窗口的历史
+    archive_task = asyncio.create_task(minute_archiver.archive_loop()) if minute_archiver.ARCHIVE_ENABLED else None
+    # 盘中按全市场快照更新已缓存股票的当前 K 线
+    live_task = asyncio.create_task(live_updater.live_update_loop()) if live_updater.LIVE_UPDATE_ENABLED else None
     yield
+    for task in (warmup_task, archive_task, live_task):
+        if task is not None:
+            task.cancel()
 
 app = FastAPI(title="Signal Monitor System API (信号监控系统 API)", lifespan=lifespan)
 
@@ -50,250 +74,317 @@ app.include_router(symbols.router, prefix="/api/symbols", tags=["symbols"])
 def read_root():
     return {"message": "Signal Monitor System API is running"}
 
+@app.get("/api/warmup")
+def get_warmup_progress():
+    """缓存预热进度"""
+    return warmup.get_progress()
+
+@app.get("/api/sources/health")
+def get_sources_health():
+    """各行情数据源的健康状态 (成功率、耗时分位数、熔断状态)"""
+    return source_registry.snapshot()
+
+@app.get("/api/sources/hedge")
+def get_sources_hedge_stats():
+    """对冲请求统计 (对冲触发比例、主/备数据源胜出次数)"""
+    return source_registry.hedge_stats()
+
+@app.get("/api/sources/scheduler")
+def get_fetch_scheduler_stats():
+    """上游请求调度统计 (各数据源的队列深度、各优先级的放行数与等待时长)"""
+    return fetch_scheduler.stats()
+
+@app.get("/api/quality")
+def get_data_quality(symbol: Optional[str] = None, market: Optional[str] = None):
+    """各标的行情数据的校验计数 (重复、修复、丢弃、交易时段外、缺口)"""
+    return bar_validation.get_quality(symbol, market)
+
+@app.get("/api/cache")
+def get_frame_cache_stats():
+    """进程内 K 线/指标缓存及多进程共享 K 线缓存的统计 (命中、未命中、淘汰、拒绝准入次数及内存占用)"""
+    return {**frame_cache.get_stats(), "shared": shared_bars.get_stats()}
+
+@app.get("/api/archive")
+def get_archive_status():
+    """期货分钟线归档状态 (各序列的本地历史范围)"""
+    return minute_archiver.get_status()
+
+@app.get("/api/live")
+def get_live_update_status():
+    """实时 K 线更新状态"""
+    return live_updater.get_status()
+
+@app.get("/api/live/signals")
+def get_live_signals(since: float = 0.0):
+    """盘中实时计算的 DKX / 双均线交叉事件 (需开启 LIVE_DKX_STREAMS 或 LIVE_MA_PAIRS)，since 为纪元秒"""
+    return live_updater.get_signal_events(since)
+
+@app.get("/api/ready")
+def readiness():
+    """
+    就绪探针。
+    
+    首轮缓存预热完成前返回 503，负载均衡据此暂缓向本节点转发流量。
+    """
+    progress = warmup.get_progress()
+    if not progress["ready"]:
+        return JSONResponse(status_code=503, content=progress)
+    return progress
+
+async def _run_per_symbol(symbols: List[str], worker, *args) -> list:
+    """
+    将逐标的处理分发到有界检测线程池并发执行。
+    
+    逻辑:
+        1. 每个标的的处理函数 (含阻塞的 akshare 调用) 在 _detect_executor 中运行，
+           事件循环只负责等待，可以继续响应其他请求。
+        2. 并发度由线程池大小 DETECT_CONCURRENCY 限制，避免对数据源造成突发压力。
+        3. asyncio.gather 按提交顺序返回结果，保证输出与 request.symbols 的顺序一致。
+    """
+    loop = asyncio.get_running_loop()
+    per_symbol = await asyncio.gather(*[
+        loop.run_in_executor(_detect_executor, worker, symbol, *args)
+        for symbol in symbols
+    ])
+    return [item for items in per_symbol for item in items]
+
 def format_date(dt):
     if isinstance(dt, pd.Timestamp) and dt.tzinfo is not None:
         dt = dt.tz_convert('Asia/Shanghai')
     return dt.strftime("%Y-%m-%d %H:%M:%S")
 
+def chart_records(chart_df: pd.DataFrame) -> List[dict]:
+    """图表数据: 每根 K 线一条记录，时间列向量化格式化为字符串"""
+    return chart_df.reset_index().assign(date=format_times(chart_df.index)).to_dict(orient='records')
+
+def _detect_dkx_symbol(symbol: str, request: DetectionRequest) -> List[SignalResult]:
+    """
+    单个标的的 DKX 信号检测 (同步阻塞函数，在检测线程池中执行)。
+    
+    返回该标的的信号结果列表；获取数据失败或无有效信号时返回空列表。
+    """
+    results = []
+    # 获取数据
+    # 注意: akshare 的代码通常需要检查 (例如: 深沪股票代码需要调整或确保正确)
+    # 我们假设用户提供了正确的代码或已在其他地方处理。
+    # stock_zh_a_hist 接受 6 位代码。
+
+    try:
+        df = get_market_data(symbol, request.market, request.period)
+        if df.empty:
+            return results
+        data_age = df.attrs.get('data_age', 0.0)
+
+        df = calculate_dkx(df)
+        # 最新信号与图表标记都在同一条信号时间线上二分查找 (见 signal_timeline)
+        timeline = signal_timeline(df, 'dkx')
+        latest_signal = timeline.latest(request.lookback, request.start_time, request.end_time)
+        signals = [latest_signal] if latest_signal else []
+
+        if request.lookback == 0:
+            if signals:
+                signals = [signals[-1]]
+            else:
+                last_row = df.iloc[-1]
+                current_signal = "BUY" if last_row['dkx'] > last_row['madkx'] else "SELL"
+                signals = [{
+                    "signal": current_signal,
+                    "date": format_date(last_row.name),
+                    "price": last_row['close'],
+                    "dkx": last_row['dkx'],
+                    "madkx": last_row['madkx'],
+                    "is_state": True,
+                    "offset": 0
+                }]
+        elif signals:
+            # 确保每个标的只返回最新的信号
+            latest_signal = signals[-1]
+
+            # 严格的时间窗口验证 (Strict Window Validation)
+            # 虽然时间线查询已按 lookback 过滤，但我们在此显式验证 offset
+            # 用户需求: 
+            # - 如果信号 offset >= lookback，排除它。
+            # - 边界处的信号 (offset < lookback) 被包含。
+            # 注意: offset 是基于末尾的 0-based 索引。offset 19 表示倒数第 20 根 K 线。
+            # 如果 lookback=20，我们接受 offset 0..19。
+            if latest_signal.get('offset') is not None and latest_signal['offset'] >= request.lookback:
+                 return results
+
+            signals = [latest_signal]
+
+        symbol_name = get_symbol_name(symbol, request.market)
+
+        for signal_info in signals:
+            # 准备结果
+            # 我们需要发送以信号为中心或相关范围的图表数据，
+            # 并在该范围内包含所有信号作为图表标记。
+
+            # 信号在 df 中的行号: offset 为距最后一根 K 线的根数 (状态信号为最后一根)
+            try:
+                loc = len(df) - 1 - signal_info['offset']
+
+                # 定义图表窗口: 增加范围 (用户需求)
+                # 向前 2000 根，向后 200 根，以确保有足够的历史数据
+                start_pos = max(0, loc - 2000)
+                end_pos = min(len(df), loc + 200)
+
+                # 确保最小长度
+                if end_pos - start_pos < 1000:
+                    start_pos = max(0, end_pos - 1000)
+
+                chart_df = df.iloc[start_pos:end_pos]
+                chart_data = chart_records(chart_df)
+
+                # 查找此图表窗口内的所有信号用于标记
+                chart_signals = timeline.in_rows(start_pos, end_pos)
+
+                # 如果主信号是 'State' 信号 (非交叉)，将其添加到 chart_signals 以便标记
+                if signal_info.get('is_state'):
+                     chart_signals.append(signal_info)
+
+            except Exception as ex:
+                print(f"Error preparing chart data: {ex}")
+                # 降级处理 (Fallback)
+                chart_data = chart_records(df.tail(300))
+                chart_signals = []
+
+            result = SignalResult(
+                symbol=symbol,
+                symbol_name=symbol_name,
+                date=format_date(pd.to_datetime(signal_info['date'])), # 确保格式
+                signal=signal_info['signal'],
+                close=signal_info['price'],
+                dkx=signal_info['dkx'],
+                madkx=signal_info['madkx'],
+                indicator="DKX",
+                offset=signal_info.get('offset'),
+                data_age=data_age,
+                details={
+                    "chart_data": chart_data,
+                    "chart_signals": chart_signals
+                }
+            )
+
+            # 保存到数据库
+            save_data = result.dict()
+            save_data['market'] = request.market
+            save_data['indicator_type'] = 'DKX'
+            save_signal(save_data)
+
+            results.append(result)
+
+    except Exception as e:
+        print(f"Error processing {symbol}: {e}")
+        return results
+
+    return results
+
 @app.post("/api/detect/dkx", response_model=DetectionResponse)
 async def detect_dkx(request: DetectionRequest):
-    results = []
-    
-    for symbol in request.symbols:
-        # 获取数据
-        # 注意: akshare 的代码通常需要检查 (例如: 深沪股票代码需要调整或确保正确)
-        # 我们假设用户提供了正确的代码或已在其他地方处理。
-        # stock_zh_a_hist 接受 6 位代码。
-        
-        try:
-            df = get_market_data(symbol, request.market, request.period)
-            if df.empty:
-                continue
-                
-            df = calculate_dkx(df)
-            signals = check_dkx_signal(df, request.lookback, request.start_time, request.end_time)
-            
-            if request.lookback == 0:
-                if signals:
-                    signals = [signals[-1]]
-                else:
-                    last_row = df.iloc[-1]
-                    current_signal = "BUY" if last_row['dkx'] > last_row['madkx'] else "SELL"
-                    signals = [{
-                        "signal": current_signal,
-                        "date": format_date(last_row.name),
-                        "price": last_row['close'],
-                        "dkx": last_row['dkx'],
-                        "madkx": last_row['madkx'],
-                        "is_state": True,
-                        "offset": 0
-                    }]
-            elif signals:
-                # 确保每个标的只返回最新的信号
-                latest_signal = signals[-1]
-                
-                # 严格的时间窗口验证 (Strict Window Validation)
-                # 虽然 check_dkx_signal 使用了 lookback，但我们在此显式验证 offset
-                # 用户需求: 
-                # - 如果信号 offset >= lookback，排除它。
-                # - 边界处的信号 (offset < lookback) 被包含。
-                # 注意: offset 是基于末尾的 0-based 索引。offset 19 表示倒数第 20 根 K 线。
-                # 如果 lookback=20，我们接受 offset 0..19。
-                if latest_signal.get('offset') is not None and latest_signal['offset'] >= request.lookback:
-                     continue
-                     
-                signals = [latest_signal]
-            
-            symbol_name = get_symbol_name(symbol, request.market)
-
-            for signal_info in signals:
-                # 准备结果
-                # 我们需要发送以信号为中心或相关范围的图表数据，
-                # 并在该范围内包含所有信号作为图表标记。
-                
-                # 在原始 df 中查找信号索引
-                try:
-                    sig_date = pd.to_datetime(signal_info['date'])
-                    # 如果 signal_info['date'] 来自 format_date，它是字符串。
-                    # pd.to_datetime 会将其转换为 naive (如果字符串本身是 naive)。
-                    # check_dkx_signal 使用 strftime，所以是字符串。
-                    # 我们需要在 df.index 中找到它。
-                    # 如果 df.index 是 naive，完美。
-                    # 如果 df.index 是 aware，我们可能需要匹配时区。
-                    
-                    if df.index.tz is not None and sig_date.tzinfo is None:
-                        sig_date = sig_date.tz_localize(df.index.tz)
-
-                    loc = df.index.get_loc(sig_date)
-                    if isinstance(loc, slice): loc = loc.start
-                    
-                    # 定义图表窗口: 增加范围 (用户需求)
-                    # 向前 2000 根，向后 200 根，以确保有足够的历史数据
-                    start_pos = max(0, loc - 2000)
-                    end_pos = min(len(df), loc + 200)
-                    
-                    # 确保最小长度
-                    if end_pos - start_pos < 1000:
-                        start_pos = max(0, end_pos - 1000)
-                    
-                    chart_df = df.iloc[start_pos:end_pos]
-                    chart_data = chart_df.reset_index().to_dict(orient='records')
-                    # 转换时间戳为字符串
-                    for item in chart_data:
-                        item['date'] = format_date(item['date'])
-                        
-                    # 查找此图表窗口内的所有信号用于标记
-                    c_start = format_date(chart_df.index[0])
-                    c_end = format_date(chart_df.index[-1])
-                    # 使用 lookback=0 查找范围内的所有信号
-                    chart_signals = check_dkx_signal(df, lookback=0, start_time=c_start, end_time=c_end)
-                    
-                    # 如果主信号是 'State' 信号 (非交叉)，将其添加到 chart_signals 以便标记
-                    if signal_info.get('is_state'):
-                         chart_signals.append(signal_info)
-                    
-                except Exception as ex:
-                    print(f"Error preparing chart data: {ex}")
-                    # 降级处理 (Fallback)
-                    chart_data = df.tail(300).reset_index().to_dict(orient='records')
-                    for item in chart_data:
-                        item['date'] = format_date(item['date'])
-                    chart_signals = []
-                
-                result = SignalResult(
-                    symbol=symbol,
-                    symbol_name=symbol_name,
-                    date=format_date(pd.to_datetime(signal_info['date'])), # 确保格式
-                    signal=signal_info['signal'],
-                    close=signal_info['price'],
-                    dkx=signal_info['dkx'],
-                    madkx=signal_info['madkx'],
-                    indicator="DKX",
-                    offset=signal_info.get('offset'),
-                    details={
-                        "chart_data": chart_data,
-                        "chart_signals": chart_signals
-                    }
-                )
-                
-                # 保存到数据库
-                save_data = result.dict()
-                save_data['market'] = request.market
-                save_data['indicator_type'] = 'DKX'
-                save_signal(save_data)
-                
-                results.append(result)
-                
-        except Exception as e:
-            print(f"Error processing {symbol}: {e}")
-            continue
-            
+    results = await _run_per_symbol(request.symbols, _detect_dkx_symbol, request)
     return DetectionResponse(results=results)
 
+def _detect_ma_symbol(symbol: str, request: MaDetectionRequest) -> List[SignalResult]:
+    """
+    单个标的的双均线信号检测 (同步阻塞函数，在检测线程池中执行)。
+    """
+    results = []
+    try:
+        df = get_market_data(symbol, request.market, request.period)
+        if df.empty:
+            return results
+        data_age = df.attrs.get('data_age', 0.0)
+
+        df = calculate_ma(df, request.short_period, request.long_period)
+        timeline = signal_timeline(df, 'ma')
+        latest_signal = timeline.latest(request.lookback, request.start_time, request.end_time)
+        signals = [latest_signal] if latest_signal else []
+
+        if request.lookback == 0:
+            if signals:
+                signals = [signals[-1]]
+            else:
+                last_row = df.iloc[-1]
+                current_signal = "BUY" if last_row['ma_short'] > last_row['ma_long'] else "SELL"
+                signals = [{
+                    "signal": current_signal,
+                    "date": format_date(last_row.name),
+                    "price": last_row['close'],
+                    "ma_short": last_row['ma_short'],
+                    "ma_long": last_row['ma_long'],
+                    "is_state": True,
+                    "offset": 0
+                }]
+        elif signals:
+            # 确保每个标的只返回最新的信号
+            latest_signal = signals[-1]
+
+            # 严格的时间窗口验证
+            if latest_signal.get('offset') is not None and latest_signal['offset'] >= request.lookback:
+                 return results
+
+            signals = [latest_signal]
+
+        symbol_name = get_symbol_name(symbol, request.market)
+
+        for signal_info in signals:
+            try:
+                loc = len(df) - 1 - signal_info['offset']
+
+                # 增加范围
+                start_pos = max(0, loc - 800)
+                end_pos = min(len(df), loc + 100)
+
+                if end_pos - start_pos < 300:
+                    start_pos = max(0, end_pos - 400)
+
+                chart_df = df.iloc[start_pos:end_pos]
+                chart_data = chart_records(chart_df)
+
+                chart_signals = timeline.in_rows(start_pos, end_pos)
+
+                if signal_info.get('is_state'):
+                     chart_signals.append(signal_info)
+
+            except Exception as ex:
+                print(f"Error preparing MA chart data: {ex}")
+                chart_data = chart_records(df.tail(300))
+                chart_signals = []
+
+            result = SignalResult(
+                symbol=symbol,
+                symbol_name=symbol_name,
+                date=format_date(pd.to_datetime(signal_info['date'])),
+                signal=signal_info['signal'],
+                close=signal_info['price'],
+                ma_short=signal_info['ma_short'],
+                ma_long=signal_info['ma_long'],
+                indicator="MA",
+                offset=signal_info.get('offset'),
+                data_age=data_age,
+                details={
+                    "chart_data": chart_data,
+                    "chart_signals": chart_signals
+                }
+            )
+
+            # 保存到数据库
+            save_data = result.dict()
+            save_data['market'] = request.market
+            save_data['indicator_type'] = 'MA'
+            save_signal(save_data)
+
+            results.append(result)
+
+    except Exception as e:
+        print(f"Error processing MA for {symbol}: {e}")
+        return results
+
+    return results
+
 @app.post("/api/detect/ma", response_model=DetectionResponse)
 async def detect_ma(request: MaDetectionRequest):
-    results = []
-    
-    for symbol in request.symbols:
-        try:
-            df = get_market_data(symbol, request.market, request.period)
-            if df.empty:
-                continue
-                
-            df = calculate_ma(df, request.short_period, request.long_period)
-            signals = check_ma_signal(df, request.lookback, request.start_time, request.end_time)
-            
-            if request.lookback == 0:
-                if signals:
-                    signals = [signals[-1]]
-                else:
-                    last_row = df.iloc[-1]
-                    current_signal = "BUY" if last_row['ma_short'] > last_row['ma_long'] else "SELL"
-                    signals = [{
-                        "signal": current_signal,
-                        "date": format_date(last_row.name),
-                        "price": last_row['close'],
-                        "ma_short": last_row['ma_short'],
-                        "ma_long": last_row['ma_long'],
-                        "is_state": True,
-                        "offset": 0
-                    }]
-            elif signals:
-                # 确保每个标的只返回最新的信号
-                latest_signal = signals[-1]
-                
-                # 严格的时间窗口验证
-                if latest_signal.get('offset') is not None and latest_signal['offset'] >= request.lookback:
-                     continue
-                
-                signals = [latest_signal]
-            
-            symbol_name = get_symbol_name(symbol, request.market)
-
-            for signal_info in signals:
-                try:
-                    sig_date = pd.to_datetime(signal_info['date'])
-                    
-                    if df.index.tz is not None and sig_date.tzinfo is None:
-                        sig_date = sig_date.tz_localize(df.index.tz)
-
-                    loc = df.index.get_loc(sig_date)
-                    if isinstance(loc, slice): loc = loc.start
-                    
-                    # 增加范围
-                    start_pos = max(0, loc - 800)
-                    end_pos = min(len(df), loc + 100)
-                    
-                    if end_pos - start_pos < 300:
-                        start_pos = max(0, end_pos - 400)
-                    
-                    chart_df = df.iloc[start_pos:end_pos]
-                    chart_data = chart_df.reset_index().to_dict(orient='records')
-                    for item in chart_data:
-                        item['date'] = format_date(item['date'])
-                        
-                    c_start = format_date(chart_df.index[0])
-                    c_end = format_date(chart_df.index[-1])
-                    chart_signals = check_ma_signal(df, lookback=0, start_time=c_start, end_time=c_end)
-                    
-                    if signal_info.get('is_state'):
-                         chart_signals.append(signal_info)
-                    
-                except Exception as ex:
-                    print(f"Error preparing MA chart data: {ex}")
-                    chart_data = df.tail(300).reset_index().to_dict(orient='records')
-                    for item in chart_data:
-                        item['date'] = format_date(item['date'])
-                    chart_signals = []
-                
-                result = SignalResult(
-                    symbol=symbol,
-                    symbol_name=symbol_name,
-                    date=format_date(pd.to_datetime(signal_info['date'])),
-                    signal=signal_info['signal'],
-                    close=signal_info['price'],
-                    ma_short=signal_info['ma_short'],
-                    ma_long=signal_info['ma_long'],
-                    indicator="MA",
-                    offset=signal_info.get('offset'),
-                    details={
-                        "chart_data": chart_data,
-                        "chart_signals": chart_signals
-                    }
-                )
-                
-                # 保存到数据库
-                save_data = result.dict()
-                save_data['market'] = request.market
-                save_data['indicator_type'] = 'MA'
-                save_signal(save_data)
-                
-                results.append(result)
-                
-        except Exception as e:
-            print(f"Error processing MA for {symbol}: {e}")
-            continue
-            
+    results = await _run_per_symbol(request.symbols, _detect_ma_symbol, request)
     return DetectionResponse(results=results)
 
 @app.get("/api/history")
@@ -304,61 +395,70 @@ def get_signal_history(limit: int = 100):
 async def search_symbols_api(q: str = "", market: str = "stock"):
     return search_symbols(q, market)
 
+def _export_dkx_symbol(symbol: str, request: DetectionRequest) -> list:
+    """
+    单个标的的 DKX 导出 (同步阻塞函数，在检测线程池中执行)。
+    
+    返回 [(CSV 行, (图片文件名, 图片字节))]；获取数据失败或无有效信号时返回空列表。
+    """
+    items = []
+    try:
+        df = get_market_data(symbol, request.market, request.period)
+        if df.empty:
+            return items
+
+        df = calculate_dkx(df)
+        latest_signal = signal_timeline(df, 'dkx').latest(request.lookback, request.start_time, request.end_time)
+        signals = [latest_signal] if latest_signal else []
+
+        if request.lookback == 0:
+            if signals:
+                signals = [signals[-1]]
+            else:
+                last_row = df.iloc[-1]
+                current_signal = "BUY" if last_row['dkx'] > last_row['madkx'] else "SELL"
+                signals = [{
+                    "signal": current_signal,
+                    "date": format_date(last_row.name),
+                    "price": last_row['close'],
+                    "dkx": last_row['dkx'],
+                    "madkx": last_row['madkx'],
+                    "is_state": True,
+                    "offset": 0
+                }]
+        elif signals:
+            latest_signal = signals[-1]
+            if latest_signal.get('offset') is not None and latest_signal['offset'] >= request.lookback:
+                 return items
+            signals = [latest_signal]
+
+        symbol_name = get_symbol_name(symbol, request.market)
+
+        for signal_info in signals:
+            # Generate Plot
+            plot_bytes = create_dkx_plot(df.tail(300), symbol, symbol_name, signal_info['date'])
+            chart = (f"{symbol}_{str(signal_info['date']).replace(':', '-').replace(' ', '_')}.png", plot_bytes)
+
+            items.append(({
+                "标的代码": f"\t{symbol}",
+                "名称": symbol_name,
+                "信号日期": format_date(pd.to_datetime(signal_info['date'])),
+                "信号": "买入" if signal_info['signal'] == 'BUY' else "卖出",
+                "收盘价": signal_info['price'],
+                "DKX": signal_info['dkx'],
+                "MADKX": signal_info['madkx']
+            }, chart))
+
+    except Exception as e:
+        print(f"Error exporting DKX for {symbol}: {e}")
+    return items
+
 @app.post("/api/export/dkx")
 async def export_dkx(request: DetectionRequest):
-    results = []
-    charts_map = {}
-    
-    for symbol in request.symbols:
-        try:
-            df = get_market_data(symbol, request.market, request.period)
-            if df.empty:
-                continue
-                
-            df = calculate_dkx(df)
-            signals = check_dkx_signal(df, request.lookback, request.start_time, request.end_time)
-            
-            if request.lookback == 0:
-                if signals:
-                    signals = [signals[-1]]
-                else:
-                    last_row = df.iloc[-1]
-                    current_signal = "BUY" if last_row['dkx'] > last_row['madkx'] else "SELL"
-                    signals = [{
-                        "signal": current_signal,
-                        "date": format_date(last_row.name),
-                        "price": last_row['close'],
-                        "dkx": last_row['dkx'],
-                        "madkx": last_row['madkx'],
-                        "is_state": True,
-                        "offset": 0
-                    }]
-            elif signals:
-                latest_signal = signals[-1]
-                if latest_signal.get('offset') is not None and latest_signal['offset'] >= request.lookback:
-                     continue
-                signals = [latest_signal]
-            
-            symbol_name = get_symbol_name(symbol, request.market)
-
-            for signal_info in signals:
-                # Generate Plot
-                plot_bytes = create_dkx_plot(df.tail(300), symbol, symbol_name, signal_info['date'])
-                charts_map[f"{symbol}_{str(signal_info['date']).replace(':', '-').replace(' ', '_')}.png"] = plot_bytes
-                
-                results.append({
-                    "标的代码": f"\t{symbol}",
-                    "名称": symbol_name,
-                    "信号日期": format_date(pd.to_datetime(signal_info['date'])),
-                    "信号": "买入" if signal_info['signal'] == 'BUY' else "卖出",
-                    "收盘价": signal_info['price'],
-                    "DKX": signal_info['dkx'],
-                    "MADKX": signal_info['madkx']
-                })
-                
-        except Exception as e:
-            print(f"Error exporting DKX for {symbol}: {e}")
-            continue
+    # 逐标的获取数据与绘图在检测线程池中并发执行，不阻塞事件循环
+    items = await _run_per_symbol(request.symbols, _export_dkx_symbol, request)
+    results = [row for row, _ in items]
+    charts_map = dict(chart for _, chart in items)
             
     if not results:
         raise HTTPException(status_code=404, detail="No data found for export")
@@ -374,61 +474,67 @@ async def export_dkx(request: DetectionRequest):
         headers={"Content-Disposition": f"attachment; filename=dkx_export.zip"}
     )
 
+def _export_ma_symbol(symbol: str, request: MaDetectionRequest) -> list:
+    """
+    单个标的的双均线导出 (同步阻塞函数，在检测线程池中执行)，返回值同 _export_dkx_symbol。
+    """
+    items = []
+    try:
+        df = get_market_data(symbol, request.market, request.period)
+        if df.empty:
+            return items
+
+        df = calculate_ma(df, request.short_period, request.long_period)
+        latest_signal = signal_timeline(df, 'ma').latest(request.lookback, request.start_time, request.end_time)
+        signals = [latest_signal] if latest_signal else []
+
+        if request.lookback == 0:
+            if signals:
+                signals = [signals[-1]]
+            else:
+                last_row = df.iloc[-1]
+                current_signal = "BUY" if last_row['ma_short'] > last_row['ma_long'] else "SELL"
+                signals = [{
+                    "signal": current_signal,
+                    "date": format_date(last_row.name),
+                    "price": last_row['close'],
+                    "ma_short": last_row['ma_short'],
+                    "ma_long": last_row['ma_long'],
+                    "is_state": True,
+                    "offset": 0
+                }]
+        elif signals:
+            latest_signal = signals[-1]
+            if latest_signal.get('offset') is not None and latest_signal['offset'] >= request.lookback:
+                 return items
+            signals = [latest_signal]
+
+        symbol_name = get_symbol_name(symbol, request.market)
+
+        for signal_info in signals:
+            # Generate Plot
+            plot_bytes = create_ma_plot(df.tail(300), symbol, symbol_name, request.short_period, request.long_period, signal_info['date'])
+            chart = (f"{symbol}_{str(signal_info['date']).replace(':', '-').replace(' ', '_')}.png", plot_bytes)
+
+            items.append(({
+                "标的代码": f"\t{symbol}",
+                "名称": symbol_name,
+                "信号日期": format_date(pd.to_datetime(signal_info['date'])),
+                "信号": "买入" if signal_info['signal'] == 'BUY' else "卖出",
+                "收盘价": signal_info['price'],
+                "短期均线": signal_info['ma_short'],
+                "长期均线": signal_info['ma_long']
+            }, chart))
+
+    except Exception as e:
+        print(f"Error exporting MA for {symbol}: {e}")
+    return items
+
 @app.post("/api/export/ma")
 async def export_ma(request: MaDetectionRequest):
-    results = []
-    charts_map = {}
-    
-    for symbol in request.symbols:
-        try:
-            df = get_market_data(symbol, request.market, request.period)
-            if df.empty:
-                continue
-                
-            df = calculate_ma(df, request.short_period, request.long_period)
-            signals = check_ma_signal(df, request.lookback, request.start_time, request.end_time)
-            
-            if request.lookback == 0:
-                if signals:
-                    signals = [signals[-1]]
-                else:
-                    last_row = df.iloc[-1]
-                    current_signal = "BUY" if last_row['ma_short'] > last_row['ma_long'] else "SELL"
-                    signals = [{
-                        "signal": current_signal,
-                        "date": format_date(last_row.name),
-                        "price": last_row['close'],
-                        "ma_short": last_row['ma_short'],
-                        "ma_long": last_row['ma_long'],
-                        "is_state": True,
-                        "offset": 0
-                    }]
-            elif signals:
-                latest_signal = signals[-1]
-                if latest_signal.get('offset') is not None and latest_signal['offset'] >= request.lookback:
-                     continue
-                signals = [latest_signal]
-            
-            symbol_name = get_symbol_name(symbol, request.market)
-
-            for signal_info in signals:
-                # Generate Plot
-                plot_bytes = create_ma_plot(df.tail(300), symbol, symbol_name, request.short_period, request.long_period, signal_info['date'])
-                charts_map[f"{symbol}_{str(signal_info['date']).replace(':', '-').replace(' ', '_')}.png"] = plot_bytes
-                
-                results.append({
-                    "标的代码": f"\t{symbol}",
-                    "名称": symbol_name,
-                    "信号日期": format_date(pd.to_datetime(signal_info['date'])),
-                    "信号": "买入" if signal_info['signal'] == 'BUY' else "卖出",
-                    "收盘价": signal_info['price'],
-                    "短期均线": signal_info['ma_short'],
-                    "长期均线": signal_info['ma_long']
-                })
-                
-        except Exception as e:
-            print(f"Error exporting MA for {symbol}: {e}")
-            continue
+    items = await _run_per_symbol(request.symbols, _export_ma_symbol, request)
+    results = [row for row, _ in items]
+    charts_map = dict(chart for _, chart in items)
             
     if not results:
         raise HTTPException(status_code=404, detail="No data found for export")
@@ -26,6 +26,7 @@ class SignalResult(BaseModel):
     ma_long: Optional[float] = None
     indicator: Optional[str] = None # DKX 或 MA
     offset: Optional[int] = None # 信号发生在多少根 K 线之前 (0 = 最新)
+    data_age: Optional[float] = None # 行情数据的过期时长 (秒，0 = 最新，见 MARKET_DATA_SWR)
     details: Dict[str, Any] = {}
 
 class DetectionResponse(BaseModel):
@@ -0,0 +1,352 @@
+"""
+性能基准测试套件。
+
+用法:
+    python scripts/benchmark_suite.py              # 运行全部基准
+    python scripts/benchmark_suite.py detect       # 仅运行名称包含 detect 的基准
+
+所有基准均使用合成数据并模拟数据源延迟，不访问网络，结果可在离线环境中复现。
+运行期间数据提供者固定切换为 replay (见 services/providers.py)，即使基准走到真实的
+get_market_data 路径也只读取本地录制/合成数据。
+"""
+import sys
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 已注册的基准: 名称 -> 函数
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """注册基准函数的装饰器"""
+    def decorator(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return decorator
+
+
+def make_synthetic_bars(n: int, freq: str = "D", seed: int = 0, start: str = "2015-01-05") -> pd.DataFrame:
+    """生成随机游走的 OHLCV 合成数据"""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    open_ = close + rng.normal(0, 0.3, n)
+    high = np.maximum(open_, close) + rng.random(n)
+    low = np.minimum(open_, close) - rng.random(n)
+    index = pd.date_range(start=start, periods=n, freq=freq, name="date")
+    return pd.DataFrame({
+        "open": open_, "high": high, "low": low, "close": close,
+        "volume": rng.integers(1_000, 100_000, n).astype(float),
+    }, index=index)
+
+
+def timed(fn, repeat: int = 3) -> float:
+    """执行 fn repeat 次，返回最短耗时 (秒)"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+@benchmark("detect_latency")
+def bench_detect_latency():
+    """
+    /api/detect/dkx 端到端延迟: 1 / 10 / 100 个标的，
+    对比逐个串行处理 (并发度 1) 与检测线程池并发处理。
+    每次行情获取模拟 50ms 的数据源延迟。
+    """
+    from fastapi.testclient import TestClient
+    import main
+
+    upstream_latency = 0.05
+    frame = make_synthetic_bars(600)
+
+    def fake_get_market_data(symbol, market="stock", period="daily", *args, **kwargs):
+        time.sleep(upstream_latency)
+        return frame.copy()
+
+    client = TestClient(main.app)
+    rows = []
+    with patch.object(main, "get_market_data", fake_get_market_data), \
+         patch.object(main, "save_signal", lambda data: None), \
+         patch.object(main, "get_symbol_name", lambda symbol, market: symbol):
+        for n in (1, 10, 100):
+            payload = {"symbols": [f"{i:06d}" for i in range(n)], "market": "stock", "period": "daily", "lookback": 5}
+            post = lambda: client.post("/api/detect/dkx", json=payload)
+
+            with patch.object(main, "_detect_executor", ThreadPoolExecutor(max_workers=1)):
+                serial = timed(post, repeat=1)
+            concurrent = timed(post, repeat=1)
+            rows.append((n, serial, concurrent))
+
+    print(f"{'symbols':>8} {'serial(s)':>10} {'pool(s)':>10} {'speedup':>8}   (DETECT_CONCURRENCY={main.DETECT_CONCURRENCY})")
+    for n, serial, concurrent in rows:
+        print(f"{n:>8} {serial:>10.3f} {concurrent:>10.3f} {serial / concurrent:>7.1f}x")
+
+
+@benchmark("scan_replay")
+def bench_scan_replay():
+    """
+    通过真实的 get_market_data 路径 (K 线库 + 数据源注册表) 扫描 50 只股票日线:
+    replay 数据源注入 20ms 延迟，对比冷启动 (空 K 线库) 与热缓存的耗时。
+    """
+    from services import bar_store, indicators, providers
+
+    symbols = [f"{600000 + i:06d}" for i in range(50)]
+    replay = providers.ReplayProvider(latency=0.02, bars=1500)
+    previous = providers.set_provider(replay)
+    try:
+        with tempfile.TemporaryDirectory() as tmp, \
+             patch.object(bar_store, "STORE_PATH", os.path.join(tmp, "bars.db")), \
+             patch.object(indicators, "BAR_STORE_ENABLED", True):
+            scan = lambda: [indicators.calculate_dkx(indicators.get_market_data(s, "stock", "daily")) for s in symbols]
+            cold = timed(scan, repeat=1)
+            calls_cold = replay.calls
+            warm = timed(scan, repeat=3)
+    finally:
+        providers.set_provider(previous)
+
+    print(f"{'run':>6} {'time(s)':>8} {'source calls':>13}")
+    print(f"{'cold':>6} {cold:>8.3f} {calls_cold:>13}")
+    print(f"{'warm':>6} {warm:>8.3f} {replay.calls - calls_cold:>13}")
+
+
+@benchmark("bar_memory")
+def bench_bar_memory():
+    """
+    全市场日线缓存的内存占用: 以 5000 只股票、每只 2000 根日线估算，
+    对比数据源原始格式 (改名后保留全部列)、统一 K 线格式 (bar_schema) 与假想的 float32 价格。
+    """
+    from services import providers
+    from services.bar_schema import normalize_bars, frame_nbytes, PRICE_COLUMNS
+
+    n_symbols = 5000
+    replay = providers.ReplayProvider(bars=2000)
+    raw = replay.stock_zh_a_hist(symbol="600000", period="daily", adjust="qfq")
+    raw = raw.rename(columns={"日期": "date", "开盘": "open", "收盘": "close", "最高": "high", "最低": "low", "成交量": "volume"})
+    raw["date"] = pd.to_datetime(raw["date"])
+    raw = raw.set_index("date")
+    compact = normalize_bars(raw)
+    f32 = compact.astype({c: "float32" for c in PRICE_COLUMNS})
+
+    rows = [("raw akshare", raw), ("bar_schema", compact), ("float32 prices", f32)]
+    base = frame_nbytes(raw)
+    print(f"{'layout':>15} {'cols':>5} {'per symbol':>11} {'full market':>12} {'vs raw':>7}")
+    for name, df in rows:
+        size = frame_nbytes(df)
+        print(f"{name:>15} {df.shape[1]:>5} {size / 1024:>9.1f}KB {size * n_symbols / 2**20:>10.1f}MB {size / base:>6.0%}")
+    print("(float32 仅作对比，未采用: 见 services/bar_schema.py 中的说明)")
+
+
+@benchmark("time_index")
+def bench_time_index():
+    """
+    分钟线时间过滤与格式化延迟: 10 万 / 100 万根 1 分钟 K 线，
+    对比原实现 (对齐时区后布尔掩码过滤、逐行 strftime) 与 time_index (int64 二分查找、向量化格式化)。
+    时间窗口取序列中间的一半 (half) 与最后一天 (1 day，同一时间范围重复查询，边界解析已缓存)。
+    """
+    from services.time_index import window, format_times
+
+    def legacy_slice(df, start, end):
+        ts_start, ts_end = pd.to_datetime(start), pd.to_datetime(end)
+        if df.index.tz is None and ts_start.tzinfo is not None:
+            ts_start, ts_end = ts_start.tz_localize(None), ts_end.tz_localize(None)
+        return df.loc[(df.index >= ts_start) & (df.index <= ts_end)]
+
+    def new_slice(df, start, end):
+        lo, hi = window(df.index, start, end)
+        return df.iloc[lo:hi]
+
+    print(f"{'bars':>9} {'window':>7} {'slice old(ms)':>14} {'slice new(ms)':>14}")
+    formatting = []
+    for n in (100_000, 1_000_000):
+        df = make_synthetic_bars(n, freq="min", start="2020-01-02 09:31")
+        last = df.index[-1]
+        windows = [
+            ("half", str(df.index[n // 4]), str(df.index[3 * n // 4])),
+            ("1 day", str(last - pd.Timedelta(days=1)), str(last)),
+        ]
+        for label, start, end in windows:
+            assert len(legacy_slice(df, start, end)) == len(new_slice(df, start, end))
+            slice_old = timed(lambda: legacy_slice(df, start, end), repeat=5)
+            slice_new = timed(lambda: new_slice(df, start, end), repeat=5)
+            print(f"{n:>9} {label:>7} {slice_old * 1e3:>14.2f} {slice_new * 1e3:>14.3f}")
+        fmt_old = timed(lambda: [ts.strftime("%Y-%m-%d %H:%M") for ts in df.index], repeat=1)
+        fmt_new = timed(lambda: format_times(df.index, "m"), repeat=3)
+        formatting.append((n, fmt_old, fmt_new))
+
+    print(f"\n{'bars':>9} {'fmt old(ms)':>12} {'fmt new(ms)':>12} {'speedup':>8}")
+    for n, fmt_old, fmt_new in formatting:
+        print(f"{n:>9} {fmt_old * 1e3:>12.0f} {fmt_new * 1e3:>12.0f} {fmt_old / fmt_new:>7.1f}x")
+
+@benchmark("dkx_kernel")
+def bench_dkx_kernel():
+    """
+    DKX 指标计算耗时: 1 万 / 10 万 / 100 万根 K 线，
+    对比原实现 (rolling().apply 逐根调用 Python 函数) 与 indicator_kernels 的向量化平移累加，
+    并给出两者结果的最大绝对差。
+    """
+    from services.indicator_kernels import dkx_mid, weighted_window_mean, DKX_WEIGHTS, MADKX_WEIGHTS
+
+    weights = np.arange(1, 21)
+
+    def legacy(df):
+        mid = (3 * df["close"] + df["low"] + df["open"] + df["high"]) / 6
+        dkx = mid.rolling(window=20).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
+        return dkx.to_numpy(), dkx.rolling(window=10).mean().to_numpy()
+
+    def vectorized(df):
+        mid = dkx_mid(df["open"].to_numpy(), df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy())
+        dkx = weighted_window_mean(mid, DKX_WEIGHTS)
+        return dkx, weighted_window_mean(dkx, MADKX_WEIGHTS)
+
+    print(f"{'bars':>9} {'rolling.apply(s)':>17} {'vectorized(s)':>14} {'speedup':>8} {'max |diff|':>11}")
+    for n in (10_000, 100_000, 1_000_000):
+        df = make_synthetic_bars(n, freq="min", start="2020-01-02 09:31")
+        old = legacy(df)
+        new = vectorized(df)
+        diff = max(np.nanmax(np.abs(a - b)) for a, b in zip(old, new))
+        t_old = timed(lambda: legacy(df), repeat=1)
+        t_new = timed(lambda: vectorized(df), repeat=3)
+        print(f"{n:>9} {t_old:>17.3f} {t_new:>14.4f} {t_old / t_new:>7.0f}x {diff:>11.1e}")
+
+
+@benchmark("streaming")
+def bench_streaming():
+    """
+    实时刷新一根 K 线后的指标计算耗时: 1000 个标的、每个 2000 / 20000 根历史，
+    对比整段重算 (calculate_dkx / calculate_ma 5,10) 与增量计算器改写最后一根 K 线 (StreamingDKX / StreamingMA)。
+    """
+    from services.indicators import calculate_dkx, calculate_ma
+    from services.streaming_indicators import StreamingDKX, StreamingMA
+
+    n_symbols = 1000
+    cases = [
+        ("dkx", calculate_dkx, lambda df: StreamingDKX.from_frame(df)),
+        ("ma 5/10", lambda df: calculate_ma(df, 5, 10), lambda df: StreamingMA.from_frame(df, [(5, 10)])),
+    ]
+    print(f"{'indicator':>9} {'history':>8} {'recompute(s)':>13} {'streaming(s)':>13} {'speedup':>8}")
+    for n in (2_000, 20_000):
+        df = make_synthetic_bars(n, freq="min", start="2020-01-02 09:31")[["open", "high", "low", "close"]]
+        ts = df.index[-1]
+        o, h, l, c = (float(df[col].iloc[-1]) for col in ("open", "high", "low", "close"))
+        for name, recompute_fn, make_stream in cases:
+            stream = make_stream(df)
+            with patch("services.indicators.indicator_frames.get", lambda *args: None):
+                recompute = timed(lambda: [recompute_fn(df.copy()) for _ in range(n_symbols)], repeat=1)
+            streaming = timed(lambda: [stream.update(ts, o, h, l, c) for _ in range(n_symbols)], repeat=3)
+            print(f"{name:>9} {n:>8} {recompute:>13.3f} {streaming:>13.4f} {recompute / streaming:>7.0f}x")
+
+@benchmark("signal_scan")
+def bench_signal_scan():
+    """
+    全历史交叉检测 (lookback=0) 耗时: 1 万 / 10 万 / 100 万根 1 分钟 K 线，
+    对比原实现 (逐行 iloc 取 Series 比较、逐个 strftime) 与向量化实现 (check_dkx_signal)。
+    原实现在 100 万根上耗时过长，按 10 万根的单位耗时估算 (标注 *)。
+    """
+    from services.indicators import calculate_dkx, check_dkx_signal
+
+    def legacy(df):
+        signals = []
+        for i in range(1, len(df)):
+            prev, curr = df.iloc[i - 1], df.iloc[i]
+            if prev["dkx"] < prev["madkx"] and curr["dkx"] > curr["madkx"]:
+                signals.append((curr.name.strftime("%Y-%m-%d %H:%M:%S"), "BUY", len(df) - 1 - i))
+            elif prev["dkx"] > prev["madkx"] and curr["dkx"] < curr["madkx"]:
+                signals.append((curr.name.strftime("%Y-%m-%d %H:%M:%S"), "SELL", len(df) - 1 - i))
+        return signals
+
+    print(f"{'bars':>9} {'signals':>8} {'row loop(s)':>12} {'vectorized(s)':>14} {'speedup':>8}")
+    per_bar = None
+    for n in (10_000, 100_000, 1_000_000):
+        df = calculate_dkx(make_synthetic_bars(n, freq="min", start="2020-01-02 09:31"))
+        new = check_dkx_signal(df, lookback=0)
+        t_new = timed(lambda: check_dkx_signal(df, lookback=0), repeat=3)
+        if n <= 100_000:
+            old = legacy(df)
+            assert old == [(s["date"], s["signal"], s["offset"]) for s in new]
+            t_old = timed(lambda: legacy(df), repeat=1)
+            per_bar = t_old / n
+            mark = " "
+        else:
+            t_old, mark = per_bar * n, "*"
+        print(f"{n:>9} {len(new):>8} {t_old:>11.2f}{mark} {t_new:>14.4f} {t_old / t_new:>7.0f}x")
+
+
+
+@benchmark("signal_timeline")
+def bench_signal_timeline():
+    """
+    单个标的一次检测 + 导出的信号查询耗时 (指标已计算): 最新信号 (lookback=0 与 20)、
+    图表窗口 (2200 根) 内的信号标记，以及导出时再次查询最新信号。
+    对比逐次调用 check_dkx_signal 与共用缓存的信号时间线。合成数据带有 K 线库写入版本
+    (与 get_market_data 的返回一致)，时间线按版本缓存: "first" 为缓存为空时的一次检测 + 导出
+    (含构建)，"cached" 为之后同一版本的检测 + 导出。
+    """
+    from services import indicators
+    from services.frame_cache import FrameCache
+    from services.indicators import calculate_dkx, check_dkx_signal, signal_timeline
+
+    def with_checks(df, lookback):
+        latest = check_dkx_signal(df, lookback)
+        start, end = max(0, len(df) - 2200), len(df)
+        check_dkx_signal(df, 0, format_date(df.index[start]), format_date(df.index[end - 1]))
+        return latest[-1:] + check_dkx_signal(df, lookback)[-1:]
+
+    def with_timeline(df, lookback):
+        timeline = signal_timeline(df, "dkx")
+        latest = timeline.latest(lookback)
+        timeline.in_rows(max(0, len(df) - 2200), len(df))
+        return [latest, signal_timeline(df, "dkx").latest(lookback)] if latest else []
+
+    def format_date(ts):
+        return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+    def cold(df, lookback):
+        indicators.indicator_frames.clear()
+        return with_timeline(df, lookback)
+
+    previous = indicators.indicator_frames
+    indicators.indicator_frames = FrameCache("benchmark", 1 << 30)
+    try:
+        print(f"{'bars':>9} {'lookback':>8} {'check x3(ms)':>13} {'first(ms)':>10} {'cached(ms)':>11} {'speedup':>8}")
+        for n in (10_000, 100_000, 1_000_000):
+            bars = make_synthetic_bars(n, freq="min", start="2020-01-02 09:31")
+            bars.attrs['series_version'] = (("futures", "BENCH", "1", "qfq"), n)
+            df = calculate_dkx(bars)
+            for lookback in (0, 20):
+                assert with_checks(df, lookback) == cold(df, lookback)
+                t_old = timed(lambda: with_checks(df, lookback), repeat=3)
+                t_first = timed(lambda: cold(df, lookback), repeat=3)
+                with_timeline(df, lookback)
+                t_new = timed(lambda: with_timeline(df, lookback), repeat=3)
+                print(f"{n:>9} {lookback:>8} {t_old * 1e3:>13.2f} {t_first * 1e3:>10.2f} {t_new * 1e3:>11.3f} "
+                      f"{t_old / t_new:>7.0f}x")
+    finally:
+        indicators.indicator_frames = previous
+
+def main(argv):
+    from services import providers
+
+    selected = [name for name in BENCHMARKS if not argv or any(a in name for a in argv)]
+    previous = providers.set_provider(providers.ReplayProvider())
+    try:
+        for name in selected:
+            print(f"\n== {name} ==")
+            BENCHMARKS[name]()
+    finally:
+        providers.set_provider(previous)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
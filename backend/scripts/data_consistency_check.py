@@ -11,6 +11,7 @@ from datetime import datetime, timedelta
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from services.indicators import get_market_data, calculate_dkx, calculate_ma
+from services.fetch_scheduler import scheduler as fetch_scheduler
 
 def get_hs300_stocks():
     """Get random 5 stocks from HS300 (Simulated with hardcoded active list for speed)"""
@@ -28,7 +29,7 @@ def get_benchmark_data(symbol, period):
         
         if period in ['daily', 'weekly', 'monthly']:
             p_map = {'daily': 'daily', 'weekly': 'weekly', 'monthly': 'monthly'}
-            df = ak.stock_zh_a_hist(symbol=symbol, period=p_map[period], adjust="qfq")
+            df = fetch_scheduler.wrap('stock_zh_a_hist', ak.stock_zh_a_hist)(symbol=symbol, period=p_map[period], adjust="qfq")
             if df.empty: return df
             df = df.rename(columns={
                 '日期': 'date', '开盘': 'open', '收盘': 'close', 
@@ -37,7 +38,7 @@ def get_benchmark_data(symbol, period):
             df['date'] = pd.to_datetime(df['date'])
         
         elif period in ['1', '5', '15', '30', '60']:
-            df = ak.stock_zh_a_hist_min_em(symbol=symbol, period=period, adjust="qfq")
+            df = fetch_scheduler.wrap('stock_zh_a_hist_min_em', ak.stock_zh_a_hist_min_em)(symbol=symbol, period=period, adjust="qfq")
             if df.empty: return df
             df = df.rename(columns={
                 '时间': 'date', '开盘': 'open', '收盘': 'close', 
@@ -160,4 +161,5 @@ def main():
     print("Report saved to consistency_report.csv")
 
 if __name__ == "__main__":
+    # 令牌桶只在本进程内生效: 脚本只限制自身的请求速率，与服务进程不共享配额，也不影响其用户请求的优先级
     main()
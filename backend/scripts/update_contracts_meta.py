@@ -5,6 +5,11 @@ import re
 import datetime
 import traceback
 import math
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.fetch_scheduler import scheduler as fetch_scheduler
 
 # Path config
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -147,7 +152,7 @@ def update_contracts():
         print(f"Updating {symbol} ({main_contract})...")
         
         try:
-            detail_df = ak.futures_contract_detail(symbol=main_contract)
+            detail_df = fetch_scheduler.wrap('futures_contract_detail', ak.futures_contract_detail)(symbol=main_contract)
             if detail_df is None or detail_df.empty:
                 print(f"  No data found for {main_contract}")
                 continue
@@ -237,4 +242,5 @@ def update_contracts():
     print(f"Update complete. {updated_count} contracts updated. Report saved to {REPORT_FILE}")
 
 if __name__ == "__main__":
+    # 令牌桶只在本进程内生效: 脚本只限制自身的请求速率，与服务进程不共享配额，也不影响其用户请求的优先级
     update_contracts()
@@ -3,7 +3,8 @@ import numpy as np
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 from .indicators import get_market_data, calculate_dkx, calculate_ma
-from .resample_utils import resample_data
+from .period_derivation import select_base_period, derive_period, bars_per_period
+from .time_index import window as time_window, format_times
 from .metadata import get_stock_list, get_futures_list
 from .futures_master import (
     get_multiplier as get_futures_multiplier, 
@@ -12,6 +13,9 @@ from .futures_master import (
     get_min_tick
 )
 
+# DKX 指标预热所需的 K 线数: DKX 为 20 根加权平均，MADKX 再对 DKX 取 10 根均值，共需 20 + 10 - 1 根
+DKX_WARMUP_BARS = 29
+
 def get_symbol_name(symbol: str, market: str) -> str:
     """
     从元数据中获取标的名称。
@@ -247,21 +251,13 @@ def run_backtest_ma(
     for symbol in symbols:
         multiplier = 100 if market == 'stock' else get_futures_multiplier(symbol)
         
-        # 1. 获取数据
-        custom_periods = ['90', '120', '180', '240']
-        fetch_period = period
-        need_resample = False
-        
-        if period in custom_periods:
-            need_resample = True
-            if period == '90':
-                fetch_period = '30'
-            elif period == '180':
-                fetch_period = '30'
-            else:
-                fetch_period = '60'
-        
-        df = get_market_data(symbol, market=market, period=fetch_period)
+        # 1. 获取数据 (由周期派生层选择基础周期，优先复用已缓存的序列)
+        # 回测窗口下推到数据层，并在窗口前多取 long_period - 1 根 K 线用于均线预热
+        warmup_bars = max(long_period - 1, 0)
+        fetch_period = select_base_period(symbol, market, period)
+        base_warmup = (warmup_bars + 1) * bars_per_period(fetch_period, period) if fetch_period != period else warmup_bars
+        df = get_market_data(symbol, market=market, period=fetch_period,
+                             start_date=start_time, end_date=end_time, warmup_bars=base_warmup)
         
         if df.empty:
             print(f"警告: 未获取到 {symbol} 的数据")
@@ -270,54 +266,33 @@ def run_backtest_ma(
         if market == 'futures':
             df = filter_trading_hours(df, symbol)
         
-        if need_resample:
-             df = resample_data(df, period)
-        
-        if market == 'futures' and period in ['weekly', 'monthly']:
-            if df.empty:
-                df = get_market_data(symbol, market=market, period='daily')
-                df = resample_data(df, period)
+        df = derive_period(df, fetch_period, period, market)
         
         if df.empty:
             continue
             
-        try:
-            if not isinstance(df.index, pd.DatetimeIndex):
-                df.index = pd.to_datetime(df.index)
-            df.sort_index(inplace=True)
-            
-            if start_time and end_time:
-                try:
-                    ts_start = pd.to_datetime(start_time)
-                    ts_end = pd.to_datetime(end_time)
-                    index_tz = df.index.tz
-                    
-                    if index_tz is None:
-                        if ts_start.tzinfo is not None:
-                            ts_start = ts_start.tz_localize(None)
-                            ts_end = ts_end.tz_localize(None)
-                    else:
-                        if ts_start.tzinfo is None:
-                            ts_start = ts_start.tz_localize(index_tz)
-                            ts_end = ts_end.tz_localize(index_tz)
-                        else:
-                            ts_start = ts_start.tz_convert(index_tz)
-                            ts_end = ts_end.tz_convert(index_tz)
-                            
-                    mask = (df.index >= ts_start) & (df.index <= ts_end)
-                    df = df.loc[mask].copy()
-                except Exception as filter_err:
-                    print(f"{symbol} 时间过滤错误: {filter_err}")
-                    df = pd.DataFrame()
-        except Exception as e:
-            print(f"{symbol} 时间过滤错误: {e}")
-            continue
+        # 截取时间窗口并保留窗口前的预热 K 线 (int64 时间索引上二分查找，见 time_index)，
+        # 指标计算完成后再去掉预热部分
+        warmup_rows = 0
+        if start_time and end_time:
+            try:
+                lo, hi = time_window(df.index, start_time, end_time)
+            except Exception as e:
+                print(f"{symbol} 时间过滤错误: {e}")
+                continue
+            warmup_rows = min(lo, warmup_bars)
+            df = df.iloc[lo - warmup_rows:hi].copy()
             
         if df.empty:
             continue
 
         # 2. 计算指标 (Calculate MA)
         df = calculate_ma(df, short_period=short_period, long_period=long_period)
+        df = df.iloc[warmup_rows:]
+        if df.empty:
+            continue
+        # 输出用的时间字符串一次性向量化格式化
+        times = format_times(df.index, 'm')
         
         # 3. 模拟交易
         trades = []
@@ -351,7 +326,7 @@ def run_backtest_ma(
                 max_margin_used = max(max_margin_used, current_margin)
             
             if pd.isna(curr_short) or pd.isna(curr_long) or pd.isna(prev_short):
-                equity_curve.append({'date': curr_idx.strftime('%Y-%m-%d %H:%M'), 'equity': current_balance})
+                equity_curve.append({'date': times[i], 'equity': current_balance})
                 continue
 
             # 金叉: 短线上穿长线
@@ -370,7 +345,7 @@ def run_backtest_ma(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '平空',
                         'price': curr_price,
@@ -402,7 +377,7 @@ def run_backtest_ma(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '开多',
                         'price': curr_price,
@@ -435,7 +410,7 @@ def run_backtest_ma(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '开多',
                         'price': curr_price,
@@ -465,7 +440,7 @@ def run_backtest_ma(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '平多',
                         'price': curr_price,
@@ -497,7 +472,7 @@ def run_backtest_ma(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '开空',
                         'price': curr_price,
@@ -530,7 +505,7 @@ def run_backtest_ma(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '开空',
                         'price': curr_price,
@@ -549,7 +524,7 @@ def run_backtest_ma(
                     })
                     trade_count += 1
             
-            equity_curve.append({'date': curr_idx.strftime('%Y-%m-%d %H:%M'), 'equity': current_balance})
+            equity_curve.append({'date': times[i], 'equity': current_balance})
             
         # 4. 统计指标
         final_equity = current_balance
@@ -659,14 +634,14 @@ def run_backtest_ma(
         
         chart_data = []
         
-        for idx, row in df.iterrows():
+        for i, (_, row) in enumerate(df.iterrows()):
             def get_val(val):
                 if pd.isna(val) or np.isinf(val):
                     return None
                 return val
 
             chart_data.append({
-                'date': idx.strftime('%Y-%m-%d %H:%M'),
+                'date': times[i],
                 'open': get_val(row['open']),
                 'close': get_val(row['close']),
                 'low': get_val(row['low']),
@@ -732,24 +707,16 @@ def run_backtest_dkx(
         multiplier = 100 if market == 'stock' else get_futures_multiplier(symbol)
         
         # 1. 获取数据 (Fetch Data)
-        # 处理自定义分钟周期
-        custom_periods = ['90', '120', '180', '240']
-        fetch_period = period
-        need_resample = False
-        
-        if period in custom_periods:
-            need_resample = True
-            if period == '90':
-                fetch_period = '30'
-            elif period == '180':
-                # 为确保 180 分钟周期在午休 (11:30-13:30) 和夜盘等场景下的切分精度，
-                # 必须使用 30 分钟数据作为基础源，而非 60 分钟。
-                # 原因：纯日盘品种 09:00-11:30 为 150 分钟，需补 30 分钟 (13:30-14:00) 才能凑齐 180 分钟。
-                fetch_period = '30'
-            else:
-                fetch_period = '60'
-        
-        df = get_market_data(symbol, market=market, period=fetch_period)
+        # 自定义分钟周期及周线/月线由周期派生层选择基础周期，优先复用已缓存的序列。
+        # 例如 180 分钟以 30 分钟为基础: 纯日盘品种 09:00-11:30 为 150 分钟，
+        # 需补 30 分钟 (13:30-14:00) 才能凑齐 180 分钟。
+        # 回测窗口下推到数据层，并在窗口前多取 DKX_WARMUP_BARS 根 K 线用于指标预热，
+        # 派生周期按基础周期折算预热根数 (多取一根目标周期，保证首根派生 K 线完整)。
+        warmup_bars = DKX_WARMUP_BARS
+        fetch_period = select_base_period(symbol, market, period)
+        base_warmup = (warmup_bars + 1) * bars_per_period(fetch_period, period) if fetch_period != period else warmup_bars
+        df = get_market_data(symbol, market=market, period=fetch_period,
+                             start_date=start_time, end_date=end_time, warmup_bars=base_warmup)
         
         if df.empty:
             print(f"警告: 未获取到 {symbol} 的数据")
@@ -760,68 +727,35 @@ def run_backtest_dkx(
         if market == 'futures':
             df = filter_trading_hours(df, symbol)
         
-        # 如果需要重采样 (Resample)
-        if need_resample:
-             df = resample_data(df, period)
-        
-        # 处理期货的周线/月线 (如果 API 不直接支持)
-        if market == 'futures' and period in ['weekly', 'monthly']:
-            if df.empty:
-                df = get_market_data(symbol, market=market, period='daily')
-                df = resample_data(df, period)
+        # 由基础周期重采样为目标周期 (Resample)
+        df = derive_period(df, fetch_period, period, market)
         
         if df.empty:
             continue
             
-        # 根据时间范围过滤数据
-        try:
-            # 确保 index 为 datetime 类型并排序
-            if not isinstance(df.index, pd.DatetimeIndex):
-                df.index = pd.to_datetime(df.index)
-            df.sort_index(inplace=True)
-            
-            # 使用 loc 进行切片，避免 dtype 比较错误
-            if start_time and end_time:
-                try:
-                    # 1. 统一转换为 Timestamp
-                    ts_start = pd.to_datetime(start_time)
-                    ts_end = pd.to_datetime(end_time)
-                    
-                    # 2. 检查 DataFrame 索引的时区属性
-                    index_tz = df.index.tz
-                    
-                    # 3. 对齐查询时间的时区
-                    if index_tz is None:
-                        # 如果索引是 naive (无时区)，则将查询时间也转换为 naive
-                        if ts_start.tzinfo is not None:
-                            # 移除时区信息，使之变为 naive datetime，以便与索引比较
-                            ts_start = ts_start.tz_localize(None)
-                            ts_end = ts_end.tz_localize(None)
-                    else:
-                        # 如果索引是 aware (有时区)，则将查询时间转换为对应时区
-                        if ts_start.tzinfo is None:
-                            ts_start = ts_start.tz_localize(index_tz)
-                            ts_end = ts_end.tz_localize(index_tz)
-                        else:
-                            ts_start = ts_start.tz_convert(index_tz)
-                            ts_end = ts_end.tz_convert(index_tz)
-                            
-                    # 4. 使用布尔索引过滤 (比 loc 切片更健壮)
-                    mask = (df.index >= ts_start) & (df.index <= ts_end)
-                    df = df.loc[mask].copy()
-                    
-                except Exception as filter_err:
-                    print(f"{symbol} 时间过滤错误: {filter_err}")
-                    df = pd.DataFrame()
-        except Exception as e:
-            print(f"{symbol} 时间过滤错误: {e}")
-            continue
+        # 截取时间窗口并保留窗口前的预热 K 线 (int64 时间索引上二分查找，见 time_index)，
+        # 指标计算完成后再去掉预热部分
+        warmup_rows = 0
+        if start_time and end_time:
+            try:
+                lo, hi = time_window(df.index, start_time, end_time)
+            except Exception as e:
+                print(f"{symbol} 时间过滤错误: {e}")
+                continue
+            warmup_rows = min(lo, warmup_bars)
+            df = df.iloc[lo - warmup_rows:hi].copy()
             
         if df.empty:
             continue
 
         # 2. 计算指标 (Calculate Indicators)
         df = calculate_dkx(df)
+        # 去掉预热 K 线，首根窗口内 K 线已有有效的指标值
+        df = df.iloc[warmup_rows:]
+        if df.empty:
+            continue
+        # 输出用的时间字符串一次性向量化格式化
+        times = format_times(df.index, 'm')
         
         # 3. 模拟交易 (Simulate Trading)
         trades = []
@@ -876,7 +810,7 @@ def run_backtest_dkx(
                 max_margin_used = max(max_margin_used, current_margin)
             
             if pd.isna(curr_dkx) or pd.isna(curr_madkx) or pd.isna(prev_dkx):
-                equity_curve.append({'date': curr_idx.strftime('%Y-%m-%d %H:%M'), 'equity': current_balance})
+                equity_curve.append({'date': times[i], 'equity': current_balance})
                 continue
 
             # 信号判断
@@ -900,7 +834,7 @@ def run_backtest_dkx(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '平空',
                         'price': curr_price,
@@ -933,7 +867,7 @@ def run_backtest_dkx(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '开多',
                         'price': curr_price,
@@ -966,7 +900,7 @@ def run_backtest_dkx(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '开多',
                         'price': curr_price,
@@ -997,7 +931,7 @@ def run_backtest_dkx(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '平多',
                         'price': curr_price,
@@ -1029,7 +963,7 @@ def run_backtest_dkx(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '开空',
                         'price': curr_price,
@@ -1062,7 +996,7 @@ def run_backtest_dkx(
                     
                     trades.append({
                         'id': trade_count + 1,
-                        'time': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                        'time': times[i],
                         'symbol': symbol,
                         'direction': '开空',
                         'price': curr_price,
@@ -1089,7 +1023,7 @@ def run_backtest_dkx(
                 floating_pnl = (entry_price - curr_price) * trade_quantity_value
                 
             equity_curve.append({
-                'date': curr_idx.strftime('%Y-%m-%d %H:%M'),
+                'date': times[i],
                 'equity': current_balance + floating_pnl
             })
 
@@ -1236,7 +1170,6 @@ def run_backtest_dkx(
         # Prepare Chart Data
         chart_data = []
         for i in range(len(df)):
-            idx = df.index[i]
             row = df.iloc[i]
             
             # Helper to clean chart values (Inf/NaN -> None)
@@ -1246,7 +1179,7 @@ def run_backtest_dkx(
                 return float(v)
 
             chart_data.append({
-                'date': idx.strftime('%Y-%m-%d %H:%M'),
+                'date': times[i],
                 'open': clean_chart_val(row['open']),
                 'close': clean_chart_val(row['close']),
                 'low': clean_chart_val(row['low']),
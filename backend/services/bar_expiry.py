@@ -0,0 +1,154 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from .futures_master import get_contract_info
+from .bar_store import MARKET_TZ
+
+# K 线收盘感知的缓存过期 (Bar-Close-Aware Expiry)
+# 缓存中的序列在其周期的下一根 K 线收盘时才过期: 交易时段内按收盘时刻补齐，
+# 非交易时段 (午休、夜间、周末) 不会过期，扫描全部由本地 K 线库提供。
+
+# 收盘后数据源生成该根 K 线需要的时间 (秒)，收盘后该时长内的获取不视为已包含这根 K 线
+BAR_CLOSE_GRACE = float(os.environ.get('BAR_CLOSE_GRACE', '30'))
+
+STOCK_DAY_HOURS = ['09:30-11:30', '13:00-15:00']
+# 合约元数据缺失时按最常见的纯日盘时段处理
+DEFAULT_FUTURES_DAY_HOURS = ['09:00-10:15', '10:30-11:30', '13:30-15:00']
+
+Session = Tuple[int, int]  # (开始分钟, 结束分钟)，跨零点的夜盘结束分钟大于 1440
+
+
+def _parse_ranges(ranges: List[str]) -> List[Session]:
+    """将 ['21:00-01:00', ...] 解析为分钟区间，结束早于开始时视为跨零点"""
+    sessions = []
+    for r in ranges or []:
+        try:
+            start, end = r.split('-')
+            sh, sm = start.strip().split(':')
+            eh, em = end.strip().split(':')
+        except ValueError:
+            continue
+        s = int(sh) * 60 + int(sm)
+        e = int(eh) * 60 + int(em)
+        if e <= s:
+            e += 1440
+        sessions.append((s, e))
+    return sorted(sessions)
+
+
+def get_sessions(symbol: str, market: str) -> Tuple[List[Session], List[Session]]:
+    """
+    获取品种的交易时段。
+
+    返回:
+        (日盘时段, 夜盘时段)。期货取 futures_contracts.json 中的 day_hours / night_hours，
+        股票使用 A 股固定时段 (无夜盘)。
+    """
+    if market != 'futures':
+        return _parse_ranges(STOCK_DAY_HOURS), []
+    info = get_contract_info(symbol)
+    day = _parse_ranges(info.get('day_hours')) or _parse_ranges(DEFAULT_FUTURES_DAY_HOURS)
+    night = _parse_ranges(info.get('night_hours'))
+    return day, night
+
+
+def _previous_weekday(d: datetime) -> datetime:
+    d -= timedelta(days=1)
+    while d.weekday() >= 5:
+        d -= timedelta(days=1)
+    return d
+
+
+def trading_day_closes(symbol: str, market: str, period: str, trading_date: datetime) -> List[datetime]:
+    """
+    计算某个交易日内该周期所有 K 线的收盘时刻。
+
+    逻辑:
+        1. 交易日由上一个工作日晚间的夜盘 (周一对应上周五夜盘) 与当日日盘组成，周末不是交易日。
+        2. 分钟周期按交易日内累计交易时长切分 (与 resample_data 一致)，
+           累计时长达到周期整数倍或交易日最后一个时段结束时收盘。
+        3. 日线/周线/月线 (及股票 240 分钟) 在当日日盘结束时收盘，当周/当月的 K 线每日收盘后变化。
+    """
+    trading_date = datetime(trading_date.year, trading_date.month, trading_date.day)
+    if trading_date.weekday() >= 5:
+        return []
+    day, night = get_sessions(symbol, market)
+    night_base = _previous_weekday(trading_date)
+    segments = [(night_base + timedelta(minutes=s), night_base + timedelta(minutes=e)) for s, e in night]
+    segments += [(trading_date + timedelta(minutes=s), trading_date + timedelta(minutes=e)) for s, e in day]
+
+    if not str(period).isdigit() or (market == 'stock' and str(period) == '240'):
+        return [segments[-1][1]] if segments else []
+
+    target = int(period)
+    closes = []
+    cum = 0
+    for seg_start, seg_end in segments:
+        length = int((seg_end - seg_start).total_seconds() // 60)
+        offset = (target - cum % target) % target or target
+        while offset <= length:
+            closes.append(seg_start + timedelta(minutes=offset))
+            offset += target
+        cum += length
+    if segments and (not closes or closes[-1] != segments[-1][1]):
+        closes.append(segments[-1][1])
+    return closes
+
+
+def in_session(symbol: str, market: str, at: datetime) -> bool:
+    """at (上海时间) 是否处于品种的连续交易时段内 (含收盘时刻)"""
+    day, night = get_sessions(symbol, market)
+    today = datetime(at.year, at.month, at.day)
+    yesterday = today - timedelta(days=1)
+    # 当日日盘与夜盘；跨零点的夜盘从前一自然日晚间开始
+    spans = [(today, s, e) for s, e in day + night] + [(yesterday, s, e) for s, e in night]
+    for base, s, e in spans:
+        if base.weekday() < 5 and base + timedelta(minutes=s) <= at <= base + timedelta(minutes=e):
+            return True
+    return False
+
+
+def next_bar_close(symbol: str, market: str, period: str, after: datetime) -> Optional[datetime]:
+    """返回 after (上海时间) 之后该周期的下一个收盘时刻"""
+    day = datetime(after.year, after.month, after.day)
+    # 夜盘归属下一交易日，最多跨越周末加长假前后若干天
+    for i in range(0, 10):
+        for close in trading_day_closes(symbol, market, period, day + timedelta(days=i)):
+            if close > after:
+                return close
+    return None
+
+
+def to_market_datetime(epoch_seconds: float) -> datetime:
+    """纪元秒转换为上海时间 (naive)"""
+    ts = pd.Timestamp(epoch_seconds, unit='s', tz='UTC').tz_convert(MARKET_TZ).tz_localize(None)
+    return ts.floor('us').to_pydatetime()
+
+
+def expires_at(symbol: str, market: str, period: str, last_fetch: float) -> Optional[float]:
+    """
+    计算在 last_fetch (纪元秒) 获取的缓存何时过期 (纪元秒)。
+
+    收盘时刻 c 的 K 线在 c + BAR_CLOSE_GRACE 之后才视为可从数据源获取，
+    因此过期时间为首个满足 c + grace > last_fetch 的收盘时刻再加 grace。
+    """
+    fetched = to_market_datetime(last_fetch)
+    close = next_bar_close(symbol, market, period, fetched - timedelta(seconds=BAR_CLOSE_GRACE))
+    if close is None:
+        return None
+    close_ts = pd.Timestamp(close).tz_localize(MARKET_TZ).timestamp()
+    return close_ts + BAR_CLOSE_GRACE
+
+
+def is_expired(symbol: str, market: str, period: str, last_fetch: Optional[float], now: Optional[float] = None) -> bool:
+    """判断缓存是否已过期 (之后有新的 K 线收盘)；无获取记录视为过期"""
+    if last_fetch is None:
+        return True
+    expiry = expires_at(symbol, market, period, last_fetch)
+    if expiry is None:
+        return False
+    return (time.time() if now is None else now) >= expiry
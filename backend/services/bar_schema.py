@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+# 统一的 K 线数据格式 (Bar Schema)
+# get_market_data 返回的数据在入库/返回前统一为以下格式，下游只依赖这些列:
+#   索引  date    datetime64[ns] (底层即 int64 纳秒)，naive 上海时间，升序
+#   价格  open / high / low / close    float64
+#   数量  volume / hold                int64 (hold 仅期货有)
+# 数据源返回的其他列 (成交额、振幅、涨跌幅、换手率、股票代码等) 在入口处丢弃。
+#
+# 价格保持 float64: akshare 返回的价格本身是 float64，DKX/MA 的累加与金叉死叉的比较
+# 对舍入敏感，降为 float32 (约 7 位有效数字) 会让接近相等的两条线判断结果改变，
+# 且 float32 转 JSON 会带出 12.300000190734863 这类尾数。
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+QUANTITY_COLUMNS = ['volume', 'hold']
+BAR_COLUMNS = PRICE_COLUMNS + QUANTITY_COLUMNS
+
+
+def normalize_bars(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    将行情数据转换为统一的 K 线格式。
+
+    逻辑:
+        1. 只保留 BAR_COLUMNS 中存在的列 (按固定顺序)。
+        2. 价格转为 float64；成交量/持仓量转为 int64 (缺失记为 0)。
+        3. 索引转为 datetime64[ns]、命名为 date 并按时间升序。
+    """
+    if df is None or df.empty:
+        return pd.DataFrame()
+    out = {}
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            out[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64')
+    for col in QUANTITY_COLUMNS:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64')
+            out[col] = np.nan_to_num(np.round(values), nan=0.0).astype('int64')
+    index = pd.DatetimeIndex(pd.to_datetime(df.index)).as_unit('ns')
+    index.name = 'date'
+    result = pd.DataFrame(out, index=index)
+    if not result.index.is_monotonic_increasing:
+        # 稳定排序: 重复时间戳保持数据源返回的先后顺序 (校验阶段保留最后一条)
+        result = result.sort_index(kind='stable')
+    return result
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """DataFrame 占用的内存 (含索引与 object 列的实际字符串)"""
+    return int(df.memory_usage(index=True, deep=True).sum())
@@ -0,0 +1,406 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .bar_schema import BAR_COLUMNS, normalize_bars
+
+# 本地 K 线库 (Bar Store)
+# 以 (market, symbol, period, adjust) 为键，将 OHLCV 数据持久化到 backend/data 下的 SQLite 文件。
+# 时间戳统一存储为 UTC 纪元纳秒 (int64)，读取时再转换回上海时间 (naive)，与 akshare 返回的数据保持一致。
+STORE_PATH = os.environ.get(
+    'BAR_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'bar_store.db')
+)
+
+MARKET_TZ = 'Asia/Shanghai'
+
+_init_lock = threading.Lock()
+_initialized_path = None
+
+BarKey = Tuple[str, str, str, str]
+
+
+def make_key(market: str, symbol: str, period: str, adjust: str = "qfq") -> BarKey:
+    """
+    构造 K 线库主键。
+
+    期货没有复权概念，统一记为空字符串，避免同一序列因 adjust 参数不同被重复存储。
+    """
+    if market == "futures":
+        adjust = ""
+    return (market, symbol, str(period), adjust or "")
+
+
+def _connect() -> sqlite3.Connection:
+    """
+    打开 K 线库连接 (每次调用独立连接，与 db.py 的用法一致)。
+
+    首次连接时建表并开启 WAL 模式，以便多线程/多进程并发读取。
+    """
+    global _initialized_path
+    conn = sqlite3.connect(STORE_PATH, timeout=30)
+    if _initialized_path != STORE_PATH:
+        with _init_lock:
+            if _initialized_path != STORE_PATH:
+                _init_schema(conn)
+                _initialized_path = STORE_PATH
+    return conn
+
+
+def _init_schema(conn: sqlite3.Connection):
+    """初始化 K 线库表结构"""
+    os.makedirs(os.path.dirname(STORE_PATH) or '.', exist_ok=True)
+    c = conn.cursor()
+    c.execute('PRAGMA journal_mode=WAL')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS bars (
+            market TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            period TEXT NOT NULL,
+            adjust TEXT NOT NULL,
+            ts INTEGER NOT NULL, -- UTC 纪元纳秒
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            hold REAL,
+            PRIMARY KEY (market, symbol, period, adjust, ts)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS bar_meta (
+            market TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            period TEXT NOT NULL,
+            adjust TEXT NOT NULL,
+            last_fetch REAL, -- 最近一次从数据源补齐的时间 (纪元秒)
+            covered_from INTEGER, -- 已从数据源获取的最早时间 (UTC 纪元纳秒)，NULL 表示已有完整历史
+            version INTEGER, -- 最近一次写入 K 线的时间 (纪元纳秒)，作为序列版本号供读取缓存校验
+            PRIMARY KEY (market, symbol, period, adjust)
+        )
+    ''')
+    # 兼容旧版本库文件: 补充 covered_from / version 列
+    columns = [row[1] for row in c.execute('PRAGMA table_info(bar_meta)').fetchall()]
+    if 'covered_from' not in columns:
+        c.execute('ALTER TABLE bar_meta ADD COLUMN covered_from INTEGER')
+    if 'version' not in columns:
+        c.execute('ALTER TABLE bar_meta ADD COLUMN version INTEGER')
+    conn.commit()
+
+
+def index_to_epoch_ns(index: pd.Index) -> np.ndarray:
+    """
+    将行情索引转换为 UTC 纪元纳秒。
+
+    naive 索引按上海时间解释；带时区的索引直接换算到 UTC。
+    """
+    idx = pd.DatetimeIndex(pd.to_datetime(index))
+    if idx.tz is None:
+        idx = idx.tz_localize(MARKET_TZ)
+    return idx.tz_convert('UTC').as_unit('ns').asi8
+
+
+def epoch_ns_to_index(values) -> pd.DatetimeIndex:
+    """将 UTC 纪元纳秒转换回上海时间的 naive 索引"""
+    idx = pd.to_datetime(np.asarray(values, dtype='int64'), unit='ns', utc=True)
+    idx = idx.tz_convert(MARKET_TZ).tz_localize(None)
+    idx.name = 'date'
+    return idx
+
+
+def to_market_time(value) -> Optional[pd.Timestamp]:
+    """将日期字符串或时间戳转换为上海时间 (naive)，带时区的时间先换算到上海时间"""
+    if value is None or value == "":
+        return None
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(MARKET_TZ).tz_localize(None)
+    return ts
+
+
+def read_bars(key: BarKey, start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None,
+              warmup_bars: int = 0) -> pd.DataFrame:
+    """
+    从 K 线库读取指定序列。
+
+    参数:
+        key: make_key 生成的主键
+        start/end: 可选的时间范围 (闭区间)，naive 时间按上海时间解释
+        warmup_bars: 额外返回 start 之前的 K 线数量 (指标预热)，仅在指定 start 时生效
+
+    返回:
+        pd.DataFrame: 以 date 为索引、按时间升序排列的 OHLCV 数据；无数据时返回空 DataFrame。
+    """
+    sql = 'SELECT ts, open, high, low, close, volume, hold FROM bars WHERE market=? AND symbol=? AND period=? AND adjust=?'
+    params = list(key)
+    start_ns = int(index_to_epoch_ns([start])[0]) if start is not None else None
+    if start_ns is not None:
+        sql += ' AND ts >= ?'
+        params.append(start_ns)
+    if end is not None:
+        sql += ' AND ts <= ?'
+        params.append(int(index_to_epoch_ns([end])[0]))
+    sql += ' ORDER BY ts'
+
+    conn = _connect()
+    try:
+        rows = conn.execute(sql, params).fetchall()
+        if start_ns is not None and warmup_bars > 0:
+            before = conn.execute(
+                'SELECT ts, open, high, low, close, volume, hold FROM bars '
+                'WHERE market=? AND symbol=? AND period=? AND adjust=? AND ts < ? ORDER BY ts DESC LIMIT ?',
+                list(key) + [start_ns, int(warmup_bars)]
+            ).fetchall()
+            rows = before[::-1] + rows
+    finally:
+        conn.close()
+
+    if not rows:
+        return pd.DataFrame()
+
+    arr = np.array(rows, dtype='float64')
+    df = pd.DataFrame(arr[:, 1:], columns=BAR_COLUMNS, index=epoch_ns_to_index(np.array([r[0] for r in rows], dtype='int64')))
+    # 股票没有持仓量，全空时去掉该列，保持与数据源返回的列一致
+    if df['hold'].isna().all():
+        df = df.drop(columns=['hold'])
+    return normalize_bars(df)
+
+
+def get_last_timestamp(key: BarKey) -> Optional[pd.Timestamp]:
+    """获取库中该序列最后一根 K 线的时间 (上海时间)，无数据返回 None"""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            'SELECT MAX(ts) FROM bars WHERE market=? AND symbol=? AND period=? AND adjust=?', key
+        ).fetchone()
+    finally:
+        conn.close()
+    if not row or row[0] is None:
+        return None
+    return epoch_ns_to_index([row[0]])[0]
+
+
+def _bar_rows(key: BarKey, df: pd.DataFrame) -> Tuple[np.ndarray, list]:
+    """将 DataFrame 转换为 bars 表的行 (NaN 写入为 NULL)"""
+    ts = index_to_epoch_ns(df.index)
+    cols = []
+    for col in BAR_COLUMNS:
+        if col in df.columns:
+            cols.append(pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64'))
+        else:
+            cols.append(np.full(len(df), np.nan))
+    values = np.column_stack(cols).astype(object)
+    values[pd.isna(values)] = None
+    return ts, [tuple(key) + (int(t),) + tuple(v) for t, v in zip(ts, values)]
+
+
+def _write(c: sqlite3.Cursor, key: BarKey, df: pd.DataFrame, replace: bool):
+    ts, rows = _bar_rows(key, df)
+    if replace:
+        c.execute('DELETE FROM bars WHERE market=? AND symbol=? AND period=? AND adjust=?', key)
+    else:
+        c.execute(
+            'DELETE FROM bars WHERE market=? AND symbol=? AND period=? AND adjust=? AND ts >= ? AND ts <= ?',
+            tuple(key) + (int(ts.min()), int(ts.max()))
+        )
+    c.executemany('INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    # 每次写入更新序列版本号 (其他进程写入后，本进程缓存的读取结果随之失效)
+    c.execute(
+        'INSERT INTO bar_meta (market, symbol, period, adjust, version) VALUES (?, ?, ?, ?, ?) '
+        'ON CONFLICT(market, symbol, period, adjust) DO UPDATE SET version=excluded.version',
+        tuple(key) + (time.time_ns(),)
+    )
+
+
+def write_bars(key: BarKey, df: pd.DataFrame, replace: bool = False):
+    """
+    写入 (补齐) 一段 K 线。
+
+    逻辑:
+        1. replace=True 时先清空该序列 (用于复权因子变化后的全量重建)。
+        2. 否则删除库中落在本次数据时间范围 [首根, 末根] 内的记录，再整体插入。
+           尾部补齐时最后一根未走完的 K 线会被新数据覆盖；头部回补时不影响之后的数据。
+        3. 更新 bar_meta.last_fetch。
+    """
+    if df is None or df.empty:
+        return
+
+    conn = _connect()
+    try:
+        c = conn.cursor()
+        _write(c, key, df, replace)
+        _touch(c, key)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def write_bars_batch(batch: List[Tuple[BarKey, pd.DataFrame]], touch: bool = True):
+    """
+    在一个事务中写入多个序列 (语义同 write_bars，replace=False)。
+
+    用于全市场批量更新，避免每个序列单独打开连接与提交。
+    touch=False 时不更新 last_fetch (数据并非来自该序列的数据源补齐，不影响过期判断)。
+    """
+    batch = [(key, df) for key, df in batch if df is not None and not df.empty]
+    if not batch:
+        return
+    conn = _connect()
+    try:
+        c = conn.cursor()
+        for key, df in batch:
+            _write(c, key, df, False)
+            if touch:
+                _touch(c, key)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def read_last_bars(keys: List[BarKey]) -> Dict[BarKey, pd.Series]:
+    """批量读取多个序列的最后一根 K 线，返回 {key: Series(name=时间)}，无数据的序列不包含在结果中"""
+    result = {}
+    conn = _connect()
+    try:
+        for key in keys:
+            row = conn.execute(
+                'SELECT ts, open, high, low, close, volume, hold FROM bars '
+                'WHERE market=? AND symbol=? AND period=? AND adjust=? ORDER BY ts DESC LIMIT 1', key
+            ).fetchone()
+            if row is not None:
+                result[key] = pd.Series(row[1:], index=BAR_COLUMNS, dtype='float64',
+                                        name=epoch_ns_to_index([row[0]])[0])
+    finally:
+        conn.close()
+    return result
+
+
+def list_series(market: Optional[str] = None, period: Optional[str] = None) -> List[BarKey]:
+    """列出库中已有的序列键，可按市场与周期过滤"""
+    sql = 'SELECT market, symbol, period, adjust FROM bar_meta WHERE 1=1'
+    params = []
+    if market is not None:
+        sql += ' AND market=?'
+        params.append(market)
+    if period is not None:
+        sql += ' AND period=?'
+        params.append(str(period))
+    conn = _connect()
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    return [tuple(r) for r in rows]
+
+
+def _touch(c: sqlite3.Cursor, key: BarKey):
+    c.execute(
+        'INSERT INTO bar_meta (market, symbol, period, adjust, last_fetch) VALUES (?, ?, ?, ?, ?) '
+        'ON CONFLICT(market, symbol, period, adjust) DO UPDATE SET last_fetch=excluded.last_fetch',
+        tuple(key) + (time.time(),)
+    )
+
+
+def touch(key: BarKey):
+    """仅更新最近补齐时间 (数据源无新 K 线时调用)"""
+    conn = _connect()
+    try:
+        _touch(conn.cursor(), key)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_last_fetch(key: BarKey) -> Optional[float]:
+    """获取该序列最近一次从数据源补齐的时间 (纪元秒)"""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            'SELECT last_fetch FROM bar_meta WHERE market=? AND symbol=? AND period=? AND adjust=?', key
+        ).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def get_version(key: BarKey) -> Optional[int]:
+    """获取序列的版本号 (每次写入 K 线时更新)，无记录返回 None"""
+    conn = _connect()
+    try:
+        row = conn.execute(
+            'SELECT version FROM bar_meta WHERE market=? AND symbol=? AND period=? AND adjust=?', key
+        ).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def get_coverage(key: BarKey) -> Tuple[bool, Optional[pd.Timestamp]]:
+    """
+    获取序列的历史覆盖范围。
+
+    返回:
+        (是否有元数据, 已获取的最早时间)；最早时间为 None 表示已获取数据源的完整历史。
+    """
+    conn = _connect()
+    try:
+        row = conn.execute(
+            'SELECT covered_from FROM bar_meta WHERE market=? AND symbol=? AND period=? AND adjust=?', key
+        ).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return False, None
+    return True, (epoch_ns_to_index([row[0]])[0] if row[0] is not None else None)
+
+
+def set_coverage(key: BarKey, covered_from: Optional[pd.Timestamp]):
+    """记录序列已从数据源获取的最早时间，None 表示完整历史"""
+    value = int(index_to_epoch_ns([covered_from])[0]) if covered_from is not None else None
+    conn = _connect()
+    try:
+        conn.execute(
+            'INSERT INTO bar_meta (market, symbol, period, adjust, covered_from) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(market, symbol, period, adjust) DO UPDATE SET covered_from=excluded.covered_from',
+            tuple(key) + (value,)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def delete_series(key: BarKey):
+    """删除整个序列 (含元数据)"""
+    conn = _connect()
+    try:
+        conn.execute('DELETE FROM bars WHERE market=? AND symbol=? AND period=? AND adjust=?', key)
+        conn.execute('DELETE FROM bar_meta WHERE market=? AND symbol=? AND period=? AND adjust=?', key)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def series_info(key: BarKey) -> Optional[Tuple[int, pd.Timestamp, pd.Timestamp]]:
+    """
+    获取库中序列的概要信息。
+
+    返回:
+        (K 线数量, 首根时间, 末根时间)；库中无该序列时返回 None。
+    """
+    conn = _connect()
+    try:
+        row = conn.execute(
+            'SELECT COUNT(*), MIN(ts), MAX(ts) FROM bars WHERE market=? AND symbol=? AND period=? AND adjust=?', key
+        ).fetchone()
+    finally:
+        conn.close()
+    if not row or not row[0]:
+        return None
+    first, last = epoch_ns_to_index([row[1], row[2]])
+    return row[0], first, last
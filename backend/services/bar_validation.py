@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .bar_expiry import get_sessions, trading_day_closes
+from .futures_master import get_contract_info
+
+# 入库前的 K 线校验与修复 (Bar Validation)
+# 数据源返回的数据在写入 K 线库/返回前统一校验 (均为向量化操作):
+#   1. 重复时间戳只保留最后一条 (数据源后返回的记录为准)，保证索引唯一且升序；
+#   2. 收盘价缺失或非正的 K 线无法修复，直接丢弃；开/高/低缺失或非正时以收盘价代替；
+#      最高价/最低价修正为四个价格的最大/最小值 (修复 high < low 等)；负成交量记为 0；
+#   3. 分钟周期中时间戳不在合约交易时段内的 K 线丢弃 (期货合约缺少时段配置时不检查)；
+#   4. 按合约交易时段模板检查最近 BAR_VALIDATION_GAP_DAYS 天内缺失的分钟 K 线，只计数不修改。
+# 下游 (指标计算、信号检测) 可以假定索引唯一、升序、价格有效。各标的的校验计数见 get_quality()。
+BAR_VALIDATION_ENABLED = os.environ.get('BAR_VALIDATION_ENABLED', '1') != '0'
+BAR_VALIDATION_GAP_DAYS = int(os.environ.get('BAR_VALIDATION_GAP_DAYS', '5'))
+
+_COUNTERS = ("bars", "duplicates", "dropped", "repaired", "out_of_session", "gaps")
+
+_lock = threading.Lock()
+# 各标的的累计校验计数 {"market:symbol": {"fetches": 次数, "bars": ..., "last_issue": ...}}
+_quality: Dict[str, Dict] = {}
+
+
+def _is_intraday(period: str) -> bool:
+    return str(period).isdigit()
+
+
+def _session_template(symbol: str, market: str) -> Optional[List]:
+    """合约交易时段 (分钟区间列表)；期货合约没有时段配置时返回 None"""
+    if market == 'futures' and not get_contract_info(symbol).get('day_hours'):
+        return None
+    day, night = get_sessions(symbol, market)
+    return day + night
+
+
+def _in_session_mask(index: pd.DatetimeIndex, sessions: List) -> np.ndarray:
+    """时间戳是否落在任一交易时段内 (含开始与结束时刻)，跨零点的夜盘按次日分钟判断"""
+    minutes = (index.hour * 60 + index.minute).to_numpy()
+    mask = np.zeros(len(index), dtype=bool)
+    for s, e in sessions:
+        mask |= (minutes >= s) & (minutes <= e)
+        if e > 1440:
+            mask |= (minutes + 1440 >= s) & (minutes + 1440 <= e)
+    return mask
+
+
+def find_gaps(df: pd.DataFrame, symbol: str, market: str, period: str, days: int = None) -> pd.DatetimeIndex:
+    """
+    返回最近 days 天内按交易时段模板应有但缺失的分钟 K 线收盘时刻。
+
+    只检查数据中出现过的自然日 (整日无数据视为休市)，最后一根 K 线之后的时刻不计入。
+    """
+    days = BAR_VALIDATION_GAP_DAYS if days is None else days
+    if df.empty or not _is_intraday(period) or days <= 0:
+        return pd.DatetimeIndex([])
+    last = df.index[-1]
+    start = max(df.index[0], last.normalize() - pd.Timedelta(days=days))
+    expected = []
+    day = start.normalize().to_pydatetime()
+    # 夜盘归属下一交易日，多取一天以覆盖最后一晚
+    while day <= last.to_pydatetime() + timedelta(days=1):
+        expected += trading_day_closes(symbol, market, period, day)
+        day += timedelta(days=1)
+    expected = pd.DatetimeIndex(expected).as_unit('ns')
+    expected = expected[(expected >= start) & (expected <= last)]
+    missing = expected[~expected.isin(df.index)]
+    return missing[missing.normalize().isin(df.index.normalize())]
+
+
+def validate_bars(df: pd.DataFrame, symbol: str, market: str, period: str) -> pd.DataFrame:
+    """
+    校验并修复一段 K 线 (normalize_bars 之后的格式)，返回清洗后的数据并累计该标的的质量计数。
+    """
+    if not BAR_VALIDATION_ENABLED or df is None or df.empty:
+        return df
+    attrs = dict(df.attrs)
+    counts = dict.fromkeys(_COUNTERS, 0)
+
+    # 1. 索引去重 (保留最后一条) 并保证升序
+    dup = df.index.duplicated(keep='last')
+    counts["duplicates"] = int(dup.sum())
+    if counts["duplicates"]:
+        df = df[~dup]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind='stable')
+
+    # 2. 价格校验与修复
+    keep = np.ones(len(df), dtype=bool)
+    if 'close' in df.columns:
+        close = df['close'].to_numpy(dtype='float64')
+        keep &= np.isfinite(close) & (close > 0)
+        prices = {'close': close}
+        repaired = np.zeros(len(df), dtype=bool)
+        for col in ('open', 'high', 'low'):
+            if col in df.columns:
+                values = df[col].to_numpy(dtype='float64')
+                bad = ~(np.isfinite(values) & (values > 0))
+                repaired |= bad
+                prices[col] = np.where(bad, close, values)
+        stacked = np.vstack(list(prices.values()))
+        if 'high' in prices:
+            high = stacked.max(axis=0)
+            repaired |= high != prices['high']
+            prices['high'] = high
+        if 'low' in prices:
+            low = stacked.min(axis=0)
+            repaired |= low != prices['low']
+            prices['low'] = low
+        repaired &= keep
+        counts["repaired"] = int(repaired.sum())
+        if counts["repaired"]:
+            df = df.copy()
+            for col, values in prices.items():
+                df[col] = values
+    if 'volume' in df.columns and (df['volume'] < 0).any():
+        df = df.copy()
+        df['volume'] = df['volume'].clip(lower=0)
+
+    # 3. 分钟周期剔除交易时段外的 K 线
+    sessions = _session_template(symbol, market) if _is_intraday(period) else None
+    if sessions:
+        outside = ~_in_session_mask(df.index, sessions)
+        counts["out_of_session"] = int((outside & keep).sum())
+        keep &= ~outside
+
+    counts["dropped"] = int((~keep).sum())
+    if counts["dropped"]:
+        df = df[keep]
+
+    # 4. 缺口检查 (只计数)
+    gaps = find_gaps(df, symbol, market, period) if sessions else pd.DatetimeIndex([])
+    counts["gaps"] = len(gaps)
+    counts["bars"] = len(df)
+
+    _record(symbol, market, period, counts, gaps)
+    df.attrs.update(attrs)
+    return df
+
+
+def _record(symbol: str, market: str, period: str, counts: Dict[str, int], gaps: pd.DatetimeIndex):
+    issues = counts["duplicates"] + counts["dropped"] + counts["repaired"] + counts["gaps"]
+    with _lock:
+        entry = _quality.setdefault(f"{market}:{symbol}", {"fetches": 0, **dict.fromkeys(_COUNTERS, 0), "last_issue": None})
+        entry["fetches"] += 1
+        for name in _COUNTERS:
+            entry[name] += counts[name]
+        if issues:
+            entry["last_issue"] = {
+                "period": period,
+                "at": time.time(),
+                **{name: counts[name] for name in _COUNTERS if name != "bars"},
+                "gap_samples": [str(ts) for ts in gaps[:5]],
+            }
+
+
+def get_quality(symbol: str = None, market: str = None) -> Dict[str, Dict]:
+    """返回各标的的累计校验计数 (副本)，可按代码/市场过滤"""
+    with _lock:
+        return {
+            key: dict(value) for key, value in _quality.items()
+            if (market is None or key.split(':', 1)[0] == market) and (symbol is None or key.split(':', 1)[1] == symbol)
+        }
+
+
+def reset_quality():
+    with _lock:
+        _quality.clear()
@@ -3,11 +3,24 @@ import matplotlib.pyplot as plt
 import io
 import zipfile
 import os
+import threading
+from functools import wraps
 
 # Set font for Chinese characters - try common Windows Chinese fonts
 plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial Unicode MS', 'SimSun']
 plt.rcParams['axes.unicode_minus'] = False
 
+# pyplot uses global figure state and is not thread-safe; exports render charts from the detect worker pool
+_pyplot_lock = threading.Lock()
+
+def _serialized(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _pyplot_lock:
+            return fn(*args, **kwargs)
+    return wrapper
+
+@_serialized
 def create_dkx_plot(df, symbol, symbol_name, signal_date=None):
     """Generate DKX plot image bytes"""
     plt.figure(figsize=(12, 6))
@@ -53,6 +66,7 @@ def create_dkx_plot(df, symbol, symbol_name, signal_date=None):
     buf.seek(0)
     return buf.read()
 
+@_serialized
 def create_ma_plot(df, symbol, symbol_name, short_period, long_period, signal_date=None):
     """Generate MA plot image bytes"""
     plt.figure(figsize=(12, 6))
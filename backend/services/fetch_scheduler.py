@@ -0,0 +1,247 @@
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+# 上游请求调度 (Fetch Scheduler)
+# 所有经 providers.provider 发出的数据源请求在发出前按数据源 (东方财富/新浪/腾讯) 领取令牌:
+#   - 每个数据源一个令牌桶，按 FETCH_RATE_LIMITS 的速率 (次/秒) 补充，最多积攒 FETCH_BURST 个；
+#   - 令牌不足时请求排队，按优先级 interactive (用户请求) > scan (定时扫描) > backfill (预热/归档/脚本)
+#     依次放行，同一优先级先到先得，后台任务不会挤占用户请求的配额。
+# 优先级通过 fetch_priority() 设置在当前上下文中 (contextvars)，同一线程内的所有 get_market_data
+# 调用继承该优先级；未设置时视为 interactive。
+# 限速与优先级只在本进程内生效，不是跨进程的中央调度: 多个 uvicorn worker 各有一套令牌桶，
+# 独立运行的脚本也只限制自身的请求速率，无法让出服务进程中用户请求的配额。
+# 单飞合并的获取以 leader 的优先级领取令牌；更高优先级的调用者合并进来时，通过 PriorityBoost
+# 把在途获取 (包括正在排队的请求) 提升到该调用者的优先级，避免用户请求被压在后台回填的优先级上。
+FETCH_SCHEDULER_ENABLED = os.environ.get('FETCH_SCHEDULER_ENABLED', '1') != '0'
+# 各数据源的速率 (次/秒)，0 表示不限速；未列出的数据源使用 default
+FETCH_RATE_LIMITS = os.environ.get('FETCH_RATE_LIMITS', 'em=5,sina=3,tx=2,default=5')
+FETCH_BURST = max(1.0, float(os.environ.get('FETCH_BURST', '3')))
+
+PRIORITIES = ('interactive', 'scan', 'backfill')
+
+# akshare 接口所属的数据源
+FUNCTION_SOURCES = {
+    'stock_zh_a_hist': 'em',
+    'stock_zh_a_hist_min_em': 'em',
+    'stock_zh_a_spot_em': 'em',
+    'stock_zh_a_hist_tx': 'tx',
+    'stock_zh_a_minute': 'sina',
+    'futures_zh_minute_sina': 'sina',
+    'futures_zh_daily_sina': 'sina',
+    'futures_contract_detail': 'sina',
+    'index_stock_cons': 'sina',
+}
+
+_priority = contextvars.ContextVar('fetch_priority', default='interactive')
+# 当前上下文所属的可提升优先级 (单飞 leader 执行期间设置)，优先于 _priority
+_boost = contextvars.ContextVar('fetch_priority_boost', default=None)
+
+
+def _parse_rates(spec: str) -> Dict[str, float]:
+    """将 'em=5,sina=3' 解析为 {数据源: 速率}"""
+    rates = {}
+    for item in spec.split(','):
+        name, _, value = item.partition('=')
+        if name.strip() and value.strip():
+            rates[name.strip()] = float(value)
+    rates.setdefault('default', 5.0)
+    return rates
+
+
+@contextmanager
+def fetch_priority(priority: str):
+    """在 with 块内以指定优先级发出数据源请求"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"未知的请求优先级: {priority}")
+    token = _priority.set(priority)
+    # 显式指定的优先级不受外层合并请求的提升影响
+    boost_token = _boost.set(None)
+    try:
+        yield
+    finally:
+        _boost.reset(boost_token)
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    boost = _boost.get()
+    return boost.priority if boost is not None else _priority.get()
+
+
+class PriorityBoost:
+    """
+    一次合并请求的可提升优先级 (供 SingleFlight 使用)。
+
+    创建时取当前上下文的优先级；leader 在 scope() 内执行获取，其间的令牌领取按 priority 排队。
+    其他调用者合并进来时调用 join()，若其优先级更高则提升 priority，正在排队的请求随即重新排序。
+    """
+
+    __slots__ = ("priority",)
+
+    def __init__(self):
+        self.priority = current_priority()
+
+    def join(self):
+        priority = current_priority()
+        if PRIORITIES.index(priority) < PRIORITIES.index(self.priority):
+            self.priority = priority
+            scheduler.wake()
+
+    @contextmanager
+    def scope(self):
+        token = _boost.set(self)
+        try:
+            yield
+        finally:
+            _boost.reset(token)
+
+
+def source_of(function_name: str) -> str:
+    return FUNCTION_SOURCES.get(function_name, 'default')
+
+
+class _Bucket:
+    __slots__ = ("rate", "burst", "tokens", "updated_at", "waiters", "acquired", "waiting", "wait_total", "wait_max")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.waiters = []  # 排队中的请求 (优先级序号, 到达序号)，堆顶最先放行
+        self.acquired = {p: 0 for p in PRIORITIES}
+        self.waiting = {p: 0 for p in PRIORITIES}
+        self.wait_total = {p: 0.0 for p in PRIORITIES}
+        self.wait_max = {p: 0.0 for p in PRIORITIES}
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+class FetchScheduler:
+    def __init__(self, rates: Dict[str, float] = None, burst: float = None, enabled: bool = None):
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self.configure(rates, burst, enabled)
+
+    def configure(self, rates: Dict[str, float] = None, burst: float = None, enabled: bool = None):
+        """调整速率/突发量/开关 (测试与基准中使用)，令牌桶与统计被清空，正在排队的请求按原令牌桶放行"""
+        with self._cond:
+            self.rates = dict(rates) if rates is not None else _parse_rates(FETCH_RATE_LIMITS)
+            self.rates.setdefault('default', 5.0)
+            self.burst = float(burst) if burst is not None else FETCH_BURST
+            self.enabled = FETCH_SCHEDULER_ENABLED if enabled is None else enabled
+            self._buckets: Dict[str, _Bucket] = {}
+            self._cond.notify_all()
+
+    def _bucket(self, source: str) -> _Bucket:
+        bucket = self._buckets.get(source)
+        if bucket is None:
+            rate = self.rates.get(source, self.rates['default'])
+            bucket = self._buckets[source] = _Bucket(rate, self.burst)
+        return bucket
+
+    def acquire(self, source: str, priority: Optional[str] = None) -> float:
+        """
+        为一次请求领取 source 的令牌，必要时阻塞排队，返回等待时长 (秒)。
+
+        逻辑:
+            1. 请求按 (优先级, 到达顺序) 进入该数据源的等待堆。
+            2. 只有堆顶的请求可以取走令牌；令牌不足时按补充速率计算需等待的时长后重试。
+            3. 放行后唤醒其他等待者，由新的堆顶继续领取。
+            4. 未显式指定优先级且处于合并请求中时，排队期间优先级被提升则按新优先级重新入堆。
+        """
+        boost = None if priority else _boost.get()
+        priority = priority or current_priority()
+        rank = PRIORITIES.index(priority)
+        start = time.monotonic()
+        with self._cond:
+            if not self.enabled:
+                return 0.0
+            bucket = self._bucket(source)
+            if bucket.rate <= 0:
+                bucket.acquired[priority] += 1
+                return 0.0
+            entry = (rank, next(self._seq))
+            heapq.heappush(bucket.waiters, entry)
+            bucket.waiting[priority] += 1
+            try:
+                while True:
+                    if boost is not None and boost.priority != priority:
+                        bucket.waiters.remove(entry)
+                        bucket.waiting[priority] -= 1
+                        priority = boost.priority
+                        entry = (PRIORITIES.index(priority), entry[1])
+                        bucket.waiters.append(entry)
+                        heapq.heapify(bucket.waiters)
+                        bucket.waiting[priority] += 1
+                    now = time.monotonic()
+                    bucket.refill(now)
+                    if bucket.waiters[0] == entry and bucket.tokens >= 1:
+                        heapq.heappop(bucket.waiters)
+                        bucket.tokens -= 1
+                        break
+                    self._cond.wait(timeout=max((1 - bucket.tokens) / bucket.rate, 0.001))
+            except BaseException:
+                bucket.waiters.remove(entry)
+                heapq.heapify(bucket.waiters)
+                bucket.waiting[priority] -= 1
+                self._cond.notify_all()
+                raise
+            bucket.waiting[priority] -= 1
+            waited = time.monotonic() - start
+            bucket.acquired[priority] += 1
+            bucket.wait_total[priority] += waited
+            bucket.wait_max[priority] = max(bucket.wait_max[priority], waited)
+            self._cond.notify_all()
+        return waited
+
+    def wake(self):
+        """唤醒排队中的请求重新检查 (如优先级被提升后)"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def wrap(self, function_name: str, fn: Callable) -> Callable:
+        """包装数据源接口: 每次调用前按其所属数据源领取令牌"""
+        source = source_of(function_name)
+
+        def scheduled(*args, **kwargs):
+            self.acquire(source)
+            return fn(*args, **kwargs)
+
+        scheduled.__name__ = function_name
+        scheduled.__wrapped__ = fn
+        return scheduled
+
+    def stats(self) -> Dict[str, Any]:
+        """各数据源的速率、剩余令牌、队列深度及各优先级的放行数与等待时长 (秒)"""
+        with self._cond:
+            now = time.monotonic()
+            sources = {}
+            for name, bucket in self._buckets.items():
+                bucket.refill(now)
+                sources[name] = {
+                    "rate": bucket.rate,
+                    "tokens": round(bucket.tokens, 3),
+                    "queue_depth": len(bucket.waiters),
+                    "priorities": {
+                        p: {
+                            "acquired": bucket.acquired[p],
+                            "waiting": bucket.waiting[p],
+                            "avg_wait": round(bucket.wait_total[p] / bucket.acquired[p], 4) if bucket.acquired[p] else 0.0,
+                            "max_wait": round(bucket.wait_max[p], 4),
+                        }
+                        for p in PRIORITIES
+                    },
+                }
+            return {"enabled": self.enabled, "burst": self.burst, "sources": sources}
+
+
+scheduler = FetchScheduler()
@@ -0,0 +1,166 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .bar_schema import frame_nbytes
+
+# 进程内 DataFrame 缓存 (Frame Cache)
+# 以字节为单位限制总内存 (按每个条目的实际占用计算)，超出预算时按 LRU 顺序淘汰。
+# 准入采用 TinyLFU 思路: 用 Count-Min Sketch 近似统计每个键最近的访问频率，
+# 缓存已满时只有当新条目的访问频率高于将被淘汰的条目时才写入，
+# 因此一次性的全市场扫描 (每个标的只访问一次) 不会把常看的自选标的挤出缓存。
+# 频率计数在累计一定访问次数后整体减半，旧的热点会逐渐让位于新的热点。
+BAR_FRAME_CACHE_BYTES = int(float(os.environ.get('BAR_FRAME_CACHE_MB', '256')) * 1024 * 1024)
+INDICATOR_FRAME_CACHE_BYTES = int(float(os.environ.get('INDICATOR_FRAME_CACHE_MB', '64')) * 1024 * 1024)
+
+_SKETCH_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+_MASK64 = (1 << 64) - 1
+
+
+# pandas 写时复制 (pandas>=3 始终开启): 开启时浅拷贝即可隔离调用方的修改
+_COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3 or pd.options.mode.copy_on_write is True
+
+
+def detach(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    返回可供调用方原地修改的 DataFrame，不影响缓存中的对象。
+
+    写时复制开启时为浅拷贝 (共享底层数组，修改时才复制)，否则深拷贝。
+    """
+    return df.copy(deep=not _COPY_ON_WRITE)
+
+
+class FrequencySketch:
+    """
+    4 行的 Count-Min Sketch，计数上限 15。
+
+    每累计 sample_size 次访问后所有计数减半 (老化)，估计值取各行计数的最小值。
+    """
+
+    def __init__(self, width: int = 1 << 14):
+        self.bits = max(4, int(width - 1).bit_length())
+        self.width = 1 << self.bits
+        self.table = np.zeros((len(_SKETCH_SEEDS), self.width), dtype=np.uint8)
+        self.sample_size = 10 * self.width
+        self.additions = 0
+
+    def _slots(self, key: Hashable):
+        h = hash(key) & _MASK64
+        return [((h ^ seed) * 0x9E3779B97F4A7C15 & _MASK64) >> (64 - self.bits) for seed in _SKETCH_SEEDS]
+
+    def increment(self, key: Hashable):
+        for row, slot in enumerate(self._slots(key)):
+            if self.table[row, slot] < 15:
+                self.table[row, slot] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.table >>= 1
+            self.additions //= 2
+
+    def estimate(self, key: Hashable) -> int:
+        return int(min(self.table[row, slot] for row, slot in enumerate(self._slots(key))))
+
+
+class FrameCache:
+    """
+    按字节预算限制的 DataFrame 缓存。
+
+    条目可带版本号 (如 K 线库中序列的写入版本)，读取时版本不一致视为未命中并删除该条目。
+    缓存中保存的是调用方传入的对象本身，调用方不应原地修改取出的 DataFrame (需要时先 detach)。
+    """
+
+    def __init__(self, name: str, budget_bytes: int):
+        self.name = name
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (version, frame, nbytes)
+        self._bytes = 0
+        self._sketch = FrequencySketch()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "rejections": 0, "puts": 0}
+
+    def get(self, key: Hashable, version: Any = None) -> Optional[pd.DataFrame]:
+        with self._lock:
+            self._sketch.increment(key)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != version:
+                self._remove(key)
+                self._stats["stale"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key: Hashable, frame: pd.DataFrame, version: Any = None, nbytes: int = None) -> bool:
+        """
+        写入条目，返回是否被接纳。
+
+        逻辑:
+            1. 超过整个预算的条目直接拒绝；已有同键条目时先移除。
+            2. 空间不足时从最久未访问的条目起确定需要淘汰的条目，
+               只有新条目的访问频率高于其中每一个时才淘汰它们并写入，否则拒绝写入。
+        """
+        nbytes = frame_nbytes(frame) if nbytes is None else nbytes
+        with self._lock:
+            if nbytes > self.budget_bytes:
+                self._stats["rejections"] += 1
+                return False
+            if key in self._entries:
+                self._remove(key)
+            needed = self._bytes + nbytes - self.budget_bytes
+            if needed > 0:
+                freq = self._sketch.estimate(key)
+                victims = []
+                for victim, (_, _, size) in self._entries.items():
+                    if self._sketch.estimate(victim) >= freq:
+                        self._stats["rejections"] += 1
+                        return False
+                    victims.append(victim)
+                    needed -= size
+                    if needed <= 0:
+                        break
+                for victim in victims:
+                    self._remove(victim)
+                    self._stats["evictions"] += 1
+            self._entries[key] = (version, frame, nbytes)
+            self._bytes += nbytes
+            self._stats["puts"] += 1
+            return True
+
+    def _remove(self, key: Hashable):
+        _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """命中/未命中/版本过期/淘汰/拒绝准入次数，以及当前条目数与占用字节"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(entries=len(self._entries), bytes=self._bytes, budget_bytes=self.budget_bytes)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# K 线库读取结果 (按序列与时间窗口) 与指标计算结果及信号时间线 (按序列写入版本与窗口) 的缓存
+bar_frames = FrameCache("bars", BAR_FRAME_CACHE_BYTES)
+indicator_frames = FrameCache("indicators", INDICATOR_FRAME_CACHE_BYTES)
+
+
+def get_stats() -> Dict[str, Dict]:
+    return {cache.name: cache.stats() for cache in (bar_frames, indicator_frames)}
@@ -0,0 +1,101 @@
+import math
+from typing import Tuple
+
+import numpy as np
+
+# 指标计算内核 (Indicator Kernels)
+# DKX 的 20 周期加权移动平均与 MADKX 的 10 周期均值都表示为 "窗口内加权求和 / 权重之和"，
+# 按窗口内位置从旧到新依次累加: acc = w[0]*x[t-n+1] + w[1]*x[t-n+2] + ... + w[n-1]*x[t]。
+# 向量化实现对整个序列按位置平移后逐项相加 (每项一次数组运算，共 n 次)，累加顺序固定，
+# 结果与窗口起点无关 (截取任意一段重算，重叠部分结果逐位一致)；
+# 逐根更新的实现 (见 streaming_indicators) 对单个窗口按相同顺序累加，结果同样逐位一致。
+# 不采用基于滑动求和递推的 WMA 公式: 递推会累积舍入误差，结果随序列起点漂移。
+# 窗口长度固定且较短 (20 / 10)，n 次数组运算的开销可以接受；周期可变的双均线仍用 rolling().mean() (O(n))。
+# rolling().mean() 的舍入误差与序列起点有关，两条均线数学上相等或极为接近时会左右交叉判断。
+# 因此两者之差在 MA_TIE_GUARD (相对误差，远大于 rolling 的误差、远小于实际价格差) 以内的位置
+# 按窗口内的值重新精确求和后比较 (见 resolve_ma_ties)，整段计算与逐根更新的交叉判断因此逐根一致。
+
+# DKX: MID 的 20 周期加权移动平均，权重 1..20 (越新的 K 线权重越大)，权重之和 210
+DKX_WINDOW = 20
+DKX_WEIGHTS = np.arange(1, DKX_WINDOW + 1, dtype=np.float64)
+
+# MADKX: DKX 的 10 周期简单移动平均
+MADKX_WINDOW = 10
+MADKX_WEIGHTS = np.ones(MADKX_WINDOW, dtype=np.float64)
+
+# 双均线的临界相对差
+MA_TIE_GUARD = 1e-9
+
+
+def dkx_mid(open_, high, low, close):
+    """MID = (3 * Close + Low + Open + High) / 6 (标量或数组)"""
+    return (3 * close + low + open_ + high) / 6
+
+
+def weighted_window_mean(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    滑动窗口加权平均，窗口长度为 len(weights)，weights[-1] 对应窗口内最新的值。
+
+    前 len(weights)-1 个位置以及窗口内含 NaN 的位置结果为 NaN (同 rolling 默认的 min_periods)。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n, w = len(values), len(weights)
+    out = np.full(n, np.nan)
+    if n < w:
+        return out
+    m = n - w + 1
+    acc = weights[0] * values[:m]
+    for k in range(1, w):
+        acc = acc + weights[k] * values[k:k + m]
+    out[w - 1:] = acc / weights.sum()
+    return out
+
+
+def window_mean_at(values, weights: np.ndarray) -> float:
+    """单个窗口的加权平均 (values 为窗口内从旧到新的值)，累加顺序与 weighted_window_mean 相同"""
+    acc = weights[0] * values[0]
+    for k in range(1, len(weights)):
+        acc = acc + weights[k] * values[k]
+    return acc / weights.sum()
+
+
+def find_crosses(fast: np.ndarray, slow: np.ndarray, first: int = 0, stop: int = None):
+    """
+    查找 [first, stop) 行范围内快线与慢线的交叉 (第一行只作为前一根 K 线参与比较)。
+
+    金叉: 前一根 fast < slow 且当根 fast > slow；死叉相反。
+    返回 (positions, buy): 交叉所在的行号 (升序) 与各交叉是否为金叉。
+    以两者之差的符号整体比较相邻两行；NaN 的符号仍为 NaN，与任何值比较均为 False，不产生交叉。
+    """
+    stop = len(fast) if stop is None else stop
+    if stop - first < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)
+    side = np.sign(fast[first:stop] - slow[first:stop])
+    buy = (side[:-1] < 0) & (side[1:] > 0)
+    sell = (side[:-1] > 0) & (side[1:] < 0)
+    hits = np.flatnonzero(buy | sell)
+    return hits + first + 1, buy[hits]
+
+
+
+def exact_mean_pair(a, b) -> Tuple[float, float]:
+    """
+    两个窗口 (a、b 为窗口内从旧到新的值) 的均值，窗口内的值按 math.fsum 重新求和 (正确舍入)。
+
+    结果只取决于窗口内的值，与序列起点、累加顺序及滑动求和的舍入误差无关。
+    """
+    return math.fsum(a) / len(a), math.fsum(b) / len(b)
+
+
+def resolve_ma_ties(close: np.ndarray, fast: np.ndarray, slow: np.ndarray, fast_period: int, slow_period: int):
+    """
+    原地修正 fast / slow 两条均线 (rolling 结果) 中两者接近 (相对差不超过 MA_TIE_GUARD) 的位置。
+
+    这些位置的均线改为 exact_mean_pair 按窗口内的值重新求和的结果，与 find_crosses 相同以两者之差的符号
+    判断大小 (相等时符号为 0，不构成交叉)。整段计算与逐根更新 (streaming_indicators) 在临界位置得到相同的值，
+    交叉判断不受舍入误差影响。
+    """
+    near = np.flatnonzero(np.abs(fast - slow) <= MA_TIE_GUARD * np.maximum(np.abs(fast), np.abs(slow)))
+    for i in near:
+        fast[i], slow[i] = exact_mean_pair(close[i - fast_period + 1:i + 1].tolist(),
+                                           close[i - slow_period + 1:i + 1].tolist())
@@ -1,25 +1,380 @@
-import akshare as ak
 import pandas as pd
 import numpy as np
 from typing import List, Optional
-from .resample_utils import resample_data
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import bar_store, bar_expiry, shared_bars
+from .providers import provider
+from .bar_schema import normalize_bars
+from .bar_validation import validate_bars
+from .frame_cache import bar_frames, indicator_frames, detach
+from .time_index import cross_window, format_times
+from .indicator_kernels import dkx_mid, weighted_window_mean, find_crosses, resolve_ma_ties, DKX_WEIGHTS, MADKX_WEIGHTS
+from .signal_timeline import SignalTimeline
+from .singleflight import SingleFlight
+from .fetch_scheduler import fetch_priority, PriorityBoost
+from .source_registry import registry as source_registry, SourceUnavailable, SourceRejected
+from .period_derivation import (
+    select_base_period, fetch_base, derive_period, bars_per_period, warmup_start, trim_to_window
+)
 
-def get_market_data(symbol: str, market: str = "stock", period: str = "daily", adjust: str = "qfq", start_date: str = None, end_date: str = None) -> pd.DataFrame:
+# 本地 K 线库开关及补齐间隔 (秒)。
+# 同一序列在间隔内重复请求时直接读库，不访问数据源。
+BAR_STORE_ENABLED = os.environ.get('BAR_STORE_ENABLED', '1') != '0'
+
+# 过期缓存先返回、后台刷新 (Stale-While-Revalidate)
+# 开启后，库中序列已过期 (之后又有 K 线收盘) 但过期时长不超过 MARKET_DATA_MAX_STALENESS 秒时，
+# 直接返回库中数据并在后台线程补齐，请求不等待数据源；过期更久时仍同步补齐。
+# 返回数据的 attrs['data_age'] 为其过期时长 (秒，0 表示最新)，检测结果中以 data_age 上报。
+MARKET_DATA_SWR = os.environ.get('MARKET_DATA_SWR', '0') == '1'
+MARKET_DATA_MAX_STALENESS = float(os.environ.get('MARKET_DATA_MAX_STALENESS', '300'))
+MARKET_DATA_REVALIDATE_WORKERS = max(1, int(os.environ.get('MARKET_DATA_REVALIDATE_WORKERS', '4')))
+
+INTRADAY_PERIODS = ["240", "180", "120", "90", "60", "30", "15", "5", "1"]
+
+# 行情获取的单飞合并: 相同参数的并发请求只访问一次数据源，
+# 更高优先级的请求合并进来时在途获取按其优先级领取令牌
+_market_data_flight = SingleFlight(boost_factory=PriorityBoost)
+
+# 后台刷新线程池及正在刷新的序列 (同一序列同时只有一个刷新任务)
+_revalidate_executor = ThreadPoolExecutor(max_workers=MARKET_DATA_REVALIDATE_WORKERS, thread_name_prefix="revalidate")
+_revalidating = set()
+_revalidate_lock = threading.Lock()
+
+def get_market_data(symbol: str, market: str = "stock", period: str = "daily", adjust: str = "qfq", start_date: str = None, end_date: str = None, warmup_bars: int = 0) -> pd.DataFrame:
+    """
+    获取市场数据。
+    
+    相同参数的并发调用 (如多个用户同时查看热门合约) 会被合并为一次获取，
+    所有调用者共享结果；共享时每个调用者拿到独立副本，可放心原地修改。
+    参数与返回值同 _load_market_data。
+    """
+    key = (symbol, market, period, adjust, start_date, end_date, warmup_bars)
+    df, shared = _market_data_flight.do(key, _load_market_data, symbol, market, period, adjust, start_date, end_date, warmup_bars)
+    return df.copy() if shared else df
+
+async def get_market_data_async(symbol: str, market: str = "stock", period: str = "daily", adjust: str = "qfq", start_date: str = None, end_date: str = None, warmup_bars: int = 0) -> pd.DataFrame:
+    """
+    get_market_data 的 asyncio 版本。
+    
+    阻塞的获取过程在线程池中执行，不会阻塞事件循环；与线程调用方共用同一单飞表。
+    """
+    key = (symbol, market, period, adjust, start_date, end_date, warmup_bars)
+    df, shared = await _market_data_flight.do_async(key, _load_market_data, symbol, market, period, adjust, start_date, end_date, warmup_bars)
+    return df.copy() if shared else df
+
+def get_market_data_flight_stats() -> dict:
+    """返回行情获取单飞合并的统计信息"""
+    return _market_data_flight.stats()
+
+def fetch_from_source(symbol: str, market: str = "stock", period: str = "daily", adjust: str = "qfq") -> pd.DataFrame:
+    """
+    直接从数据源获取当前可得的数据窗口，不读写 K 线库、不经过单飞合并。
+    
+    供自行管理存储的后台任务 (如 minute_archiver) 使用；行情查询请使用 get_market_data。
+    参数与返回值同 _fetch_market_data，获取失败时返回空 DataFrame。
+    """
+    return _fetch_market_data(symbol, market, period, adjust)
+
+def _supports_range_fetch(market: str) -> bool:
+    """数据源是否支持按日期范围获取 (期货新浪接口只能整段返回)"""
+    return market == "stock"
+
+def _load_market_data(symbol: str, market: str = "stock", period: str = "daily", adjust: str = "qfq", start_date: str = None, end_date: str = None, warmup_bars: int = 0) -> pd.DataFrame:
+    """
+    加载市场数据 (优先读取本地 K 线库，仅从数据源增量补齐)。
+    
+    逻辑:
+        0. 目标周期可由已缓存的更细基础序列派生时 (见 period_derivation)，
+           读取基础序列并在本地重采样，不单独访问数据源。
+        1. 库中无该序列: 从数据源拉取并写入 K 线库。指定了 start_date 且数据源支持
+           按日期获取时，只拉取窗口 (含预热余量) 至今的数据，否则拉取完整历史。
+        2. 库中已有数据且上次补齐之后该周期又有 K 线收盘 (按合约交易时段计算，非交易时段不过期):
+           从最后一根 K 线 (分钟周期取其所在交易日的开始) 起增量拉取，覆盖写入。
+           若重叠部分的收盘价与库中不一致 (复权因子变化)，则重建该序列。
+           开启 MARKET_DATA_SWR 且过期时长不超过 MARKET_DATA_MAX_STALENESS 时改为后台补齐，
+           本次直接返回库中数据。
+        3. 请求的窗口早于库中已覆盖的范围时，从数据源回补缺失的头部数据。
+        4. 按 start_date / end_date 从库中读取，并在窗口前附带恰好 warmup_bars 根预热 K 线。
+           返回数据的 attrs['data_age'] 记录其过期时长 (秒)，attrs['series_version'] 记录其在库中的
+           写入版本 (供指标缓存使用，见 _indicator_cache_key；未经 K 线库的数据为 None)。
+    
+    参数:
+        warmup_bars: 窗口前需要额外返回的 K 线数 (指标预热)，仅在指定 start_date 时生效。
+        其余参数同 _fetch_market_data。数据源或 K 线库异常时退化为直接拉取。
+    """
+    start = bar_store.to_market_time(start_date)
+    end = bar_store.to_market_time(end_date)
+
+    base = select_base_period(symbol, market, period, adjust) if BAR_STORE_ENABLED else fetch_base(market, period)
+    if base != period:
+        # 多取一根目标周期对应的基础 K 线，避免窗口起点落在分组中间导致首根派生 K 线不完整
+        base_warmup = (warmup_bars + 1) * bars_per_period(base, period) if start is not None else 0
+        base_df = get_market_data(symbol, market, base, adjust, start_date, end_date, base_warmup)
+        df = trim_to_window(derive_period(base_df, base, period, market), start, end, warmup_bars)
+        df.attrs['data_age'] = base_df.attrs.get('data_age', 0.0)
+        base_version = base_df.attrs.get('series_version')
+        df.attrs['series_version'] = (base_version, period) if base_version is not None else None
+        return df
+
+    fetch_from = warmup_start(start, period, warmup_bars) if start is not None and _supports_range_fetch(market) else None
+
+    if not BAR_STORE_ENABLED:
+        if fetch_from is not None:
+            df = _fetch_market_data(symbol, market, period, adjust,
+                                    start_date=fetch_from.strftime("%Y-%m-%d"),
+                                    end_date=(end + pd.Timedelta(days=1)).strftime("%Y-%m-%d") if end is not None else "2050-01-01")
+        else:
+            df = _fetch_market_data(symbol, market, period, adjust)
+        return trim_to_window(df, start, end, warmup_bars)
+
+    key = bar_store.make_key(market, symbol, period, adjust)
+    data_age = 0.0
+    try:
+        last_ts = bar_store.get_last_timestamp(key)
+        if last_ts is None:
+            if fetch_from is not None:
+                df = _fetch_market_data(symbol, market, period, adjust, start_date=fetch_from.strftime("%Y-%m-%d"), end_date="2050-01-01")
+            else:
+                df = _fetch_market_data(symbol, market, period, adjust)
+            if df.empty:
+                return df
+            bar_store.write_bars(key, df, replace=True)
+            bar_store.set_coverage(key, fetch_from)
+        else:
+            # 仅在上次补齐之后又有 K 线收盘时才访问数据源 (见 bar_expiry)
+            last_fetch = bar_store.get_last_fetch(key)
+            if bar_expiry.is_expired(symbol, market, period, last_fetch):
+                age = _stale_age(symbol, market, period, last_fetch)
+                if MARKET_DATA_SWR and age <= MARKET_DATA_MAX_STALENESS:
+                    _revalidate(key, symbol, market, period, adjust)
+                    data_age = age
+                else:
+                    _top_up(key, symbol, market, period, adjust, last_ts)
+            _backfill(key, symbol, market, period, adjust, fetch_from)
+
+        df = _read_bars_cached(key, start, end, warmup_bars)
+        df.attrs['data_age'] = data_age
+        return df
+    except Exception as e:
+        print(f"K线库读写失败 {key}: {e}，直接从数据源获取")
+        return trim_to_window(_fetch_market_data(symbol, market, period, adjust), start, end, warmup_bars)
+
+def _read_bars_cached(key, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp], warmup_bars: int) -> pd.DataFrame:
+    """
+    读取 K 线库，结果按 (序列, 时间窗口) 缓存在进程内 (见 frame_cache)。
+    
+    以序列的写入版本号校验缓存，库中数据被任何进程更新后缓存自动失效。
+    开启多进程共享缓存 (见 shared_bars) 时改为映射该版本的完整序列再按窗口切片，不复制数据，
+    也不占用进程内缓存的预算。返回的对象可由调用方原地修改，attrs['series_version'] 为 (序列, 版本号)。
+    """
+    version = bar_store.get_version(key)
+    full = shared_bars.load_series(key, version, lambda: bar_store.read_bars(key))
+    if full is not None:
+        df = detach(trim_to_window(full, start, end, warmup_bars))
+    else:
+        cache_key = (tuple(key), start, end, warmup_bars)
+        df = bar_frames.get(cache_key, version)
+        if df is None:
+            df = bar_store.read_bars(key, start, end, warmup_bars)
+            bar_frames.put(cache_key, df, version)
+        df = detach(df)
+    df.attrs['series_version'] = (tuple(key), version) if version is not None else None
+    return df
+
+def _indicator_cache_key(df: pd.DataFrame) -> Optional[tuple]:
+    """
+    指标缓存的键: (序列写入版本, 行数, 首末 K 线时间)，不读取数据本身。
+    
+    只有来自 K 线库的数据带有写入版本 (attrs['series_version'])，库中序列更新后版本随之变化；
+    对其切片 (如回测窗口) 的行数或首末时间不同，各自缓存。
+    未经 K 线库的数据返回 None，不缓存。调用方不应原地修改 get_market_data 返回数据的开高低收。
+    """
+    version = df.attrs.get('series_version')
+    if version is None or df.empty or not isinstance(df.index, pd.DatetimeIndex):
+        return None
+    return (version, len(df), df.index[0], df.index[-1])
+
+def _stale_age(symbol: str, market: str, period: str, last_fetch: Optional[float]) -> float:
+    """已过期缓存的过期时长 (秒): 当前时间距其后首根 K 线可获取时刻的间隔，无获取记录视为无穷大"""
+    expiry = bar_expiry.expires_at(symbol, market, period, last_fetch) if last_fetch is not None else None
+    if expiry is None:
+        return float('inf')
+    return max(0.0, time.time() - expiry)
+
+def _revalidate(key, symbol: str, market: str, period: str, adjust: str) -> bool:
+    """
+    在后台线程中补齐过期序列 (Stale-While-Revalidate)。
+    
+    同一序列已有刷新任务时不重复提交，返回是否提交了新任务。
+    执行时重新检查是否仍过期 (可能已被其他请求同步补齐)，失败只打印日志，下次请求重试。
+    """
+    with _revalidate_lock:
+        if key in _revalidating:
+            return False
+        _revalidating.add(key)
+
+    def run():
+        try:
+            last_ts = bar_store.get_last_timestamp(key)
+            if last_ts is not None and bar_expiry.is_expired(symbol, market, period, bar_store.get_last_fetch(key)):
+                # 已有过期数据可用，刷新不阻塞用户请求，按定时扫描的优先级排队
+                with fetch_priority('scan'):
+                    _top_up(key, symbol, market, period, adjust, last_ts)
+        except Exception as e:
+            print(f"后台刷新失败 {key}: {e}")
+        finally:
+            with _revalidate_lock:
+                _revalidating.discard(key)
+
+    _revalidate_executor.submit(run)
+    return True
+
+def _backfill(key, symbol: str, market: str, period: str, adjust: str, fetch_from: Optional[pd.Timestamp]):
+    """
+    回补库中缺失的头部历史。
+    
+    fetch_from 为 None 表示需要完整历史: 若库中仅有部分历史则全量重建；
+    否则仅在 fetch_from 早于已覆盖的最早时间时，拉取 [fetch_from, 已覆盖起点] 这一段。
+    """
+    _, covered_from = bar_store.get_coverage(key)
+    if covered_from is None:
+        return
+    if fetch_from is None:
+        df = _fetch_market_data(symbol, market, period, adjust)
+        if not df.empty:
+            bar_store.write_bars(key, df, replace=True)
+            bar_store.set_coverage(key, None)
+        return
+    if fetch_from >= covered_from:
+        return
+    df = _fetch_market_data(symbol, market, period, adjust,
+                            start_date=fetch_from.strftime("%Y-%m-%d"),
+                            end_date=covered_from.strftime("%Y-%m-%d"))
+    if not df.empty:
+        bar_store.write_bars(key, df[df.index < covered_from])
+    bar_store.set_coverage(key, fetch_from)
+
+def _top_up(key, symbol: str, market: str, period: str, adjust: str, last_ts: pd.Timestamp):
+    """
+    从数据源增量补齐 K 线库中的序列。
+    
+    分钟周期 (含 90/120/180 等重采样周期) 从最后一根 K 线所在自然日的开始拉取，
+    保证重采样分组在交易日内完整；日/周/月线从最后一根 K 线的日期拉取，
+    最后一根 (可能未走完的) K 线会被新数据覆盖。
+    """
+    since = last_ts.strftime("%Y-%m-%d")
+    fresh = _fetch_market_data(symbol, market, period, adjust, start_date=since, end_date="2050-01-01")
+    if fresh.empty:
+        bar_store.touch(key)
+        return
+
+    # 期货分钟数据源只返回最近一段窗口，库中更早的数据是本地归档 (见 minute_archiver)，
+    # 不做复权校验与全量重建，只覆盖写入窗口范围内的 K 线
+    if market == "futures":
+        bar_store.write_bars(key, fresh)
+        return
+
+    # 复权校验: 重叠 K 线的收盘价发生变化，说明历史价格已被重新复权，需要全量重建。
+    # 只比较上次从数据源补齐时已存在的 K 线，之后由 live_updater 按快照生成的 K 线不参与比较。
+    stored = bar_store.read_bars(key, start=fresh.index.min())
+    overlap = stored.index.intersection(fresh.index)
+    last_fetch = bar_store.get_last_fetch(key)
+    if last_fetch is not None:
+        overlap = overlap[overlap <= pd.Timestamp(bar_expiry.to_market_datetime(last_fetch))]
+    if len(overlap) > 0:
+        old_close = stored.loc[overlap, 'close'].to_numpy(dtype='float64')
+        new_close = fresh.loc[overlap, 'close'].to_numpy(dtype='float64')
+        # 仅比较已完成的 K 线，最后一根可能仍在变化
+        if len(overlap) > 1 and not np.allclose(old_close[:-1], new_close[:-1], rtol=1e-6, equal_nan=True):
+            print(f"{symbol} 检测到复权价格变化，重建本地 K 线库")
+            _, covered_from = bar_store.get_coverage(key)
+            if covered_from is not None:
+                full = _fetch_market_data(symbol, market, period, adjust, start_date=covered_from.strftime("%Y-%m-%d"), end_date="2050-01-01")
+            else:
+                full = _fetch_market_data(symbol, market, period, adjust)
+            if not full.empty:
+                bar_store.write_bars(key, full, replace=True)
+            return
+
+    bar_store.write_bars(key, fresh)
+
+def _tx_symbol(symbol: str) -> str:
+    """腾讯/新浪接口需要带交易所前缀的股票代码"""
+    prefix = "sh" if symbol.startswith("6") else "sz"
+    if symbol.startswith("4") or symbol.startswith("8"): prefix = "bj"
+    return f"{prefix}{symbol}"
+
+def _stock_hist_em(symbol: str, period: str, adjust: str, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """东方财富 stock_zh_a_hist 接口 (支持 日/周/月)"""
+    em_start = start_date.replace('-', '') if start_date else None
+    em_end = end_date.replace('-', '') if end_date else None
+    if em_start and em_end:
+        return provider.stock_zh_a_hist(symbol=symbol, period=period, adjust=adjust, start_date=em_start, end_date=em_end)
+    return provider.stock_zh_a_hist(symbol=symbol, period=period, adjust=adjust)
+
+def _stock_hist_tx(symbol: str, adjust: str, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """腾讯 stock_zh_a_hist_tx 接口 (仅日线，不支持 period 参数)"""
+    tx_start = start_date.replace('-', '') if start_date else "20200101"
+    tx_end = end_date.replace('-', '') if end_date else "20500101"
+    return provider.stock_zh_a_hist_tx(symbol=_tx_symbol(symbol), start_date=tx_start, end_date=tx_end, adjust=adjust)
+
+def _stock_daily_from_sina_minute(symbol: str) -> pd.DataFrame:
+    """新浪 60 分钟数据重采样为日线 (日线接口均不可用时的最后备选)"""
+    df_min = provider.stock_zh_a_minute(symbol=_tx_symbol(symbol), period="60")
+    if df_min.empty:
+        return pd.DataFrame()
+    df_min['day'] = pd.to_datetime(df_min['day'])
+    df_min.set_index('day', inplace=True)
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df_min[col] = pd.to_numeric(df_min[col], errors='coerce')
+    df = df_min.resample('D').agg({
+        'open': 'first',
+        'high': 'max',
+        'low': 'min',
+        'close': 'last',
+        'volume': 'sum'
+    }).dropna()
+    df = df.reset_index()
+    return df.rename(columns={'day': '日期', 'open': '开盘', 'high': '最高', 'low': '最低', 'close': '收盘', 'volume': '成交量'})
+
+def _stock_daily_chain(symbol: str, adjust: str, start_date: str = None, end_date: str = None) -> list:
+    """
+    股票日线的故障转移链: 东方财富 -> 腾讯 -> 新浪分钟重采样。
+    
+    实际尝试顺序由 source_registry 按近期健康度决定，熔断的数据源直接跳过，不再每次请求都等待超时。
+    周线/月线由 period_derivation 从日线派生，不单独获取。
+    """
+    return [
+        ("em_hist", lambda: _stock_hist_em(symbol, "daily", adjust, start_date, end_date)),
+        ("tx_hist", lambda: _stock_hist_tx(symbol, adjust, start_date, end_date)),
+        ("sina_minute_resample", lambda: _stock_daily_from_sina_minute(symbol)),
+    ]
+
+def _non_empty(df) -> bool:
+    return df is not None and not df.empty
+
+def _fetch_market_data(symbol: str, market: str = "stock", period: str = "daily", adjust: str = "qfq", start_date: str = None, end_date: str = None) -> pd.DataFrame:
     """
     使用 akshare 获取市场数据。
     
     参数:
         symbol: 标的代码
         market: "stock" (股票) 或 "futures" (期货)
-        period: 周期, 支持 "daily" (日线), "weekly" (周线), "monthly" (月线), 
-                以及分钟周期 "60", "30", "15", "5"。
-                注意: 对于 "120", "180" 等特殊周期，本函数会获取基础分钟数据（如60分钟）供后续重采样使用。
+        period: 周期, 支持 "daily" (日线) 以及分钟周期 "60", "30", "15", "5", "1"。
+                注意: 本函数只获取各周期的基础数据；"90", "120", "180" 等自定义周期
+                由 period_derivation 从基础分钟数据派生，周线/月线由日线派生 (股票 "240" 仍按日线处理)。
         adjust: 复权方式, 默认 "qfq" (前复权)
         start_date: 开始时间, 格式 'YYYY-MM-DD' 或 'YYYY-MM-DD HH:MM:SS'
         end_date: 结束时间, 格式 'YYYY-MM-DD' 或 'YYYY-MM-DD HH:MM:SS'
         
+    每次数据源调用都经过 source_registry 记录成功率与耗时，熔断中的数据源直接跳过。
+        
     返回:
-        pd.DataFrame: 包含 date, open, high, low, close, volume 等列的数据框。
+        pd.DataFrame: 统一 K 线格式 (见 bar_schema)，以 date 为索引，包含 open, high, low, close, volume
+        (期货另有 hold) 列。
     """
     try:
         df = pd.DataFrame()
@@ -29,38 +384,18 @@ def get_market_data(symbol: str, market: str = "stock", period: str = "daily", a
         # 期货分钟: period="60" 等
         # 股票日线: period="daily"
         
-        is_minute = period in ["240", "180", "120", "90", "60", "30", "15", "5", "1"]
+        is_minute = period in INTRADAY_PERIODS
 
         if market == "stock":
             # 特殊处理 240分钟 (即日线，但可能需要分钟级的时间戳格式)
             # 为了数据准确性（包括复权），直接使用日线数据，并将时间统一设置为 15:00
             if period == "240":
-                df = pd.DataFrame()
-                # 优先使用新浪接口
-                try:
-                    # 格式化日期参数
-                    sina_start = start_date.replace('-', '') if start_date else None
-                    sina_end = end_date.replace('-', '') if end_date else None
-                    
-                    if sina_start and sina_end:
-                         df = ak.stock_zh_a_hist(symbol=symbol, period="daily", adjust=adjust, start_date=sina_start, end_date=sina_end)
-                    else:
-                         df = ak.stock_zh_a_hist(symbol=symbol, period="daily", adjust=adjust)
-                except Exception as e:
-                    print(f"新浪日线接口失败 (用于240m): {e}，尝试腾讯接口...")
-                    try:
-                         # 腾讯接口不支持 period 参数
-                         prefix = "sh" if symbol.startswith("6") else "sz"
-                         if symbol.startswith("4") or symbol.startswith("8"): prefix = "bj"
-                         tx_symbol = f"{prefix}{symbol}"
-                         tx_start = start_date.replace('-', '') if start_date else "20200101"
-                         tx_end = end_date.replace('-', '') if end_date else "20500101"
-                         df = ak.stock_zh_a_hist_tx(symbol=tx_symbol, start_date=tx_start, end_date=tx_end, adjust=adjust)
-                    except Exception as e2:
-                         print(f"腾讯日线接口也失败: {e2}")
+                df = source_registry.run_chain(_stock_daily_chain(symbol, adjust, start_date, end_date), _non_empty, hedge=True)
+                if df is None:
+                    print(f"获取 {symbol} 日线数据失败 (用于240m)，所有数据源均不可用")
+                    df = pd.DataFrame()
 
                 if not df.empty:
-                    print(f"DEBUG: akshare columns: {df.columns}")
                     df = df.rename(columns={
                         "日期": "date",
                         "开盘": "open",
@@ -74,20 +409,12 @@ def get_market_data(symbol: str, market: str = "stock", period: str = "daily", a
                     df['date'] = df['date'] + pd.Timedelta(hours=15)
 
             elif is_minute:
-                # 映射长周期到基础周期以便后续重采样
+                # 90/120/180 等自定义周期由 period_derivation 从基础分钟数据派生，这里只获取原生周期
                 base_period = period
-                need_resample = False
-                
-                # 如果请求的是 90/120/180/240 分钟，先获取 30 分钟数据，后续再进行重采样
-                # 90分钟必须用30分钟合成 (60分钟无法整除)
-                if period in ["240", "180", "120", "90"]:
-                    base_period = "30" 
-                    need_resample = True
                 
                 # 使用东方财富接口获取分钟数据 (支持复权)
                 # stock_zh_a_hist_min_em 不需要 sh/sz 前缀
-                # 增加重试机制
-                import time
+                # 增加重试机制: 只重试异常；数据源熔断或确实没有数据 (停牌、代码错误等) 时不再重试，最后一次失败后不再等待
                 max_retries = 3
                 for attempt in range(max_retries):
                     try:
@@ -95,19 +422,23 @@ def get_market_data(symbol: str, market: str = "stock", period: str = "daily", a
                             # 确保格式包含时分秒，如果只传了日期，默认补全
                             min_start = start_date if len(start_date) > 10 else f"{start_date} 09:30:00"
                             min_end = end_date if len(end_date) > 10 else f"{end_date} 15:00:00"
-                            df = ak.stock_zh_a_hist_min_em(symbol=symbol, period=base_period, adjust=adjust, start_date=min_start, end_date=min_end)
+                            df = source_registry.call("em_minute", provider.stock_zh_a_hist_min_em, symbol=symbol, period=base_period, adjust=adjust, start_date=min_start, end_date=min_end, accept=_non_empty)
                         else:
-                            df = ak.stock_zh_a_hist_min_em(symbol=symbol, period=base_period, adjust=adjust)
-                            
-                        if not df.empty:
-                            break
+                            df = source_registry.call("em_minute", provider.stock_zh_a_hist_min_em, symbol=symbol, period=base_period, adjust=adjust, accept=_non_empty)
+                        break
+                    except SourceUnavailable:
+                        print(f"分钟数据源熔断中，跳过 {symbol}")
+                        break
+                    except SourceRejected:
+                        print(f"{symbol} {base_period} 分钟无数据")
+                        break
                     except Exception as e:
                         if attempt == max_retries - 1:
                              print(f"获取分钟数据失败 (尝试 {attempt+1}/{max_retries}): {e}")
+                             break
                         time.sleep(1)
 
                 if not df.empty:
-                    print(f"DEBUG: minute data columns: {df.columns}")
                     df = df.rename(columns={
                         "日期": "date",
                         "时间": "date",
@@ -117,66 +448,16 @@ def get_market_data(symbol: str, market: str = "stock", period: str = "daily", a
                         "收盘": "close",
                         "成交量": "volume"
                     })
-                        
-                    if need_resample:
-                            df['date'] = pd.to_datetime(df['date'])
-                            df.set_index('date', inplace=True)
-                            
-                            # 使用统一的重采样工具
-                            df = resample_data(df, period)
-                            
-                            # resample_data 返回的 df index 名为 date，且已排序
-                            # 恢复为列以便后续统一处理
-                            df = df.reset_index()
+            elif period != "daily":
+                print(f"股票 {period} 周期不直接获取 (由 period_derivation 从日线派生)")
             else:
-                # stock_zh_a_hist 接口支持 日/周/月
-                df = pd.DataFrame()
-                try:
-                    sina_start = start_date.replace('-', '') if start_date else None
-                    sina_end = end_date.replace('-', '') if end_date else None
-                    
-                    if sina_start and sina_end:
-                         df = ak.stock_zh_a_hist(symbol=symbol, period=period, adjust=adjust, start_date=sina_start, end_date=sina_end)
-                    else:
-                         df = ak.stock_zh_a_hist(symbol=symbol, period=period, adjust=adjust)
-                except Exception as e:
-                    print(f"获取 {symbol} 数据出错: {e}")
-                    # 故障转移：仅针对日线，尝试腾讯接口
-                    if period == 'daily':
-                        print("尝试使用腾讯接口作为备选方案...")
-                        try:
-                            prefix = "sh" if symbol.startswith("6") else "sz"
-                            if symbol.startswith("4") or symbol.startswith("8"): prefix = "bj"
-                            tx_symbol = f"{prefix}{symbol}"
-                            # 腾讯接口返回所有历史数据，数据量较大，需注意
-                            tx_start = start_date.replace('-', '') if start_date else "20200101"
-                            tx_end = end_date.replace('-', '') if end_date else "20500101"
-                            df = ak.stock_zh_a_hist_tx(symbol=tx_symbol, start_date=tx_start, end_date=tx_end, adjust=adjust)
-                        except Exception as e_tx:
-                             print(f"腾讯接口备选方案失败: {e_tx}")
-
-                    # 二级降级方案：尝试获取分钟数据并重采样为日线
-                    if df.empty and period == 'daily':
-                        print("尝试使用新浪分钟数据重采样为日线作为二级备选方案...")
-                        try:
-                            prefix = "sh" if symbol.startswith("6") else "sz"
-                            if symbol.startswith("4") or symbol.startswith("8"): prefix = "bj"
-                            sina_symbol = f"{prefix}{symbol}"
-                            df_min = ak.stock_zh_a_minute(symbol=sina_symbol, period="60")
-                            if not df_min.empty:
-                                df_min['day'] = pd.to_datetime(df_min['day'])
-                                df_min.set_index('day', inplace=True)
-                                df = df_min.resample('D').agg({
-                                    'open': 'first',
-                                    'high': 'max',
-                                    'low': 'min',
-                                    'close': 'last',
-                                    'volume': 'sum'
-                                }).dropna()
-                                df = df.reset_index()
-                                df = df.rename(columns={'day': '日期', 'open': '开盘', 'high': '最高', 'low': '最低', 'close': '收盘', 'volume': '成交量'})
-                        except Exception as e2:
-                            print(f"备选方案失败: {e2}")
+                # 日线: 东方财富 -> 腾讯 -> 新浪分钟重采样
+                # 前两个数据源可互换，启用 SOURCE_HEDGE_ENABLED 时以对冲方式请求
+                df = source_registry.run_chain(_stock_daily_chain(symbol, adjust, start_date, end_date), _non_empty,
+                                               hedge=True)
+                if df is None:
+                    print(f"获取 {symbol} 数据失败，所有数据源均不可用")
+                    df = pd.DataFrame()
                             
                 if not df.empty:
                     df = df.rename(columns={
@@ -189,59 +470,11 @@ def get_market_data(symbol: str, market: str = "stock", period: str = "daily", a
                     })
                 
         elif market == "futures":
-            if period in ["240", "180", "120", "90"]:
-                # 期货长周期分钟数据的自定义重采样
-                base_period = "60"
-                multiplier = 1
-                if period == "120": multiplier = 2
-                elif period == "180": multiplier = 3
-                elif period == "240": multiplier = 4
-                elif period == "90": 
-                    base_period = "30"
-                    multiplier = 3
-                
-                try:
-                    df = ak.futures_zh_minute_sina(symbol=symbol, period=base_period)
-                    if not df.empty:
-                        df = df.rename(columns={
-                            "datetime": "date",
-                            "open": "open",
-                            "high": "high",
-                            "low": "low",
-                            "close": "close",
-                            "volume": "volume",
-                            "hold": "hold"
-                        })
-                        
-                        # 简单的行数聚合重采样 (适用于连续合约的近似处理)
-                        # 注意：更严谨的处理应考虑交易时间段
-                        df['date'] = pd.to_datetime(df['date'])
-                        df.sort_values('date', inplace=True)
-                        df.reset_index(drop=True, inplace=True)
-                        
-                        agg_dict = {
-                            'date': 'last',
-                            'open': 'first',
-                            'high': 'max',
-                            'low': 'min',
-                            'close': 'last',
-                            'volume': 'sum'
-                        }
-                        if 'hold' in df.columns:
-                            agg_dict['hold'] = 'last'
-                            
-                        # 每 N 行分为一组
-                        group_key = df.index // multiplier
-                        df = df.groupby(group_key).agg(agg_dict)
-                        df.reset_index(drop=True, inplace=True)
-                except Exception as e:
-                    print(f"获取/重采样期货数据 {symbol} {period} 出错: {e}")
-                    df = pd.DataFrame()
-
-            elif is_minute:
+            # 90/120/180/240 分钟及周线/月线由 period_derivation 从基础周期派生
+            if is_minute:
                 # 期货分钟数据
                 try:
-                    df = ak.futures_zh_minute_sina(symbol=symbol, period=period)
+                    df = source_registry.call("sina_futures_minute", provider.futures_zh_minute_sina, symbol=symbol, period=period, accept=_non_empty)
                     if not df.empty:
                         df = df.rename(columns={
                             "datetime": "date",
@@ -258,7 +491,7 @@ def get_market_data(symbol: str, market: str = "stock", period: str = "daily", a
             else:
                 # 期货日线数据 (futures_zh_daily_sina)
                 try:
-                    df = ak.futures_zh_daily_sina(symbol=symbol)
+                    df = source_registry.call("sina_futures_daily", provider.futures_zh_daily_sina, symbol=symbol, accept=_non_empty)
                     if not df.empty:
                         df = df.rename(columns={
                             "date": "date",
@@ -272,30 +505,6 @@ def get_market_data(symbol: str, market: str = "stock", period: str = "daily", a
                         })
                         
                         df['date'] = pd.to_datetime(df['date'])
-                        
-                        # 周线/月线重采样
-                        if period == "weekly":
-                            df.set_index('date', inplace=True)
-                            agg_dict = {
-                                'open': 'first',
-                                'high': 'max',
-                                'low': 'min',
-                                'close': 'last',
-                                'volume': 'sum'
-                            }
-                            if 'hold' in df.columns: agg_dict['hold'] = 'last'
-                            df = df.resample('W').agg(agg_dict).dropna().reset_index()
-                        elif period == "monthly":
-                            df.set_index('date', inplace=True)
-                            agg_dict = {
-                                'open': 'first',
-                                'high': 'max',
-                                'low': 'min',
-                                'close': 'last',
-                                'volume': 'sum'
-                            }
-                            if 'hold' in df.columns: agg_dict['hold'] = 'last'
-                            df = df.resample('ME').agg(agg_dict).dropna().reset_index()
                 except Exception as e:
                     print(f"获取期货日线数据出错: {e}")
                     df = pd.DataFrame()
@@ -306,16 +515,10 @@ def get_market_data(symbol: str, market: str = "stock", period: str = "daily", a
         # 确保 date 列为 datetime 类型
         df['date'] = pd.to_datetime(df['date'])
         df.set_index('date', inplace=True)
-        # 确保索引排序，以便进行可靠的切片操作
-        df.sort_index(inplace=True)
         
-        # 确保数值列类型正确
-        cols = ['open', 'close', 'high', 'low']
-        for col in cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                
-        return df
+        # 统一为 K 线格式: 丢弃未使用的列，价格 float64、成交量/持仓量 int64，索引升序；
+        # 再校验去重、修复异常价格、剔除交易时段外的 K 线 (见 bar_validation)
+        return validate_bars(normalize_bars(df), symbol, market, period)
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -347,27 +550,82 @@ def calculate_dkx(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty or len(df) < 20:
         return df
 
+    # 同一版本序列 (同一窗口) 的计算结果直接从指标缓存取出
+    series_key = _indicator_cache_key(df)
+    cache_key = ('dkx',) + series_key if series_key is not None else None
+    cached = indicator_frames.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        df['dkx'] = cached['dkx'].to_numpy(copy=True)
+        df['madkx'] = cached['madkx'].to_numpy(copy=True)
+        _record_indicator_key(df, 'dkx', cache_key)
+        return df
+
     # 1. 计算 MID (中间价)
     # 权重分布: 收盘价(3), 最低价(1), 开盘价(1), 最高价(1)
-    mid = (3 * df['close'] + df['low'] + df['open'] + df['high']) / 6
+    mid = dkx_mid(df['open'].to_numpy(dtype='float64'), df['high'].to_numpy(dtype='float64'),
+                  df['low'].to_numpy(dtype='float64'), df['close'].to_numpy(dtype='float64'))
     
     # 2. 计算 DKX (20周期加权移动平均)
-    # 构造权重数组: [1, 2, ..., 20]
-    weights_asc = np.arange(1, 21) # [1, 2, ..., 20]
-    sum_weights = np.sum(weights_asc) # 210
-    
-    # 使用 rolling().apply() 进行加权求和
-    # raw=True 提升性能，直接操作 numpy 数组
-    df['dkx'] = mid.rolling(window=20).apply(
-        lambda x: np.dot(x, weights_asc) / sum_weights, 
-        raw=True
-    )
+    # 权重 [1, 2, ..., 20]，按固定顺序平移累加 (见 indicator_kernels)，不逐根调用 Python 函数
+    dkx = weighted_window_mean(mid, DKX_WEIGHTS)
+    df['dkx'] = dkx
     
     # 3. 计算 MADKX (DKX 的 10 周期简单移动平均)
-    df['madkx'] = df['dkx'].rolling(window=10).mean()
-    
+    df['madkx'] = weighted_window_mean(dkx, MADKX_WEIGHTS)
+
+    if cache_key is not None:
+        indicator_frames.put(cache_key, df[['dkx', 'madkx']].copy())
+        _record_indicator_key(df, 'dkx', cache_key)
     return df
 
+def _signal_window(df: pd.DataFrame, lookback: int, start_time: Optional[str], end_time: Optional[str], caller: str):
+    """
+    确定信号检测的行范围 [first, stop)。
+    
+    指定时间范围时取范围内的 K 线并向前多取一行 (用于判断范围内第一根是否交叉)；
+    否则取最近 lookback 根 (再多一行)，lookback 为 0 表示全部历史。
+    行情数据在入库前已去重并排序 (见 bar_validation)，直接在 int64 时间索引上二分查找 (见 time_index)。
+    范围为空或时间解析失败时返回 None。
+    """
+    if start_time and end_time:
+        try:
+            bounds = cross_window(df.index, start_time, end_time)
+        except Exception as e:
+            print(f"{caller} 时间过滤出错: {e}")
+            return None
+        if bounds is None:
+            return None
+        first, _, stop = bounds
+        return first, stop
+
+    lb = abs(lookback)
+    if lb == 0:
+        return 0, len(df)
+    return max(0, len(df) - lb - 1), len(df)
+
+def _cross_signals(df: pd.DataFrame, first: int, stop: int, fast: str, slow: str) -> List[dict]:
+    """
+    查找 [first, stop) 行范围内 fast 列与 slow 列的交叉 (第一行只作为前一根 K 线参与比较，见 find_crosses)，
+    只对交叉所在的行生成信号；offset 为距最后一根 K 线的根数 (用于前端定位)。
+    """
+    fast_values = df[fast].to_numpy(dtype='float64')
+    slow_values = df[slow].to_numpy(dtype='float64')
+    positions, buy = find_crosses(fast_values, slow_values, first, stop)
+    if len(positions) == 0:
+        return []
+
+    dates = format_times(df.index[positions])
+    close = df['close'].to_numpy(dtype='float64')
+    last = len(df) - 1
+    return [{
+        "signal": "BUY" if is_buy else "SELL",
+        "date": date,
+        "price": close[pos],
+        fast: fast_values[pos],
+        slow: slow_values[pos],
+        "offset": last - int(pos)
+    } for pos, is_buy, date in zip(positions, buy, dates)]
+
 def check_dkx_signal(df: pd.DataFrame, lookback: int = 5, start_time: Optional[str] = None, end_time: Optional[str] = None) -> List[dict]:
     """
     检查 DKX 金叉 (向上突破) 或 死叉 (向下突破) 信号。
@@ -384,139 +642,39 @@ def check_dkx_signal(df: pd.DataFrame, lookback: int = 5, start_time: Optional[s
     if 'dkx' not in df.columns or df['dkx'].isnull().all():
         return []
 
-    subset = pd.DataFrame()
-
-    if start_time and end_time:
-        # 按时间范围过滤，但需确保包含前一行以便检查交叉
-        try:
-            # 确保索引为 datetime 类型
-            if not isinstance(df.index, pd.DatetimeIndex):
-                df.index = pd.to_datetime(df.index)
-            
-            # 排序索引
-            df.sort_index(inplace=True)
-            
-            # 1. 对齐时区
-            ts_start = pd.to_datetime(start_time)
-            ts_end = pd.to_datetime(end_time)
-            
-            index_tz = df.index.tz
-            if index_tz is None:
-                if ts_start.tzinfo is not None:
-                    ts_start = ts_start.tz_localize(None)
-                    ts_end = ts_end.tz_localize(None)
-            else:
-                if ts_start.tzinfo is None:
-                    ts_start = ts_start.tz_localize(index_tz)
-                    ts_end = ts_end.tz_localize(index_tz)
-                else:
-                    ts_start = ts_start.tz_convert(index_tz)
-                    ts_end = ts_end.tz_convert(index_tz)
-            
-            # 2. 使用布尔掩码查找子集 (比 loc 切片更健壮)
-            mask = (df.index >= ts_start) & (df.index <= ts_end)
-            
-            temp_subset = df.loc[mask]
-            
-            if temp_subset.empty:
-                return []
-                
-            first_date = temp_subset.index[0]
-            last_date = temp_subset.index[-1]
-            
-            # 查找整数位置索引
-            loc_start = df.index.get_loc(first_date)
-            if isinstance(loc_start, slice): loc_start = loc_start.start
-            
-            loc_end = df.index.get_loc(last_date)
-            # 如果是 slice，stop 是排他的，需要 -1 才能指向最后一个元素
-            # 但这里我们要的是整数索引
-            if isinstance(loc_end, slice): 
-                # 这里有点复杂，如果重复索引，slice stop 指向最后一个元素的下一个
-                # 比如 [0, 1, 2], slice(0, 3). stop=3. 最后一个元素 idx=2.
-                # 我们想定位到 idx=2.
-                loc_end = loc_end.stop - 1 
-            
-            # 向前扩展一行
-            start_slice = max(0, loc_start - 1)
-            
-            # 向后切片是排他的，所以要 +1
-            if isinstance(loc_end, slice):
-                 end_slice = loc_end.stop
-            else:
-                 end_slice = loc_end + 1
-                
-            subset = df.iloc[start_slice:end_slice]
-            
-        except Exception as e:
-            print(f"check_dkx_signal 时间过滤出错: {e}")
-            return []
-        
-    else:
-        # 使用回溯期 (lookback)
-        lb = abs(lookback)
-        if lb == 0:
-            # 如果 lookback 为 0，检查所有可用历史
-            subset = df
-        else:
-            subset = df.iloc[-lb-1:]
-    
-    if len(subset) < 2:
+    window = _signal_window(df, lookback, start_time, end_time, "check_dkx_signal")
+    if window is None:
         return []
-
-    signals = []
-
-    # 遍历检查交叉
-    # 我们检查从前一天到当天的关系变化
-    for i in range(1, len(subset)):
-        prev = subset.iloc[i-1]
-        curr = subset.iloc[i]
-        
-        # 计算偏移量 (用于前端定位)
-        try:
-            # 在原始 df 中查找绝对位置
-            curr_idx = df.index.get_loc(curr.name)
-            if isinstance(curr_idx, slice): 
-                # 如果是 slice (重复索引)，取最后一个
-                curr_idx = curr_idx.stop - 1
-            offset = len(df) - 1 - curr_idx
-        except:
-            offset = None
-        
-        # 金叉: 前一日 DKX < MADKX 且 当日 DKX > MADKX
-        if prev['dkx'] < prev['madkx'] and curr['dkx'] > curr['madkx']:
-            signals.append({
-                "signal": "BUY",
-                "date": curr.name.strftime("%Y-%m-%d %H:%M:%S"),
-                "price": curr['close'],
-                "dkx": curr['dkx'],
-                "madkx": curr['madkx'],
-                "offset": offset
-            })
-        
-        # 死叉: 前一日 DKX > MADKX 且 当日 DKX < MADKX
-        elif prev['dkx'] > prev['madkx'] and curr['dkx'] < curr['madkx']:
-             signals.append({
-                "signal": "SELL",
-                "date": curr.name.strftime("%Y-%m-%d %H:%M:%S"),
-                "price": curr['close'],
-                "dkx": curr['dkx'],
-                "madkx": curr['madkx'],
-                "offset": offset
-            })
-            
-    return signals
+    first, stop = window
+    return _cross_signals(df, first, stop, 'dkx', 'madkx')
 
 def calculate_ma(df: pd.DataFrame, short_period: int = 5, long_period: int = 10) -> pd.DataFrame:
     """
     计算双均线 (Dual Moving Average)。
+    
+    两条均线接近相等的 K 线按窗口内的值精确比较 (见 indicator_kernels.resolve_ma_ties)，交叉判断不受舍入误差影响。
     """
     if df.empty:
         return df
-        
-    df['ma_short'] = df['close'].rolling(window=short_period).mean()
-    df['ma_long'] = df['close'].rolling(window=long_period).mean()
-    
+
+    series_key = _indicator_cache_key(df)
+    cache_key = ('ma', short_period, long_period) + series_key if series_key is not None else None
+    cached = indicator_frames.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        df['ma_short'] = cached['ma_short'].to_numpy(copy=True)
+        df['ma_long'] = cached['ma_long'].to_numpy(copy=True)
+        _record_indicator_key(df, 'ma', cache_key)
+        return df
+
+    ma_short = df['close'].rolling(window=short_period).mean().to_numpy(dtype='float64', copy=True)
+    ma_long = df['close'].rolling(window=long_period).mean().to_numpy(dtype='float64', copy=True)
+    resolve_ma_ties(df['close'].to_numpy(dtype='float64'), ma_short, ma_long, short_period, long_period)
+    df['ma_short'] = ma_short
+    df['ma_long'] = ma_long
+
+    if cache_key is not None:
+        indicator_frames.put(cache_key, df[['ma_short', 'ma_long']].copy())
+        _record_indicator_key(df, 'ma', cache_key)
     return df
 
 def check_ma_signal(df: pd.DataFrame, lookback: int = 5, start_time: Optional[str] = None, end_time: Optional[str] = None) -> List[dict]:
@@ -526,104 +684,36 @@ def check_ma_signal(df: pd.DataFrame, lookback: int = 5, start_time: Optional[st
     if 'ma_short' not in df.columns or df['ma_short'].isnull().all():
         return []
 
-    subset = pd.DataFrame()
-    
-    if start_time and end_time:
-         # 按时间范围过滤
-        try:
-            if not isinstance(df.index, pd.DatetimeIndex):
-                df.index = pd.to_datetime(df.index)
-            
-            df.sort_index(inplace=True)
+    window = _signal_window(df, lookback, start_time, end_time, "check_ma_signal")
+    if window is None:
+        return []
+    first, stop = window
+    return _cross_signals(df, first, stop, 'ma_short', 'ma_long')
 
-            ts_start = pd.to_datetime(start_time)
-            ts_end = pd.to_datetime(end_time)
-            
-            index_tz = df.index.tz
-            if index_tz is None:
-                if ts_start.tzinfo is not None:
-                    ts_start = ts_start.tz_localize(None)
-                    ts_end = ts_end.tz_localize(None)
-            else:
-                if ts_start.tzinfo is None:
-                    ts_start = ts_start.tz_localize(index_tz)
-                    ts_end = ts_end.tz_localize(index_tz)
-                else:
-                    ts_start = ts_start.tz_convert(index_tz)
-                    ts_end = ts_end.tz_convert(index_tz)
-            
-            mask = (df.index >= ts_start) & (df.index <= ts_end)
-            
-            temp_subset = df.loc[mask]
+# 各指标信号的快线/慢线列
+_SIGNAL_COLUMNS = {'dkx': ('dkx', 'madkx'), 'ma': ('ma_short', 'ma_long')}
 
-            if temp_subset.empty:
-                return []
-            
-            first_date = temp_subset.index[0]
-            last_date = temp_subset.index[-1]
-            
-            loc_start = df.index.get_loc(first_date)
-            if isinstance(loc_start, slice): loc_start = loc_start.start
-            
-            loc_end = df.index.get_loc(last_date)
-            if isinstance(loc_end, slice): loc_end = loc_end.stop - 1 
-            
-            start_slice = max(0, loc_start - 1)
-            
-            if isinstance(loc_end, slice):
-                 end_slice = loc_end.stop
-            else:
-                 end_slice = loc_end + 1
-                
-            subset = df.iloc[start_slice:end_slice]
-        except Exception as e:
-            print(f"check_ma_signal 时间过滤出错: {e}")
-            return []
-    else:
-        lb = abs(lookback)
-        if lb == 0:
-            subset = df
-        else:
-            lb = max(1, lb)
-            subset = df.iloc[-lb-1:]  
-        
-    if len(subset) < 2:
-        return []
+def _record_indicator_key(df: pd.DataFrame, indicator: str, cache_key: tuple):
+    """在 df.attrs['indicator_keys'] 中记录指标结果的缓存键，供 signal_timeline 复用"""
+    df.attrs['indicator_keys'] = {**df.attrs.get('indicator_keys', {}), indicator: cache_key}
 
-    signals = []
+def signal_timeline(df: pd.DataFrame, indicator: str) -> SignalTimeline:
+    """
+    df 上指定指标 ('dkx' / 'ma') 的信号时间线 (见 signal_timeline)。
+    
+    df 为 calculate_dkx / calculate_ma 的结果时，时间线与指标结果以相同的键 (见 _indicator_cache_key) 缓存在指标缓存中，
+    同一序列的检测、导出与图表标记只查找一次交叉，之后每次查询只做二分查找。
+    因此计算指标后不应再原地修改 df 的指标列；未经 calculate_* 计算的 df 每次重新构建。
+    """
+    fast, slow = _SIGNAL_COLUMNS[indicator]
+    cache_key = df.attrs.get('indicator_keys', {}).get(indicator)
+    if cache_key is not None:
+        cache_key = ('timeline',) + cache_key
+        timeline = indicator_frames.get(cache_key)
+        if timeline is not None and timeline.matches(df):
+            return timeline
 
-    for i in range(1, len(subset)):
-        prev = subset.iloc[i-1]
-        curr = subset.iloc[i]
-        
-        try:
-            curr_idx = df.index.get_loc(curr.name)
-            if isinstance(curr_idx, slice): 
-                curr_idx = curr_idx.stop - 1
-            offset = len(df) - 1 - curr_idx
-        except:
-            offset = None
-        
-        # 金叉: 短均线 上穿 长均线
-        if prev['ma_short'] < prev['ma_long'] and curr['ma_short'] > curr['ma_long']:
-             signals.append({
-                "signal": "BUY",
-                "date": curr.name.strftime("%Y-%m-%d %H:%M:%S"),
-                "price": curr['close'],
-                "ma_short": curr['ma_short'],
-                "ma_long": curr['ma_long'],
-                "offset": offset
-            })
-        
-        # 死叉: 短均线 下穿 长均线
-        elif prev['ma_short'] > prev['ma_long'] and curr['ma_short'] < curr['ma_long']:
-            signals.append({
-                "signal": "SELL",
-                "date": curr.name.strftime("%Y-%m-%d %H:%M:%S"),
-                "price": curr['close'],
-                "ma_short": curr['ma_short'],
-                "ma_long": curr['ma_long'],
-                "offset": offset
-            })
-            
-    return signals
+    timeline = SignalTimeline(df, fast, slow)
+    if cache_key is not None:
+        indicator_frames.put(cache_key, timeline, nbytes=timeline.nbytes)
+    return timeline
@@ -0,0 +1,253 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import bar_store
+from .fetch_scheduler import fetch_priority
+from .bar_expiry import in_session, next_bar_close, to_market_datetime
+from .providers import provider
+from .streaming_indicators import StreamingDKX, StreamingMA
+
+# 全市场实时 K 线更新 (Live Bar Updater)
+# 盘中定时调用一次 stock_zh_a_spot_em 获取全市场快照 (最新价、今开、最高、最低、成交量)，
+# 就地更新 K 线库中所有已缓存股票序列正在形成的 K 线，全市场 DKX/MA 刷新只需一次 HTTP 请求，
+# 不必逐个标的调用 get_market_data。
+#   日线 (及 240 分钟): 当日 K 线直接取快照的 今开/最高/最低/最新价/成交量
+#   分钟线: 按当前时刻所属 K 线的收盘时间更新 close/high/low，成交量累加快照间的增量
+# 更新不修改 last_fetch，K 线收盘后仍按 bar_expiry 从数据源补齐，以数据源的最终数据为准。
+# 快照没有成交时间，交易时段判断 (in_session) 也不含节假日: 工作日休市时接口返回的仍是上一交易日的数据，
+# 写入后会成为一根永不被补齐覆盖的 "当日" K 线。因此与上一交易日的日线或快照完全相同的标的不更新，
+# 多数可比较的标的都如此时视为非交易日，整份快照丢弃。
+# 默认关闭 (LIVE_UPDATE_ENABLED=1 开启)；库中没有可更新的股票序列时不拉取快照。
+LIVE_UPDATE_ENABLED = os.environ.get('LIVE_UPDATE_ENABLED', '0') == '1'
+LIVE_UPDATE_INTERVAL = float(os.environ.get('LIVE_UPDATE_INTERVAL', '30'))
+
+# 盘中信号实时监控: 为每个被更新的序列保留指标增量计算器 (见 streaming_indicators)，
+# 每次快照只计算被更新的那根 K 线，金叉/死叉事件保留最近 LIVE_SIGNAL_EVENTS 条。
+#   LIVE_DKX_STREAMS=1 开启 DKX；LIVE_MA_PAIRS 为逗号分隔的 "短周期:长周期" (如 5:10,10:60)，非空时开启双均线。
+# 计算器的最后一根 K 线与 K 线库不一致 (首次、数据源补齐改写了 K 线) 时从库中最近的 K 线重新初始化。
+LIVE_DKX_STREAMS = os.environ.get('LIVE_DKX_STREAMS', '0') == '1'
+LIVE_MA_PAIRS = [tuple(int(p) for p in item.split(':'))
+                 for item in os.environ.get('LIVE_MA_PAIRS', '').split(',') if item.strip()]
+LIVE_SIGNAL_EVENTS = int(os.environ.get('LIVE_SIGNAL_EVENTS', '500'))
+
+# 快照价格与复权价格一致的复权方式 (当日价格在前复权下不变)
+_LIVE_ADJUSTS = ('qfq', '')
+
+_lock = threading.Lock()
+# 上一次快照的累计成交量 {symbol: (交易日, 累计成交量)}，用于计算分钟 K 线的成交量增量
+_last_volume: Dict[str, tuple] = {}
+_status = {"runs": 0, "last_run_at": None, "updated": 0, "symbols": 0, "last_error": None}
+# 各序列的指标增量计算器 {(指标, 序列键): 计算器} 与最近的信号事件
+_streams: Dict[tuple, object] = {}
+_signal_events: deque = deque(maxlen=LIVE_SIGNAL_EVENTS)
+_last_signal: Dict[tuple, tuple] = {}
+
+
+def _snapshot_frame(spot: pd.DataFrame) -> pd.DataFrame:
+    """将快照整理为以代码为索引的 last/open/high/low/volume，剔除停牌 (无成交) 的标的"""
+    df = pd.DataFrame({
+        'last': pd.to_numeric(spot['最新价'], errors='coerce').to_numpy(),
+        'open': pd.to_numeric(spot['今开'], errors='coerce').to_numpy(),
+        'high': pd.to_numeric(spot['最高'], errors='coerce').to_numpy(),
+        'low': pd.to_numeric(spot['最低'], errors='coerce').to_numpy(),
+        'volume': pd.to_numeric(spot['成交量'], errors='coerce').to_numpy(),
+    }, index=spot['代码'].astype(str).to_numpy())
+    df = df[df['last'].notna() & (df['last'] > 0) & df['open'].notna()]
+    return df[~df.index.duplicated()]
+
+
+def _stale_symbols(snap: pd.DataFrame, today: pd.Timestamp, last_bars: Dict[tuple, pd.Series]) -> tuple:
+    """
+    快照中仍为上一交易日数据的标的，返回 (过期标的集合, 可比较的标的数)。
+
+    参照为库中当日之前的日线 K 线 (OHLC 与成交量均相同即过期)，以及进程内保留的
+    之前交易日最后一次快照的成交量 (成交量相同即过期)。
+    """
+    references = {}
+    for (_, symbol, period, _), bar in last_bars.items():
+        if (period == 'daily' or period == '240') and bar.name.normalize() < today:
+            references[symbol] = bar
+    with _lock:
+        earlier = {s: v for s, (day, v) in _last_volume.items() if day < today and s in snap.index}
+
+    stale = set()
+    for symbol in set(references) | set(earlier):
+        row = snap.loc[symbol]
+        bar = references.get(symbol)
+        if bar is not None:
+            stale_bar = np.allclose([row['open'], row['high'], row['low'], row['last']],
+                                    [bar['open'], bar['high'], bar['low'], bar['close']]) \
+                and round(row['volume']) == bar['volume']
+        else:
+            stale_bar = False
+        if stale_bar or (symbol in earlier and row['volume'] == earlier[symbol]):
+            stale.add(symbol)
+    return stale, len(set(references) | set(earlier))
+
+
+def apply_snapshot(spot: pd.DataFrame, now: Optional[datetime] = None) -> int:
+    """
+    将一次全市场快照应用到 K 线库中所有已缓存的股票序列，返回更新的序列数。
+
+    now 为上海时间 (naive)，默认取当前时间。
+    """
+    now = now or to_market_datetime(time.time())
+    snap = _snapshot_frame(spot)
+    if snap.empty:
+        return 0
+    today = pd.Timestamp(now.date())
+
+    keys = [k for k in bar_store.list_series(market='stock') if k[3] in _LIVE_ADJUSTS and k[1] in snap.index]
+    last_bars = bar_store.read_last_bars(keys)
+
+    stale, compared = _stale_symbols(snap, today, last_bars)
+    if compared and len(stale) * 2 >= compared:
+        print(f"快照与上一交易日数据相同 ({len(stale)}/{compared})，{today.date()} 可能为休市日，不更新")
+        return 0
+    keys = [k for k in keys if k[1] not in stale]
+
+    # 分钟 K 线成交量增量: 同一交易日内与上一次快照的累计成交量之差
+    with _lock:
+        prev = {s: v for s, (day, v) in _last_volume.items() if day == today}
+        for symbol, volume in snap['volume'].items():
+            _last_volume[symbol] = (today, volume)
+
+    batch = []
+    for key in keys:
+        _, symbol, period, _ = key
+        row = snap.loc[symbol]
+        last = last_bars.get(key)
+        if period in ('weekly', 'monthly'):
+            # 周线/月线由日线派生，不单独更新
+            continue
+        if not period.isdigit() or period == '240':
+            # 日线 (240 分钟同样为日线数据，时间为 15:00)
+            ts = today + pd.Timedelta(hours=15) if period == '240' else today
+            bar = {'open': row['open'], 'high': row['high'], 'low': row['low'], 'close': row['last'],
+                   'volume': row['volume']}
+        else:
+            close_time = next_bar_close(symbol, 'stock', period, now - timedelta(microseconds=1))
+            if close_time is None:
+                continue
+            ts = pd.Timestamp(close_time)
+            delta = max(0.0, row['volume'] - prev[symbol]) if symbol in prev else 0.0
+            if last is not None and last.name == ts:
+                bar = {'open': last['open'], 'high': max(last['high'], row['last']), 'low': min(last['low'], row['last']),
+                       'close': row['last'], 'volume': (0.0 if np.isnan(last['volume']) else last['volume']) + delta}
+            elif last is not None and last.name > ts:
+                continue
+            else:
+                bar = {'open': row['last'], 'high': row['last'], 'low': row['last'], 'close': row['last'], 'volume': delta}
+        batch.append((key, pd.DataFrame([bar], index=pd.DatetimeIndex([ts], name='date'))))
+
+    bar_store.write_bars_batch(batch, touch=False)
+    factories = _stream_factories()
+    for key, frame in batch:
+        for name, factory in factories.items():
+            _feed_stream(name, factory, key, last_bars.get(key), frame)
+    return len(batch)
+
+
+def _stream_factories() -> Dict[str, Callable]:
+    """已开启的指标计算器 {指标名: 创建函数}"""
+    factories = {}
+    if LIVE_DKX_STREAMS:
+        factories['dkx'] = StreamingDKX
+    if LIVE_MA_PAIRS:
+        factories['ma'] = lambda: StreamingMA(LIVE_MA_PAIRS)
+    return factories
+
+
+def _stream_events(name: str, result: dict) -> List[Dict]:
+    """将计算器的结果整理为信号事件 (每组均线的交叉各为一个事件)"""
+    if name == 'dkx':
+        if result['signal'] is None:
+            return []
+        return [{'indicator': 'dkx', 'signal': result['signal'], 'dkx': result['dkx'], 'madkx': result['madkx']}]
+    return [{'indicator': 'ma', 'short': short, 'long': long, 'signal': signal,
+             'ma_short': result['ma'][short], 'ma_long': result['ma'][long]}
+            for (short, long), signal in result['signals'].items()]
+
+
+def _feed_stream(name: str, factory: Callable, key: tuple, last: Optional[pd.Series], frame: pd.DataFrame):
+    """
+    将写入的 K 线交给该序列的指标计算器，产生交叉时记录信号事件。
+
+    last 为写入前库中的最后一根 K 线；计算器与之不一致时从库中重新初始化
+    (读取最近 warmup_bars + 1 根，已包含本次写入的 K 线)。
+    """
+    ts = frame.index[-1]
+    bar = frame.iloc[-1]
+    stream = _streams.get((name, key))
+    if stream is None or last is None or not stream.matches(last.name, last['open'], last['high'], last['low'], last['close']):
+        stream = factory()
+        history = bar_store.read_bars(key, start=ts, warmup_bars=stream.warmup_bars)
+        if history.empty:
+            return
+        stream.seed(history.iloc[:-1])
+        with _lock:
+            _streams[(name, key)] = stream
+    result = stream.update(ts, bar['open'], bar['high'], bar['low'], bar['close'])
+    _, symbol, period, _ = key
+    with _lock:
+        for event in _stream_events(name, result):
+            # 形成中的 K 线每次快照都会改写，同一根 K 线的同一信号只记录一次
+            marker = (name, key, event.get('short'), event.get('long'))
+            if _last_signal.get(marker) == (ts, event['signal']):
+                continue
+            _last_signal[marker] = (ts, event['signal'])
+            event.update(symbol=symbol, period=period, time=ts.strftime("%Y-%m-%d %H:%M:%S"), at=time.time())
+            _signal_events.append(event)
+
+
+def update_once(now: Optional[datetime] = None) -> int:
+    """拉取一次快照并更新 (阻塞)；非交易时段或库中没有可更新的股票序列时直接返回 0"""
+    now = now or to_market_datetime(time.time())
+    if not in_session('000001', 'stock', now):
+        return 0
+    # 全市场快照是一次较重的请求，没有需要更新的序列时不拉取
+    if not any(k[3] in _LIVE_ADJUSTS for k in bar_store.list_series(market='stock')):
+        return 0
+    with fetch_priority('scan'):
+        spot = provider.stock_zh_a_spot_em()
+    updated = apply_snapshot(spot, now)
+    with _lock:
+        _status["runs"] += 1
+        _status["last_run_at"] = time.time()
+        _status["updated"] = updated
+        _status["symbols"] = len(spot)
+    return updated
+
+
+async def live_update_loop():
+    """按 LIVE_UPDATE_INTERVAL 定时更新，直到任务被取消"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, update_once)
+        except Exception as e:
+            print(f"实时K线更新失败: {e}")
+            with _lock:
+                _status["last_error"] = str(e)
+        await asyncio.sleep(LIVE_UPDATE_INTERVAL)
+
+
+def get_status() -> Dict:
+    with _lock:
+        status = dict(_status)
+        status["streams"] = len(_streams)
+    return status
+
+
+def get_signal_events(since: float = 0.0) -> List[Dict]:
+    """盘中实时计算得到的 DKX / 双均线交叉事件 (按发生先后)，可只取 since (纪元秒) 之后的事件"""
+    with _lock:
+        return [event for event in _signal_events if event['at'] > since]
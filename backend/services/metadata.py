@@ -1,10 +1,11 @@
-import akshare as ak
 import pandas as pd
 from typing import List, Dict
 try:
     from services.futures_master import load_contracts
+    from services.providers import provider
 except ImportError:
     from backend.services.futures_master import load_contracts
+    from backend.services.providers import provider
 
 # 简单的内存缓存
 _STOCK_CACHE = None
@@ -18,7 +19,7 @@ def get_hs300_list() -> List[Dict[str, str]]:
         return _HS300_CACHE
         
     try:
-        df = ak.index_stock_cons(symbol="000300")
+        df = provider.index_stock_cons(symbol="000300")
         results = []
         for _, row in df.iterrows():
             code = str(row['品种代码'])
@@ -52,7 +53,7 @@ def get_stock_list() -> List[Dict[str, str]]:
 
     try:
         # 尝试从 akshare 获取
-        df = ak.stock_zh_a_spot_em()
+        df = provider.stock_zh_a_spot_em()
         if df.empty:
             _STOCK_CACHE = get_stock_list_fallback()
             return _STOCK_CACHE
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from . import bar_store
+from .fetch_scheduler import fetch_priority
+from .indicators import fetch_from_source
+from .metadata import get_default_hot_symbols
+
+# 期货分钟线本地归档 (Minute Archiver)
+# 新浪期货分钟接口只返回最近约 1000 根 K 线 (1 分钟线仅几个交易日)。归档任务定期拉取该窗口，
+# 按时间戳去重后并入本地 K 线库: 窗口内的 K 线被覆盖 (最后一根可能未走完)，窗口之前的历史保持不变，
+# 因此库中的分钟历史随时间不断向前延伸，回测与重采样可直接读取数年的本地数据。
+# 归档间隔必须小于数据源窗口覆盖的时长，否则两次归档之间会出现缺口 (会打印警告)。
+ARCHIVE_ENABLED = os.environ.get('ARCHIVE_ENABLED', '1') != '0'
+# 归档的合约，逗号分隔；为空时使用默认热门品种
+ARCHIVE_SYMBOLS = [s.strip() for s in os.environ.get('ARCHIVE_SYMBOLS', '').split(',') if s.strip()]
+ARCHIVE_PERIODS = [p.strip() for p in os.environ.get('ARCHIVE_PERIODS', '1,5,15,30,60').split(',') if p.strip()]
+ARCHIVE_INTERVAL = float(os.environ.get('ARCHIVE_INTERVAL', '3600'))
+ARCHIVE_CONCURRENCY = max(1, int(os.environ.get('ARCHIVE_CONCURRENCY', '2')))
+
+_lock = threading.Lock()
+_status = {
+    "runs": 0,
+    "last_run_at": None,
+    "series": {},  # "RB0/1" -> {"bars": 数量, "first": 首根, "last": 末根, "appended": 上次新增, "gap": 是否有缺口}
+    "last_error": None,
+}
+
+
+def archive_symbols() -> List[str]:
+    return ARCHIVE_SYMBOLS or get_default_hot_symbols()
+
+
+def archive_series(symbol: str, period: str) -> Optional[Dict]:
+    """
+    归档一个合约的一个分钟周期。
+
+    逻辑:
+        1. 从数据源拉取当前窗口。
+        2. 窗口首根晚于库中最后一根时说明两次归档之间有缺口，记录并告警 (数据无法再补回)。
+        3. 以追加方式写入 (只覆盖窗口时间范围内的记录)，返回归档后的序列概况。
+    """
+    key = bar_store.make_key("futures", symbol, period)
+    window = fetch_from_source(symbol, "futures", period)
+    if window.empty:
+        return None
+
+    before = bar_store.series_info(key)
+    gap = before is not None and window.index[0] > before[2]
+    if gap:
+        print(f"{symbol} {period} 分钟归档出现缺口: {before[2]} -> {window.index[0]}")
+    bar_store.write_bars(key, window)
+
+    count, first, last = bar_store.series_info(key)
+    return {
+        "bars": count,
+        "first": str(first),
+        "last": str(last),
+        "appended": count - (before[0] if before else 0),
+        "gap": gap,
+    }
+
+
+def archive_once(symbols: List[str] = None, periods: List[str] = None, executor: ThreadPoolExecutor = None) -> Dict:
+    """对所有合约与周期执行一轮归档 (阻塞)，单个序列失败不影响其他序列"""
+    symbols = symbols or archive_symbols()
+    periods = periods or ARCHIVE_PERIODS
+    jobs = [(s, p) for s in symbols for p in periods]
+
+    def run(job):
+        symbol, period = job
+        try:
+            with fetch_priority('backfill'):
+                return job, archive_series(symbol, period)
+        except Exception as e:
+            with _lock:
+                _status["last_error"] = f"{symbol} {period}: {e}"
+            return job, None
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=ARCHIVE_CONCURRENCY, thread_name_prefix="archive")
+    try:
+        results = list(executor.map(run, jobs))
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+
+    with _lock:
+        for (symbol, period), info in results:
+            if info is not None:
+                _status["series"][f"{symbol}/{period}"] = info
+        _status["runs"] += 1
+        _status["last_run_at"] = time.time()
+    return get_status()
+
+
+async def archive_loop():
+    """按 ARCHIVE_INTERVAL 定期归档，直到任务被取消"""
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=ARCHIVE_CONCURRENCY, thread_name_prefix="archive")
+    try:
+        while True:
+            try:
+                await loop.run_in_executor(None, archive_once, None, None, executor)
+            except Exception as e:
+                print(f"分钟线归档失败: {e}")
+            await asyncio.sleep(ARCHIVE_INTERVAL)
+    finally:
+        executor.shutdown(wait=False)
+
+
+def get_status() -> Dict:
+    """返回归档状态 (副本)"""
+    with _lock:
+        status = dict(_status)
+        status["series"] = dict(_status["series"])
+        return status
@@ -0,0 +1,169 @@
+import os
+from typing import List, Optional
+
+import pandas as pd
+
+from . import bar_store
+from .resample_utils import resample_data
+from .time_index import window as time_window
+
+# 周期派生层 (Period Derivation)
+# 同一标的的多个周期尽量由一条已缓存的基础序列在本地重采样得到，而不是每个周期各自访问数据源。
+
+# 可派生目标周期 -> 候选基础周期 (由细到粗)。
+# 180 分钟不能用 60 分钟合成: 纯日盘品种 09:00-11:30 为 150 分钟，需要 30 分钟粒度才能准确切分。
+# 90 分钟同理，60 分钟无法整除。
+DERIVABLE_BASES = {
+    "5": ["1"],
+    "15": ["5", "1"],
+    "30": ["15", "5", "1"],
+    "60": ["30", "15", "5", "1"],
+    "90": ["30", "15", "5", "1"],
+    "120": ["60", "30", "15", "5", "1"],
+    "180": ["30", "15", "5", "1"],
+    "240": ["60", "30", "15", "5", "1"],
+    "weekly": ["daily"],
+    "monthly": ["daily"],
+}
+
+# 数据源不直接提供 (或不必单独下载) 的周期，在无可用缓存时需要拉取的基础周期
+FETCH_BASES = {
+    "90": "30",
+    "120": "60",
+    "180": "30",
+    "240": "60",
+    "weekly": "daily",
+    "monthly": "daily",
+}
+
+# 股票 1 分钟线包含 09:30 的开盘集合竞价 K 线，原生 5/15/30/60 分钟线把它计入当日第一根 (09:35 等)。
+# 以 1 分钟线为基础派生前先将其并入 09:31 K 线，否则按累计时长切分会整体错开一分钟 (09:34、09:59 ...)。
+STOCK_AUCTION_TIME = pd.Timedelta(hours=9, minutes=30)
+
+# 由基础序列派生时至少应得到的目标周期 K 线数，不足时认为该基础序列历史太短，不予采用
+DERIVE_MIN_BARS = int(os.environ.get('DERIVE_MIN_BARS', '300'))
+
+
+def _period_minutes(period: str) -> Optional[float]:
+    """周期对应的 (近似) 分钟数，用于估算派生后的 K 线数量"""
+    if period.isdigit():
+        return float(period)
+    # 按每个交易日约 240 分钟估算
+    return {"daily": 240.0, "weekly": 1200.0, "monthly": 5040.0}.get(period)
+
+
+def candidate_bases(market: str, period: str) -> List[str]:
+    """
+    返回目标周期的候选基础周期 (由细到粗)。
+
+    股票的 240 分钟直接使用日线数据 (时间统一为 15:00)，不参与派生。
+    """
+    if market == "stock" and period == "240":
+        return []
+    return DERIVABLE_BASES.get(period, [])
+
+
+def fetch_base(market: str, period: str) -> str:
+    """无可用缓存时，为得到目标周期需要从数据源拉取的周期"""
+    if market == "stock" and period == "240":
+        return period
+    return FETCH_BASES.get(period, period)
+
+
+def select_base_period(symbol: str, market: str, period: str, adjust: str = "qfq") -> str:
+    """
+    选择获取目标周期所用的基础周期。
+
+    逻辑:
+        1. 目标周期本身可直接获取且已在 K 线库中: 直接使用。
+        2. 按由细到粗的顺序查找已缓存的候选基础序列，
+           派生后 K 线数不少于 DERIVE_MIN_BARS 的第一个即为所选。
+        3. 均无可用缓存: 返回需要从数据源拉取的周期 (fetch_base)。
+
+    返回值等于 period 时表示无需派生。
+    """
+    native = fetch_base(market, period) == period
+    try:
+        if native and bar_store.series_info(bar_store.make_key(market, symbol, period, adjust)):
+            return period
+
+        target_minutes = _period_minutes(period)
+        for base in candidate_bases(market, period):
+            info = bar_store.series_info(bar_store.make_key(market, symbol, base, adjust))
+            if not info:
+                continue
+            count = info[0]
+            base_minutes = _period_minutes(base)
+            if target_minutes and base_minutes:
+                count = count * base_minutes / target_minutes
+            if count >= DERIVE_MIN_BARS:
+                return base
+    except Exception as e:
+        print(f"查询 {symbol} 基础周期缓存失败: {e}")
+
+    return fetch_base(market, period)
+
+
+def _merge_stock_auction_bars(df: pd.DataFrame) -> pd.DataFrame:
+    """将股票 1 分钟线中 09:30 的集合竞价 K 线并入同日的 09:31 K 线 (无 09:31 时改记为 09:31)"""
+    auction = (df.index - df.index.normalize()) == STOCK_AUCTION_TIME
+    if not auction.any():
+        return df
+    index = df.index.where(~auction, df.index + pd.Timedelta(minutes=1))
+    agg = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+    agg = {col: agg.get(col, 'last') for col in df.columns}
+    merged = df.groupby(index, sort=True).agg(agg)
+    merged.index.name = df.index.name
+    return merged
+
+
+def derive_period(df: pd.DataFrame, base: str, period: str, market: str = None) -> pd.DataFrame:
+    """
+    由基础周期数据派生目标周期 (基于 resample_data)。
+
+    base 与 period 相同时原样返回。股票以 1 分钟线为基础时先合并 09:30 集合竞价 K 线。
+    """
+    if df.empty or base == period:
+        return df
+    if market == "stock" and base == "1":
+        df = _merge_stock_auction_bars(df)
+    derived = resample_data(df, period)
+    # resample_data 保留了用于调试的累计时间列，派生结果中去掉，保持与原生周期一致的列
+    if 'cum_mins' in derived.columns:
+        derived = derived.drop(columns=['cum_mins'])
+    return derived
+
+
+def bars_per_period(base: str, period: str) -> int:
+    """一根目标周期 K 线大约包含多少根基础周期 K 线 (向上取整，至少为 1)"""
+    base_minutes = _period_minutes(base)
+    target_minutes = _period_minutes(period)
+    if not base_minutes or not target_minutes:
+        return 1
+    return max(1, int(-(-target_minutes // base_minutes)))
+
+
+def warmup_start(start: pd.Timestamp, period: str, warmup_bars: int) -> pd.Timestamp:
+    """
+    估算覆盖 warmup_bars 根预热 K 线所需的最早自然日。
+
+    按每个交易日约 240 分钟、每周 5 个交易日换算，并预留节假日余量，
+    只用于决定向数据源请求的起始日期；精确的预热根数由 trim_to_window 保证。
+    """
+    minutes = _period_minutes(period) or 240.0
+    trading_days = warmup_bars * minutes / 240.0
+    calendar_days = int(trading_days * 7 / 5 * 1.2) + 10
+    return (pd.Timestamp(start) - pd.Timedelta(days=calendar_days)).normalize()
+
+
+def trim_to_window(df: pd.DataFrame, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp],
+                   warmup_bars: int = 0) -> pd.DataFrame:
+    """
+    截取 [start, end] 窗口，并在窗口前保留恰好 warmup_bars 根预热 K 线。
+
+    df 须按时间升序排列；start/end 为 None 时对应方向不截取，带时区的边界按上海时间对齐。
+    """
+    if df.empty:
+        return df
+    lo, hi = time_window(df.index, start, end, warmup_bars)
+    return df.iloc[lo:hi]
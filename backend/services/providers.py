@@ -0,0 +1,347 @@
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .fetch_scheduler import scheduler as fetch_scheduler
+
+# 行情数据提供者 (Market Data Provider)
+# 所有数据访问统一经过 provider，接口与 akshare 的同名函数一致 (参数与返回的列名相同)，
+# 上层的故障转移、列名转换等逻辑无需区分数据来自网络还是本地。
+#
+# 通过环境变量 MARKET_DATA_PROVIDER 选择:
+#   akshare  (默认) 直接调用 akshare
+#   replay   从 MARKET_DATA_REPLAY_DIR 读取录制的数据，缺失时生成确定性的合成数据，不访问网络
+#   record   调用 akshare，并把返回结果录制到 MARKET_DATA_REPLAY_DIR，供之后 replay 使用
+# replay 模式可注入延迟与错误率 (MARKET_DATA_REPLAY_LATENCY / _JITTER / _ERROR_RATE)，
+# 用于在无网络的机器上可复现地压测扫描与回测流程。
+MARKET_DATA_PROVIDER = os.environ.get('MARKET_DATA_PROVIDER', 'akshare')
+MARKET_DATA_REPLAY_DIR = os.environ.get(
+    'MARKET_DATA_REPLAY_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'replay')
+)
+
+# provider 需要实现的数据接口 (均为 akshare 函数名)
+PROVIDER_FUNCTIONS = [
+    'stock_zh_a_hist',
+    'stock_zh_a_hist_tx',
+    'stock_zh_a_minute',
+    'stock_zh_a_hist_min_em',
+    'stock_zh_a_spot_em',
+    'futures_zh_minute_sina',
+    'futures_zh_daily_sina',
+    'index_stock_cons',
+]
+
+
+class AkshareProvider:
+    """直接调用 akshare 的数据提供者 (akshare 在首次使用时才导入)"""
+
+    name = 'akshare'
+
+    def __getattr__(self, item):
+        if item not in PROVIDER_FUNCTIONS:
+            raise AttributeError(item)
+        import akshare
+        return getattr(akshare, item)
+
+
+def _record_path(root: str, func: str, kwargs: dict) -> str:
+    """录制文件路径: <root>/<函数名>/<按参数拼接的文件名>.csv"""
+    parts = [str(kwargs[k]) for k in sorted(kwargs) if k not in ('start_date', 'end_date') and kwargs[k] is not None]
+    name = '_'.join(parts) or 'default'
+    return os.path.join(root, func, f"{name}.csv")
+
+
+class RecordingProvider:
+    """调用 akshare 并把结果录制为 CSV (同一组参数只保留最近一次结果)"""
+
+    name = 'record'
+
+    def __init__(self, root: str = None):
+        self.root = root or MARKET_DATA_REPLAY_DIR
+        self._akshare = AkshareProvider()
+
+    def __getattr__(self, item):
+        fn = getattr(self._akshare, item)
+
+        def recorded(**kwargs):
+            df = fn(**kwargs)
+            if isinstance(df, pd.DataFrame) and not df.empty:
+                path = _record_path(self.root, item, kwargs)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                df.to_csv(path, index=False)
+            return df
+        return recorded
+
+
+class ReplayProvider:
+    """
+    离线回放的数据提供者。
+
+    逻辑:
+        1. 优先读取 RecordingProvider 录制的 CSV (按参数定位文件)，并按 start_date/end_date 截取。
+        2. 没有录制数据且允许合成时，按标的代码生成确定性的随机游走数据 (同一标的每次结果相同)，
+           分钟线的时间戳按品种交易时段生成。
+        3. 每次调用前按配置注入延迟 (latency ± jitter 秒) 与随机错误 (error_rate 概率抛出 ConnectionError)。
+    """
+
+    name = 'replay'
+    # 不访问网络，不受上游请求调度 (fetch_scheduler) 限速
+    rate_limited = False
+
+    def __init__(self, root: str = None, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 synthetic: bool = True, seed: int = 0, end: Optional[str] = None, bars: int = 2000):
+        self.root = root or MARKET_DATA_REPLAY_DIR
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.synthetic = synthetic
+        self.seed = seed
+        self.end = pd.Timestamp(end).normalize() if end else pd.Timestamp(datetime.now().date())
+        self.bars = bars
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    # ---- 延迟与错误注入 ----
+
+    def _inject(self, func: str):
+        with self._rng_lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)) if (self.latency or self.jitter) else 0.0
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise ConnectionError(f"replay: 注入的 {func} 错误")
+
+    def _load(self, func: str, kwargs: dict) -> Optional[pd.DataFrame]:
+        path = _record_path(self.root, func, kwargs)
+        if os.path.exists(path):
+            return pd.read_csv(path, dtype={'代码': str, '品种代码': str, '股票代码': str})
+        return None
+
+    def _rng_for(self, *parts) -> np.random.Generator:
+        key = '|'.join(str(p) for p in parts)
+        return np.random.default_rng(zlib.crc32(key.encode('utf-8')) + self.seed)
+
+    # ---- 合成数据 ----
+
+    def _daily_index(self, period: str = 'daily') -> pd.DatetimeIndex:
+        days = pd.bdate_range(end=self.end, periods=self.bars)
+        if period == 'weekly':
+            return pd.DatetimeIndex(pd.Series(days, index=days).resample('W-FRI').last().dropna().values)
+        if period == 'monthly':
+            return pd.DatetimeIndex(pd.Series(days, index=days).resample('ME').last().dropna().values)
+        return days
+
+    def _intraday_index(self, symbol: str, market: str, period: str) -> pd.DatetimeIndex:
+        from .bar_expiry import trading_day_closes
+        stamps = []
+        day = self.end
+        while len(stamps) < self.bars:
+            stamps = trading_day_closes(symbol, market, str(period), day.to_pydatetime()) + stamps
+            day -= timedelta(days=1)
+        return pd.DatetimeIndex(stamps[-self.bars:])
+
+    def _ohlcv(self, index: pd.DatetimeIndex, *key) -> pd.DataFrame:
+        rng = self._rng_for(*key)
+        n = len(index)
+        base = 20 + (zlib.crc32(str(key[0]).encode('utf-8')) % 3000)
+        close = base * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+        open_ = close * (1 + rng.normal(0, 0.003, n))
+        high = np.maximum(open_, close) * (1 + rng.random(n) * 0.005)
+        low = np.minimum(open_, close) * (1 - rng.random(n) * 0.005)
+        volume = rng.integers(1_000, 1_000_000, n)
+        return pd.DataFrame({
+            'open': np.round(open_, 2), 'high': np.round(high, 2), 'low': np.round(low, 2),
+            'close': np.round(close, 2), 'volume': volume,
+        }, index=index)
+
+    @staticmethod
+    def _slice(df: pd.DataFrame, column: str, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+        if df.empty or (not start_date and not end_date):
+            return df
+        ts = pd.to_datetime(df[column])
+        mask = pd.Series(True, index=df.index)
+        if start_date:
+            mask &= ts >= pd.Timestamp(start_date)
+        if end_date:
+            end = pd.Timestamp(end_date)
+            if len(str(end_date).replace('-', '')) <= 8:
+                end += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+            mask &= ts <= end
+        return df[mask.to_numpy()].reset_index(drop=True)
+
+    def _serve(self, func: str, kwargs: dict, make) -> pd.DataFrame:
+        self._inject(func)
+        df = self._load(func, kwargs)
+        if df is None:
+            if not self.synthetic:
+                return pd.DataFrame()
+            df = make()
+        return df
+
+    # ---- akshare 同名接口 ----
+
+    def stock_zh_a_hist(self, symbol: str, period: str = 'daily', start_date: str = None, end_date: str = None,
+                        adjust: str = '', **_) -> pd.DataFrame:
+        def make():
+            bars = self._ohlcv(self._daily_index(period), symbol, 'stock', period, adjust)
+            return pd.DataFrame({
+                '日期': bars.index.strftime('%Y-%m-%d'), '股票代码': symbol,
+                '开盘': bars['open'].values, '收盘': bars['close'].values,
+                '最高': bars['high'].values, '最低': bars['low'].values,
+                '成交量': bars['volume'].values, '成交额': (bars['volume'] * bars['close'] * 100).round(2).values,
+                '振幅': ((bars['high'] - bars['low']) / bars['close'] * 100).round(2).values,
+                '涨跌幅': (bars['close'].pct_change().fillna(0) * 100).round(2).values,
+                '涨跌额': bars['close'].diff().fillna(0).round(2).values,
+                '换手率': np.round(bars['volume'].values / 1e5, 2),
+            })
+        df = self._serve('stock_zh_a_hist', {'symbol': symbol, 'period': period, 'adjust': adjust}, make)
+        return self._slice(df, '日期', start_date, end_date)
+
+    def stock_zh_a_hist_tx(self, symbol: str, start_date: str = None, end_date: str = None, adjust: str = '', **_) -> pd.DataFrame:
+        code = symbol[2:] if symbol[:2] in ('sh', 'sz', 'bj') else symbol
+
+        def make():
+            bars = self._ohlcv(self._daily_index(), code, 'stock', 'daily', adjust)
+            return pd.DataFrame({
+                'date': bars.index.strftime('%Y-%m-%d'), 'open': bars['open'].values, 'close': bars['close'].values,
+                'high': bars['high'].values, 'low': bars['low'].values, 'amount': bars['volume'].values,
+            })
+        df = self._serve('stock_zh_a_hist_tx', {'symbol': symbol, 'adjust': adjust}, make)
+        return self._slice(df, 'date', start_date, end_date)
+
+    def stock_zh_a_minute(self, symbol: str, period: str = '1', adjust: str = '', **_) -> pd.DataFrame:
+        code = symbol[2:] if symbol[:2] in ('sh', 'sz', 'bj') else symbol
+
+        def make():
+            bars = self._ohlcv(self._intraday_index(code, 'stock', period), code, 'stock', period, adjust)
+            df = bars.astype(str)
+            df.insert(0, 'day', bars.index.strftime('%Y-%m-%d %H:%M:%S'))
+            return df.reset_index(drop=True)
+        return self._serve('stock_zh_a_minute', {'symbol': symbol, 'period': period, 'adjust': adjust}, make)
+
+    def stock_zh_a_hist_min_em(self, symbol: str, start_date: str = None, end_date: str = None, period: str = '5',
+                               adjust: str = '', **_) -> pd.DataFrame:
+        def make():
+            bars = self._ohlcv(self._intraday_index(symbol, 'stock', period), symbol, 'stock', period, adjust)
+            return pd.DataFrame({
+                '时间': bars.index.strftime('%Y-%m-%d %H:%M:%S'),
+                '开盘': bars['open'].values, '收盘': bars['close'].values,
+                '最高': bars['high'].values, '最低': bars['low'].values,
+                '成交量': bars['volume'].values, '成交额': (bars['volume'] * bars['close'] * 100).round(2).values,
+            })
+        df = self._serve('stock_zh_a_hist_min_em', {'symbol': symbol, 'period': period, 'adjust': adjust}, make)
+        return self._slice(df, '时间', start_date, end_date)
+
+    def stock_zh_a_spot_em(self, **_) -> pd.DataFrame:
+        def make():
+            codes = [f"{600000 + i:06d}" for i in range(50)] + [f"{i:06d}" for i in range(1, 51)]
+            rows = []
+            for code in codes:
+                last = self._ohlcv(self._daily_index()[-1:], code, 'stock', 'daily', 'qfq').iloc[-1]
+                rows.append({'代码': code, '名称': f"合成{code}", '最新价': last['close'], '今开': last['open'],
+                             '最高': last['high'], '最低': last['low'], '成交量': int(last['volume'])})
+            return pd.DataFrame(rows)
+        return self._serve('stock_zh_a_spot_em', {}, make)
+
+    def futures_zh_minute_sina(self, symbol: str, period: str = '1', **_) -> pd.DataFrame:
+        def make():
+            bars = self._ohlcv(self._intraday_index(symbol, 'futures', period), symbol, 'futures', period)
+            bars['hold'] = self._rng_for(symbol, 'hold', period).integers(100_000, 500_000, len(bars))
+            df = bars.reset_index(drop=True)
+            df.insert(0, 'datetime', bars.index.strftime('%Y-%m-%d %H:%M:%S'))
+            return df
+        return self._serve('futures_zh_minute_sina', {'symbol': symbol, 'period': period}, make)
+
+    def futures_zh_daily_sina(self, symbol: str, **_) -> pd.DataFrame:
+        def make():
+            bars = self._ohlcv(self._daily_index(), symbol, 'futures', 'daily')
+            bars['hold'] = self._rng_for(symbol, 'hold', 'daily').integers(100_000, 500_000, len(bars))
+            bars['settle'] = bars['close']
+            df = bars.reset_index(drop=True)
+            df.insert(0, 'date', bars.index.strftime('%Y-%m-%d'))
+            return df
+        return self._serve('futures_zh_daily_sina', {'symbol': symbol}, make)
+
+    def index_stock_cons(self, symbol: str = '000300', **_) -> pd.DataFrame:
+        def make():
+            codes = [f"{600000 + i:06d}" for i in range(150)] + [f"{i:06d}" for i in range(1, 151)]
+            return pd.DataFrame({'品种代码': codes, '品种名称': [f"合成{c}" for c in codes], '纳入日期': '2020-01-01'})
+        return self._serve('index_stock_cons', {'symbol': symbol}, make)
+
+
+def create_provider(kind: str = None):
+    """按名称创建数据提供者 (默认读取 MARKET_DATA_PROVIDER 及 MARKET_DATA_REPLAY_* 环境变量)"""
+    kind = kind or MARKET_DATA_PROVIDER
+    if kind == 'akshare':
+        return AkshareProvider()
+    if kind == 'record':
+        return RecordingProvider()
+    if kind == 'replay':
+        return ReplayProvider(
+            latency=float(os.environ.get('MARKET_DATA_REPLAY_LATENCY', '0')),
+            jitter=float(os.environ.get('MARKET_DATA_REPLAY_JITTER', '0')),
+            error_rate=float(os.environ.get('MARKET_DATA_REPLAY_ERROR_RATE', '0')),
+            synthetic=os.environ.get('MARKET_DATA_REPLAY_SYNTHETIC', '1') != '0',
+            seed=int(os.environ.get('MARKET_DATA_REPLAY_SEED', '0')),
+            end=os.environ.get('MARKET_DATA_REPLAY_END') or None,
+        )
+    raise ValueError(f"未知的行情数据提供者: {kind}")
+
+
+class _ProviderProxy:
+    """
+    当前数据提供者的代理。
+
+    各模块在导入时绑定 `provider`，通过 set_provider 切换实现后立即生效 (基准测试中切换为 replay)。
+    访问网络的提供者的接口经 fetch_scheduler 包装，每次调用前按数据源与当前优先级领取令牌。
+    """
+
+    def __init__(self):
+        self._current = None
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        if self._current is None:
+            with self._lock:
+                if self._current is None:
+                    self._current = create_provider()
+        return self._current
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+        current = self.current
+        attr = getattr(current, item)
+        if callable(attr) and getattr(current, 'rate_limited', True):
+            return fetch_scheduler.wrap(item, attr)
+        return attr
+
+
+provider = _ProviderProxy()
+
+
+def set_provider(new_provider):
+    """切换当前数据提供者，返回之前的提供者"""
+    previous = provider._current
+    provider._current = new_provider
+    return previous
+
+
+def get_provider():
+    """返回当前数据提供者实例"""
+    return provider.current
@@ -0,0 +1,144 @@
+import os
+import shutil
+import threading
+import uuid
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .bar_schema import BAR_COLUMNS
+
+# 多进程共享的 K 线缓存 (Shared Bar Cache)
+# 以多个 uvicorn worker 运行 main:app 时，各进程原本各自从 K 线库读取并持有同一序列的副本。
+# 开启后，每个序列的每个版本 (bar_store 的写入版本号) 由最先读取它的进程写成一组 .npy 文件
+# (索引与每列各一个文件)，其他进程直接以只读方式内存映射 (np.load mmap_mode='r')，
+# 数据位于操作系统页缓存中，各进程共享同一份物理内存，无需复制或重新读取/获取。
+# 默认目录优先使用 /dev/shm (内存文件系统)。序列写入新版本后旧版本目录被删除，
+# 已映射旧文件的进程不受影响 (文件在最后一个映射关闭后才真正释放)。
+SHARED_BAR_CACHE_ENABLED = os.environ.get('SHARED_BAR_CACHE', '0') == '1'
+SHARED_BAR_CACHE_DIR = os.environ.get(
+    'SHARED_BAR_CACHE_DIR',
+    '/dev/shm/dkx-monitor-bars' if os.path.isdir('/dev/shm')
+    else os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'shared_bars')
+)
+
+_INDEX_FILE = 'date.npy'
+
+_lock = threading.Lock()
+# 本进程已映射的序列 {key: (version, DataFrame)}
+_mapped: Dict[tuple, tuple] = {}
+_stats = {"mapped": 0, "reused": 0, "published": 0, "errors": 0}
+
+
+def _series_dir(key) -> str:
+    name = '__'.join(str(part) or '-' for part in key)
+    return os.path.join(SHARED_BAR_CACHE_DIR, name.replace(os.sep, '_'))
+
+
+def _version_dir(key, version) -> str:
+    return os.path.join(_series_dir(key), str(version))
+
+
+def publish(key, version, df: pd.DataFrame) -> bool:
+    """
+    将序列的一个版本写入共享目录 (统一 K 线格式，见 bar_schema)。
+
+    先写入临时目录再原子重命名，其他进程不会映射到写了一半的文件；
+    已有进程发布了同一版本时直接丢弃本次写入。发布后删除该序列的其他版本。
+    """
+    final = _version_dir(key, version)
+    if os.path.isdir(final):
+        return False
+    tmp = os.path.join(_series_dir(key), f".tmp-{os.getpid()}-{uuid.uuid4().hex}")
+    os.makedirs(tmp)
+    try:
+        np.save(os.path.join(tmp, _INDEX_FILE), df.index.as_unit('ns').asi8)
+        for col in df.columns:
+            np.save(os.path.join(tmp, f"{col}.npy"), np.ascontiguousarray(df[col].to_numpy()))
+        os.rename(tmp, final)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(final):
+            raise
+        return False
+    with _lock:
+        _stats["published"] += 1
+    for name in os.listdir(_series_dir(key)):
+        if name != str(version) and not name.startswith('.tmp-'):
+            shutil.rmtree(os.path.join(_series_dir(key), name), ignore_errors=True)
+    return True
+
+
+def map_series(key, version) -> Optional[pd.DataFrame]:
+    """
+    以只读方式映射序列的指定版本，不存在时返回 None。
+
+    返回的 DataFrame 每列直接引用映射的内存 (不复制)，修改前须先复制 (见 frame_cache.detach)。
+    """
+    path = _version_dir(key, version)
+    if not os.path.isdir(path):
+        return None
+    ts = np.load(os.path.join(path, _INDEX_FILE), mmap_mode='r')
+    columns = {}
+    for col in BAR_COLUMNS:
+        file = os.path.join(path, f"{col}.npy")
+        if os.path.exists(file):
+            columns[col] = np.load(file, mmap_mode='r')
+    index = pd.DatetimeIndex(ts.view('datetime64[ns]'), name='date')
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def load_series(key, version, loader: Callable[[], pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """
+    获取序列指定版本的共享映射。
+
+    逻辑:
+        1. 本进程已映射该版本时直接复用。
+        2. 其他进程已发布该版本时映射其文件。
+        3. 否则调用 loader 读取完整序列 (通常为 bar_store.read_bars) 并发布后映射。
+    未开启、无版本号或共享目录读写失败时返回 None，由调用方直接读取 K 线库。
+    """
+    if not SHARED_BAR_CACHE_ENABLED or version is None:
+        return None
+    key = tuple(key)
+    with _lock:
+        mapped = _mapped.get(key)
+        if mapped is not None and mapped[0] == version:
+            _stats["reused"] += 1
+            return mapped[1]
+    try:
+        df = map_series(key, version)
+        if df is None:
+            full = loader()
+            if full.empty:
+                return full
+            publish(key, version, full)
+            df = map_series(key, version)
+            if df is None:
+                return None
+    except (OSError, ValueError) as e:
+        print(f"共享K线缓存读写失败 {key}: {e}")
+        with _lock:
+            _stats["errors"] += 1
+        return None
+    with _lock:
+        _mapped[key] = (version, df)
+        _stats["mapped"] += 1
+    return df
+
+
+def get_stats() -> Dict:
+    with _lock:
+        stats = dict(_stats)
+        stats["series"] = len(_mapped)
+    stats["enabled"] = SHARED_BAR_CACHE_ENABLED
+    stats["dir"] = SHARED_BAR_CACHE_DIR
+    return stats
+
+
+def clear():
+    """清空本进程的映射并删除共享目录 (测试与运维使用)"""
+    with _lock:
+        _mapped.clear()
+    shutil.rmtree(SHARED_BAR_CACHE_DIR, ignore_errors=True)
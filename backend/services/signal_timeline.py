@@ -0,0 +1,118 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .indicator_kernels import find_crosses
+from .time_index import to_index_value, format_times
+
+# 信号时间线 (Signal Timeline)
+# 一个序列上某组快线/慢线的全部交叉，按行号升序保存各交叉的行号、时间、方向及当根的收盘价与指标值，
+# 不保留原始 K 线。检测时 "最近 N 根内的最新信号"、"时间范围内的信号" 与图表窗口内的信号标记
+# 都在这些数组上二分查找 (O(log k)，k 为交叉个数)，只为选中的交叉生成信号字典。
+# 查询结果与 check_dkx_signal / check_ma_signal 逐项一致 (共用 find_crosses)。
+# 同一序列的检测、导出与图表标记共用一条时间线，由 indicators.signal_timeline 与指标结果一同缓存。
+
+
+class SignalTimeline:
+    """
+    df 上 fast 列与 slow 列的交叉时间线。
+
+    fast 列不存在或全为空时为空时间线。df 的索引须为按时间升序的 DatetimeIndex。
+    """
+
+    def __init__(self, df: pd.DataFrame, fast: str, slow: str):
+        self.fast = fast
+        self.slow = slow
+        self.length = len(df)
+        # 首末两根 K 线的时间，用于确认缓存的时间线与 df 对应 (见 matches)
+        self.bounds = (df.index[0], df.index[-1]) if len(df) else None
+        # 保留索引的时区与精度，查询边界按其换算 (见 time_index.to_index_value)
+        self._index = df.index[:0]
+
+        if fast in df.columns and not df[fast].isnull().all():
+            fast_values = df[fast].to_numpy(dtype='float64')
+            slow_values = df[slow].to_numpy(dtype='float64')
+            positions, buy = find_crosses(fast_values, slow_values)
+            close = df['close'].to_numpy(dtype='float64')
+            self.positions = positions
+            self.buy = buy
+            self.dates = df.index[positions]
+            self.price = close[positions]
+            self.fast_values = fast_values[positions]
+            self.slow_values = slow_values[positions]
+        else:
+            self.positions = np.empty(0, dtype=np.int64)
+            self.buy = np.empty(0, dtype=bool)
+            self.dates = df.index[:0]
+            self.price = self.fast_values = self.slow_values = np.empty(0, dtype='float64')
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def nbytes(self) -> int:
+        """占用的字节数 (用于缓存预算)"""
+        arrays = (self.positions, self.buy, self.dates.asi8, self.price, self.fast_values, self.slow_values)
+        return sum(a.nbytes for a in arrays)
+
+    def matches(self, df: pd.DataFrame) -> bool:
+        """df 的长度与首末 K 线时间是否与构建时间线的序列相同"""
+        if len(df) != self.length:
+            return False
+        return self.bounds is None or (df.index[0], df.index[-1]) == self.bounds
+
+    def _select(self, lookback: int, start_time: Optional[str], end_time: Optional[str]) -> Optional[Tuple[int, int]]:
+        """
+        返回满足条件的交叉在时间线中的下标范围 [i0, i1)，时间解析失败时返回 None。
+
+        规则同 check_dkx_signal: 指定时间范围时取范围内 K 线上的交叉 (范围内第一根与其前一根比较)；
+        否则取最近 lookback 根 K 线上的交叉，lookback 为 0 表示全部历史。
+        """
+        if start_time and end_time:
+            try:
+                lo = to_index_value(start_time, self._index)
+                hi = to_index_value(end_time, self._index)
+            except Exception as e:
+                print(f"信号时间线 {self.fast}/{self.slow} 时间过滤出错: {e}")
+                return None
+            times = self.dates.asi8
+            return int(np.searchsorted(times, lo, 'left')), int(np.searchsorted(times, hi, 'right'))
+
+        lb = abs(lookback)
+        if lb == 0:
+            return 0, len(self.positions)
+        return int(np.searchsorted(self.positions, self.length - lb, 'left')), len(self.positions)
+
+    def _signals(self, i0: int, i1: int) -> List[dict]:
+        """下标 [i0, i1) 的交叉生成信号字典 (格式同 check_dkx_signal)"""
+        if i1 <= i0:
+            return []
+        dates = format_times(self.dates[i0:i1])
+        last = self.length - 1
+        return [{
+            "signal": "BUY" if self.buy[i] else "SELL",
+            "date": dates[i - i0],
+            "price": self.price[i],
+            self.fast: self.fast_values[i],
+            self.slow: self.slow_values[i],
+            "offset": last - int(self.positions[i])
+        } for i in range(i0, i1)]
+
+    def query(self, lookback: int = 5, start_time: Optional[str] = None, end_time: Optional[str] = None) -> List[dict]:
+        """全部满足条件的信号，参数与结果同 check_dkx_signal / check_ma_signal"""
+        selected = self._select(lookback, start_time, end_time)
+        return self._signals(*selected) if selected is not None else []
+
+    def latest(self, lookback: int = 5, start_time: Optional[str] = None, end_time: Optional[str] = None) -> Optional[dict]:
+        """满足条件的最新一个信号 (即 query(...)[-1])，没有时返回 None"""
+        selected = self._select(lookback, start_time, end_time)
+        if selected is None or selected[1] <= selected[0]:
+            return None
+        return self._signals(selected[1] - 1, selected[1])[0]
+
+    def in_rows(self, start: int, stop: int) -> List[dict]:
+        """行号在 [start, stop) 内的交叉 (如图表窗口内的信号标记)"""
+        i0 = int(np.searchsorted(self.positions, start, 'left'))
+        i1 = int(np.searchsorted(self.positions, stop, 'left'))
+        return self._signals(i0, i1)
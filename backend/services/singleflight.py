@@ -0,0 +1,134 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """一次在途调用: 结果通过 future 分发给所有等待者，dups 记录加入的等待者数量，boost 见 SingleFlight"""
+
+    __slots__ = ("future", "dups", "boost")
+
+    def __init__(self, boost=None):
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+        self.dups = 0
+        self.boost = boost
+
+
+class SingleFlight:
+    """
+    单飞 (Single-Flight) 请求合并。
+
+    同一个 key 的并发调用只会真正执行一次: 第一个调用者 (leader) 负责执行，
+    其余并发调用者等待并共享同一个结果 (或同一个异常)。执行结束后 key 被移除，
+    之后的调用会重新执行，因此这里只合并"同时在途"的请求，不做结果缓存。
+
+    线程调用方使用 do()，asyncio 调用方使用 do_async()，两者共享同一张在途表，
+    协程与线程对同一 key 的请求同样会被合并。
+
+    boost_factory (可选, 如 fetch_scheduler.PriorityBoost): leader 登记时在其上下文中创建，
+    leader 在 boost.scope() 内执行 fn，等待者加入时调用 boost.join()。用于把在途调用提升到
+    等待者的优先级，避免高优先级调用者合并到低优先级的获取上后按低优先级排队 (优先级反转)。
+    """
+
+    def __init__(self, boost_factory: Optional[Callable[[], Any]] = None):
+        self._boost_factory = boost_factory
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._executions = 0
+        self._shared = 0
+
+    def _join(self, key: Hashable) -> Tuple[_Call, bool]:
+        """登记或加入在途调用，返回 (call, 是否为 leader)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.dups += 1
+                self._shared += 1
+                return call, False
+            call = _Call(self._boost_factory() if self._boost_factory else None)
+            self._calls[key] = call
+            self._executions += 1
+            return call, True
+
+    def _finish(self, key: Hashable, call: _Call, result: Any = None, error: BaseException = None) -> bool:
+        """移除在途记录并唤醒等待者，返回是否有其他调用者共享了结果"""
+        with self._lock:
+            self._calls.pop(key, None)
+            shared = call.dups > 0
+        if error is not None:
+            call.future.set_exception(error)
+        else:
+            call.future.set_result(result)
+        return shared
+
+    @staticmethod
+    def _wait(call: _Call):
+        """加入在途调用: 提升其优先级 (若有)，返回共享的 future"""
+        if call.boost is not None:
+            call.boost.join()
+        return call.future
+
+    @staticmethod
+    def _run(call: _Call, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        if call.boost is None:
+            return fn(*args, **kwargs)
+        with call.boost.scope():
+            return fn(*args, **kwargs)
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Tuple[Any, bool]:
+        """
+        以阻塞方式执行 (或加入) key 对应的调用。
+
+        返回:
+            (result, shared): shared 为 True 表示结果对象同时交给了其他调用者，
+            调用方若要修改结果 (如 DataFrame)，应先复制。
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return self._wait(call).result(), True
+        try:
+            result = self._run(call, fn, args, kwargs)
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        return result, self._finish(key, call, result=result)
+
+    async def do_async(self, key: Hashable, fn: Callable, *args, **kwargs) -> Tuple[Any, bool]:
+        """
+        do() 的 asyncio 版本。
+
+        leader 把阻塞函数 fn 提交到默认线程池后与其他调用者一样等待共享的 future，
+        既不阻塞事件循环，也不额外占用线程。fn 的执行与结果分发不依附于 leader 协程，
+        等待通过 asyncio.shield 挂起: 任一调用者 (包括 leader) 被取消只影响它自己，
+        在途调用照常完成，其余等待者仍拿到结果。
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return await asyncio.shield(asyncio.wrap_future(self._wait(call))), True
+        # 线程池中沿用调用方的 contextvars (如数据源请求优先级)
+        ctx = contextvars.copy_context()
+
+        def execute():
+            try:
+                result = ctx.run(self._run, call, fn, args, kwargs)
+            except BaseException as e:
+                self._finish(key, call, error=e)
+            else:
+                self._finish(key, call, result=result)
+
+        asyncio.get_running_loop().run_in_executor(None, execute)
+        result = await asyncio.shield(asyncio.wrap_future(call.future))
+        # 结果分发前在途记录已移除，此时 dups 不再变化
+        return result, call.dups > 0
+
+    def stats(self) -> Dict[str, int]:
+        """返回合并统计: 实际执行次数、被合并 (共享结果) 的调用次数、当前在途数"""
+        with self._lock:
+            return {
+                "executions": self._executions,
+                "shared": self._shared,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,308 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 数据源注册表 (Source Registry)
+# 为每个行情数据源记录近期成功率与耗时，并实现熔断:
+#   - 连续失败达到 SOURCE_FAILURE_THRESHOLD 次后熔断 (open)，期间直接跳过该数据源；
+#   - 熔断 SOURCE_COOLDOWN 秒后进入半开 (half_open)，放行一次试探调用，成功则恢复，失败则重新熔断。
+# 故障转移链按健康度排序: 健康的数据源保持配置顺序，不健康的排到后面，熔断的跳过。
+# 熔断只针对异常与超时: 返回结果不被调用方接受 (如停牌、代码错误或时间窗口内无数据时的空结果)
+# 说明数据源工作正常，只是没有数据，不计入失败，以免一次查询空标的就把数据源熔断给所有用户。
+SOURCE_FAILURE_THRESHOLD = max(1, int(os.environ.get('SOURCE_FAILURE_THRESHOLD', '3')))
+SOURCE_COOLDOWN = float(os.environ.get('SOURCE_COOLDOWN', '30'))
+# 成功率 EWMA 的平滑系数，以及判定为健康的成功率下限 (一次失败即降级)
+SOURCE_EWMA_ALPHA = 0.2
+SOURCE_HEALTHY_RATE = 0.9
+# 成功率随时间向 1 恢复的半衰期 (秒)，降级的数据源在此期间之后重新排回前面
+SOURCE_RECOVERY_HALFLIFE = float(os.environ.get('SOURCE_RECOVERY_HALFLIFE', '120'))
+# 每个数据源保留的耗时样本数 (用于计算分位数)
+SOURCE_LATENCY_SAMPLES = 200
+
+# 对冲请求 (Hedged Requests)，默认关闭: 主数据源在其近期耗时的 SOURCE_HEDGE_PERCENTILE 分位数内
+# 仍未返回时，向备用数据源发出同一请求，先返回有效结果者胜出，另一个的结果被丢弃。
+SOURCE_HEDGE_ENABLED = os.environ.get('SOURCE_HEDGE_ENABLED', '0') == '1'
+SOURCE_HEDGE_PERCENTILE = float(os.environ.get('SOURCE_HEDGE_PERCENTILE', '95'))
+# 主数据源尚无耗时样本时的对冲延迟，以及对冲延迟的下限 (秒)
+SOURCE_HEDGE_DEFAULT_DELAY = float(os.environ.get('SOURCE_HEDGE_DEFAULT_DELAY', '1.0'))
+SOURCE_HEDGE_MIN_DELAY = float(os.environ.get('SOURCE_HEDGE_MIN_DELAY', '0.05'))
+SOURCE_HEDGE_WORKERS = max(2, int(os.environ.get('SOURCE_HEDGE_WORKERS', '16')))
+
+
+class SourceUnavailable(Exception):
+    """数据源处于熔断状态，本次调用被跳过"""
+
+
+class SourceRejected(Exception):
+    """数据源正常返回但结果不被接受 (如空数据)，即没有数据；不计为该数据源的失败"""
+
+
+class _SourceState:
+    __slots__ = ("success_rate", "updated_at", "latency_ewma", "latencies", "calls", "failures",
+                 "consecutive_failures", "opened_at", "trial_in_flight", "last_error", "skipped")
+
+    def __init__(self):
+        self.success_rate = 1.0
+        self.updated_at = time.time()
+        self.latency_ewma = None
+        self.latencies = deque(maxlen=SOURCE_LATENCY_SAMPLES)
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.last_error = None
+        self.skipped = 0
+
+
+class SourceRegistry:
+    """
+    数据源健康度跟踪与熔断。
+
+    用法:
+        registry.call("em_daily", fn, *args, accept=_non_empty)  # 单个数据源，熔断时抛出 SourceUnavailable
+        registry.run_chain([("em_daily", f1), ("tx_daily", f2)], accept)  # 按健康度依次尝试
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources: Dict[str, _SourceState] = {}
+        self._hedge_executor = None
+        self._hedge = {"requests": 0, "fired": 0, "primary_wins": 0, "secondary_wins": 0, "cancelled": 0}
+
+    def _state(self, name: str) -> _SourceState:
+        state = self._sources.get(name)
+        if state is None:
+            state = self._sources[name] = _SourceState()
+        return state
+
+    def _circuit(self, state: _SourceState, now: float) -> str:
+        if state.opened_at is None:
+            return "closed"
+        if now - state.opened_at >= SOURCE_COOLDOWN:
+            return "half_open"
+        return "open"
+
+    def _rate(self, state: _SourceState, now: float) -> float:
+        """当前成功率: 失败的影响按 SOURCE_RECOVERY_HALFLIFE 随时间衰减"""
+        if SOURCE_RECOVERY_HALFLIFE <= 0:
+            return state.success_rate
+        decay = 0.5 ** (max(0.0, now - state.updated_at) / SOURCE_RECOVERY_HALFLIFE)
+        return 1.0 - (1.0 - state.success_rate) * decay
+
+    def _acquire(self, name: str) -> bool:
+        """判断是否允许调用；半开状态下只放行一个试探调用"""
+        with self._lock:
+            state = self._state(name)
+            circuit = self._circuit(state, time.time())
+            if circuit == "closed":
+                return True
+            if circuit == "half_open" and not state.trial_in_flight:
+                state.trial_in_flight = True
+                return True
+            state.skipped += 1
+            return False
+
+    def available(self, name: str) -> bool:
+        """数据源当前是否可调用 (不占用半开试探名额)"""
+        with self._lock:
+            state = self._state(name)
+            circuit = self._circuit(state, time.time())
+            return circuit == "closed" or (circuit == "half_open" and not state.trial_in_flight)
+
+    def record_success(self, name: str, latency: float):
+        with self._lock:
+            state = self._state(name)
+            state.calls += 1
+            now = time.time()
+            state.success_rate = (1 - SOURCE_EWMA_ALPHA) * self._rate(state, now) + SOURCE_EWMA_ALPHA
+            state.updated_at = now
+            state.latency_ewma = latency if state.latency_ewma is None else \
+                (1 - SOURCE_EWMA_ALPHA) * state.latency_ewma + SOURCE_EWMA_ALPHA * latency
+            state.latencies.append(latency)
+            state.consecutive_failures = 0
+            state.opened_at = None
+            state.trial_in_flight = False
+
+    def record_failure(self, name: str, latency: float, error: BaseException = None):
+        with self._lock:
+            state = self._state(name)
+            state.calls += 1
+            state.failures += 1
+            now = time.time()
+            state.success_rate = (1 - SOURCE_EWMA_ALPHA) * self._rate(state, now)
+            state.updated_at = now
+            state.consecutive_failures += 1
+            state.last_error = repr(error) if error is not None else None
+            if state.trial_in_flight or state.consecutive_failures >= SOURCE_FAILURE_THRESHOLD:
+                if state.opened_at is None or state.trial_in_flight:
+                    print(f"数据源 {name} 熔断 {SOURCE_COOLDOWN:.0f}s (连续失败 {state.consecutive_failures} 次): {error}")
+                state.opened_at = time.time()
+            state.trial_in_flight = False
+
+    def call(self, name: str, fn: Callable, *args, accept: Callable[[Any], bool] = None, **kwargs) -> Any:
+        """
+        通过注册表调用单个数据源。
+
+        熔断时立即抛出 SourceUnavailable；fn 抛出的异常记为失败并原样抛出。
+        指定 accept 时，结果不被接受 (没有数据) 抛出 SourceRejected，但仍记为一次成功调用，不影响熔断。
+        """
+        if not self._acquire(name):
+            raise SourceUnavailable(name)
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.record_failure(name, time.perf_counter() - start, e)
+            raise
+        self.record_success(name, time.perf_counter() - start)
+        if accept is not None and not accept(result):
+            raise SourceRejected(f"数据源 {name} 无数据")
+        return result
+
+    def order(self, names: Sequence[str]) -> List[str]:
+        """按健康度排序: 健康的数据源保持给定顺序在前，不健康的按成功率降序在后"""
+        with self._lock:
+            now = time.time()
+            rates = {n: self._rate(self._state(n), now) for n in names}
+        healthy = [n for n in names if rates[n] >= SOURCE_HEALTHY_RATE]
+        degraded = sorted((n for n in names if rates[n] < SOURCE_HEALTHY_RATE), key=lambda n: -rates[n])
+        return healthy + degraded
+
+    def run_chain(self, chain: Sequence[Tuple[str, Callable]], accept: Callable[[Any], bool] = None,
+                  hedge: bool = False) -> Optional[Any]:
+        """
+        按健康度依次尝试故障转移链中的数据源，返回第一个被 accept 接受的结果。
+
+        熔断的数据源直接跳过；数据源抛出异常 (记为失败) 或没有数据时尝试下一个，全部失败返回 None。
+        hedge=True 且启用了 SOURCE_HEDGE_ENABLED 时，排在最前的两个可用数据源以对冲方式并发请求。
+        """
+        fns = dict(chain)
+        names = self.order([n for n, _ in chain])
+        if hedge and SOURCE_HEDGE_ENABLED:
+            available = [n for n in names if self.available(n)]
+            if len(available) >= 2:
+                primary, secondary = available[0], available[1]
+                result = self._run_hedged(primary, fns[primary], secondary, fns[secondary], accept)
+                if result is not None:
+                    return result
+                names = [n for n in names if n not in (primary, secondary)]
+        for name in names:
+            try:
+                return self.call(name, fns[name], accept=accept)
+            except (SourceUnavailable, SourceRejected):
+                continue
+            except Exception as e:
+                print(f"数据源 {name} 获取失败: {e}")
+                continue
+        return None
+
+    def hedge_delay(self, name: str) -> float:
+        """主数据源的对冲延迟: 近期耗时的 SOURCE_HEDGE_PERCENTILE 分位数"""
+        delay = self.latency_percentile(name, SOURCE_HEDGE_PERCENTILE)
+        if delay is None:
+            delay = SOURCE_HEDGE_DEFAULT_DELAY
+        return max(delay, SOURCE_HEDGE_MIN_DELAY)
+
+    def _count_hedge(self, key: str):
+        with self._lock:
+            self._hedge[key] += 1
+
+    def _run_hedged(self, primary: str, primary_fn: Callable, secondary: str, secondary_fn: Callable,
+                    accept: Callable[[Any], bool] = None) -> Optional[Any]:
+        """
+        对冲请求两个可互换的数据源。
+
+        逻辑:
+            1. 先请求主数据源，最多等待 hedge_delay(primary)。
+            2. 期间返回有效结果则直接使用；主数据源失败则立即改用备用数据源 (普通故障转移)。
+            3. 超时未返回则对冲: 向备用数据源发出同一请求，先返回有效结果者胜出。
+            4. 落败的请求被取消；已在执行的 akshare 调用无法中断，其结果到达后直接丢弃。
+        """
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=SOURCE_HEDGE_WORKERS, thread_name_prefix="hedge")
+            executor = self._hedge_executor
+            self._hedge["requests"] += 1
+
+        def submit(name, fn):
+            # 在调用方上下文的副本中执行，保留请求优先级 (fetch_scheduler)
+            return executor.submit(contextvars.copy_context().run, self.call, name, fn, accept=accept)
+
+        futures = {submit(primary, primary_fn): primary}
+        done, _ = wait(futures, timeout=self.hedge_delay(primary))
+        hedged = not done
+        if hedged:
+            self._count_hedge("fired")
+            futures[submit(secondary, secondary_fn)] = secondary
+        elif done.pop().exception() is not None:
+            futures[submit(secondary, secondary_fn)] = secondary
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        # 已在执行的请求无法取消，只统计确实省下的上游请求
+                        if loser.cancel():
+                            self._count_hedge("cancelled")
+                    # 胜负只在对冲触发时统计 (未触发或主数据源失败后的普通故障转移不计入)
+                    if hedged:
+                        self._count_hedge("primary_wins" if futures[future] == primary else "secondary_wins")
+                    return future.result()
+                if not isinstance(future.exception(), (SourceUnavailable, SourceRejected)):
+                    print(f"数据源 {futures[future]} 获取失败: {future.exception()}")
+        return None
+
+    def hedge_stats(self) -> Dict[str, Any]:
+        """对冲请求统计: 请求数、对冲触发次数与比例、对冲触发后主/备胜出次数、成功取消的落败请求数"""
+        with self._lock:
+            stats = dict(self._hedge)
+        stats["enabled"] = SOURCE_HEDGE_ENABLED
+        stats["fire_rate"] = round(stats["fired"] / stats["requests"], 4) if stats["requests"] else 0.0
+        return stats
+
+    def latency_percentile(self, name: str, q: float) -> Optional[float]:
+        """返回数据源近期成功调用耗时的 q 分位数 (秒)，无样本时返回 None"""
+        with self._lock:
+            samples = list(self._state(name).latencies)
+        if not samples:
+            return None
+        return float(np.percentile(samples, q))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """返回所有数据源的健康状态 (用于监控)"""
+        now = time.time()
+        result = {}
+        with self._lock:
+            for name, state in self._sources.items():
+                samples = list(state.latencies)
+                result[name] = {
+                    "circuit": self._circuit(state, now),
+                    "success_rate": round(self._rate(state, now), 4),
+                    "latency_ewma": round(state.latency_ewma, 4) if state.latency_ewma is not None else None,
+                    "latency_p50": round(float(np.percentile(samples, 50)), 4) if samples else None,
+                    "latency_p99": round(float(np.percentile(samples, 99)), 4) if samples else None,
+                    "calls": state.calls,
+                    "failures": state.failures,
+                    "consecutive_failures": state.consecutive_failures,
+                    "skipped": state.skipped,
+                    "last_error": state.last_error,
+                }
+        return result
+
+    def reset(self):
+        """清空所有状态 (测试用)"""
+        with self._lock:
+            self._sources.clear()
+            self._hedge = {k: 0 for k in self._hedge}
+
+
+registry = SourceRegistry()
@@ -0,0 +1,230 @@
+import math
+import os
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .indicator_kernels import (
+    dkx_mid, window_mean_at, exact_mean_pair, DKX_WINDOW, DKX_WEIGHTS, MADKX_WINDOW, MADKX_WEIGHTS, MA_TIE_GUARD
+)
+
+# 逐根更新的指标计算 (Streaming Indicators)
+# 实时监控时每次只新增或改写最后一根 K 线，无需对整段历史重新计算指标。
+# 计算器只保留计算最新值所需的最近若干根 K 线，每根 K 线的计算量与历史长度无关。
+#   DKX: 每个窗口按与 indicator_kernels 相同的顺序重新累加 (20 + 10 次乘加)，
+#        结果与 calculate_dkx 整段计算逐位一致。
+#   双均线: 维护每个周期的滑动和 (加入新值、减去移出窗口的值)，每根 K 线 O(1)。
+#        滑动和的舍入误差随更新次数累积，每 STREAMING_MA_REANCHOR_BARS 根 K 线重新精确求和；
+#        短期与长期均线之差落在 STREAMING_MA_GUARD (相对误差) 以内时，与 calculate_ma 相同，按窗口内的值
+#        重新精确求和 (indicator_kernels.exact_mean_pair)，两条均线相等时不构成交叉。
+#        均线数值与 calculate_ma 的差在浮点误差以内，临界 K 线上两者的值完全相同，交叉判断与 check_ma_signal 逐根一致。
+STREAMING_MA_REANCHOR_BARS = int(os.environ.get('STREAMING_MA_REANCHOR_BARS', '1000'))
+STREAMING_MA_GUARD = MA_TIE_GUARD
+
+
+class _BarStream:
+    """逐根 K 线计算器的公共部分: 记录最后一根 K 线，按时间判断追加或改写"""
+
+    # 计算最后两根 K 线的指标所需的历史 K 线数 (由子类确定)
+    warmup_bars = 0
+
+    def __init__(self):
+        self._last_bar: Optional[tuple] = None  # (时间, open, high, low, close)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, *args, **kwargs):
+        """以历史 K 线创建并初始化计算器 (见 seed)，其余参数传给构造函数"""
+        return cls(*args, **kwargs).seed(df)
+
+    def seed(self, df: pd.DataFrame):
+        """
+        依次加入历史 K 线 (df 按时间升序，含 open/high/low/close)，返回自身。
+
+        只使用最后 warmup_bars + 1 根 K 线，最后两根的指标值与整段计算一致。
+        """
+        tail = df.iloc[-(self.warmup_bars + 1):]
+        columns = [tail[col].to_numpy(dtype='float64') for col in ('open', 'high', 'low', 'close')]
+        for ts, o, h, l, c in zip(tail.index, *columns):
+            self.update(ts, o, h, l, c)
+        return self
+
+    @property
+    def last_time(self) -> Optional[pd.Timestamp]:
+        return self._last_bar[0] if self._last_bar is not None else None
+
+    def matches(self, ts, open_, high, low, close) -> bool:
+        """最后一根 K 线是否与给定 K 线相同 (用于确认计算器与 K 线库一致)"""
+        return self._last_bar == (pd.Timestamp(ts), float(open_), float(high), float(low), float(close))
+
+    def _accept(self, ts, open_, high, low, close) -> Tuple[tuple, bool]:
+        """记录新的最后一根 K 线，返回 (K 线, 是否改写)；时间早于最后一根时抛出 ValueError"""
+        ts = pd.Timestamp(ts)
+        bar = (ts, float(open_), float(high), float(low), float(close))
+        if self._last_bar is not None and ts < self._last_bar[0]:
+            raise ValueError(f"K 线时间 {ts} 早于最后一根 {self._last_bar[0]}")
+        revised = self._last_bar is not None and ts == self._last_bar[0]
+        self._last_bar = bar
+        return bar, revised
+
+    def update(self, ts, open_, high, low, close) -> dict:
+        raise NotImplementedError
+
+
+def _cross(prev_fast: float, prev_slow: float, fast: float, slow: float) -> Optional[str]:
+    """快线上穿慢线为 BUY，下穿为 SELL (与 check_dkx_signal / check_ma_signal 的判断相同)"""
+    if prev_fast < prev_slow and fast > slow:
+        return 'BUY'
+    if prev_fast > prev_slow and fast < slow:
+        return 'SELL'
+    return None
+
+
+class StreamingDKX(_BarStream):
+    """
+    DKX / MADKX 增量计算器。
+
+    update() 接收一根新 K 线 (时间晚于上一根) 或改写正在形成的最后一根 K 线 (时间相同)，
+    返回该 K 线的 DKX/MADKX 以及与上一根 K 线相比的交叉信号 (规则同 check_dkx_signal)。
+    改写时重新判断交叉: 形成中的 K 线先交叉后又回到原位时，改写结果中 signal 为 None。
+    """
+
+    # 计算一根 K 线的 MADKX 所需的 K 线数 (10 个 DKX，最早的一个需要其前 19 根 MID)
+    WARMUP_BARS = DKX_WINDOW + MADKX_WINDOW - 1
+    warmup_bars = WARMUP_BARS
+
+    def __init__(self):
+        super().__init__()
+        # 多保留一个值，改写最后一根 K 线时弹出后仍有完整窗口
+        self._mid = deque(maxlen=DKX_WINDOW + 1)
+        self._dkx = deque(maxlen=MADKX_WINDOW + 1)
+        self._madkx = deque(maxlen=2)
+
+    @property
+    def dkx(self) -> float:
+        return self._dkx[-1] if self._dkx else math.nan
+
+    @property
+    def madkx(self) -> float:
+        return self._madkx[-1] if self._madkx else math.nan
+
+    def update(self, ts, open_, high, low, close) -> dict:
+        """
+        加入或改写一根 K 线，返回:
+            {'time', 'dkx', 'madkx', 'signal': 'BUY' / 'SELL' / None, 'revised': 是否改写}
+        时间早于最后一根 K 线时抛出 ValueError。
+        """
+        bar, revised = self._accept(ts, open_, high, low, close)
+        if revised:
+            self._mid.pop()
+            self._dkx.pop()
+            self._madkx.pop()
+
+        self._mid.append(dkx_mid(bar[1], bar[2], bar[3], bar[4]))
+        dkx = window_mean_at(list(self._mid)[-DKX_WINDOW:], DKX_WEIGHTS) if len(self._mid) >= DKX_WINDOW else np.nan
+        self._dkx.append(dkx)
+        madkx = window_mean_at(list(self._dkx)[-MADKX_WINDOW:], MADKX_WEIGHTS) if len(self._dkx) >= MADKX_WINDOW else np.nan
+        prev_dkx = self._dkx[-2] if len(self._dkx) >= 2 else math.nan
+        prev_madkx = self._madkx[-1] if self._madkx else math.nan
+        self._madkx.append(madkx)
+
+        signal = _cross(prev_dkx, prev_madkx, dkx, madkx)
+        return {'time': bar[0], 'dkx': float(dkx), 'madkx': float(madkx), 'signal': signal, 'revised': revised}
+
+
+class StreamingMA(_BarStream):
+    """
+    双均线增量计算器，可同时计算多组 (短周期, 长周期)，各周期共用收盘价窗口与滑动和。
+
+    update() 追加或改写一根 K 线，返回各周期的均线值与每组均线的交叉信号 (规则同 check_ma_signal)。
+    """
+
+    def __init__(self, pairs: Iterable[Tuple[int, int]], reanchor_every: int = None):
+        super().__init__()
+        self.pairs: List[Tuple[int, int]] = [(int(s), int(l)) for s, l in pairs]
+        if not self.pairs:
+            raise ValueError("至少需要一组均线周期")
+        self.periods = sorted({p for pair in self.pairs for p in pair})
+        if self.periods[0] < 1:
+            raise ValueError(f"均线周期须为正整数: {self.periods[0]}")
+        self.reanchor_every = reanchor_every or STREAMING_MA_REANCHOR_BARS
+        self.warmup_bars = self.periods[-1]
+        # 收盘价窗口多保留一个值: 追加时需要减去移出窗口的值
+        self._close = deque(maxlen=self.periods[-1] + 1)
+        self._sums: Dict[int, float] = {p: 0.0 for p in self.periods}
+        # 各周期窗口内的 NaN 个数 (窗口含 NaN 时均线为 NaN，同 calculate_ma)
+        self._nans: Dict[int, int] = {p: 0 for p in self.periods}
+        # 最近两根 K 线的 ({周期: 均线}, {均线组: 用于交叉判断的 (短期, 长期)})；
+        # 临界时各组按自己的窗口精确比较，周期被多组共用时互不影响
+        self._ma: deque = deque(maxlen=2)
+        self._since_anchor = 0
+
+    def ma(self, period: int) -> float:
+        return self._ma[-1][0][period] if self._ma else math.nan
+
+    def _window(self, period: int) -> list:
+        return list(self._close)[-period:]
+
+    def _add(self, value: float, sign: int, period: int):
+        if math.isnan(value):
+            self._nans[period] += sign
+        else:
+            self._sums[period] += sign * value
+
+    def _reanchor(self):
+        """按窗口内的值重新求和，消除滑动和累积的舍入误差"""
+        for p in self.periods:
+            window = [v for v in self._window(p) if not math.isnan(v)]
+            self._sums[p] = math.fsum(window)
+        self._since_anchor = 0
+
+    def _mean(self, period: int) -> float:
+        if len(self._close) < period or self._nans[period]:
+            return math.nan
+        return self._sums[period] / period
+
+
+    def update(self, ts, open_, high, low, close) -> dict:
+        """
+        加入或改写一根 K 线，返回:
+            {'time', 'ma': {周期: 均线}, 'signals': {(短周期, 长周期): 'BUY' / 'SELL'}, 'revised': 是否改写}
+        signals 只包含产生交叉的均线组。时间早于最后一根 K 线时抛出 ValueError。
+        """
+        bar, revised = self._accept(ts, open_, high, low, close)
+        value = bar[4]
+        if revised:
+            # 改写: 各窗口中以新收盘价替换旧值
+            old = self._close[-1]
+            self._close[-1] = value
+            for p in self.periods:
+                self._add(old, -1, p)
+                self._add(value, 1, p)
+            self._ma.pop()
+        else:
+            self._close.append(value)
+            n = len(self._close)
+            for p in self.periods:
+                self._add(value, 1, p)
+                if n > p:
+                    self._add(self._close[-p - 1], -1, p)
+        self._since_anchor += 1
+        if self._since_anchor >= self.reanchor_every:
+            self._reanchor()
+
+        ma = {p: self._mean(p) for p in self.periods}
+        prev = self._ma[-1][1] if self._ma else None
+        lines = {}
+        signals = {}
+        for short, long in self.pairs:
+            fast, slow = ma[short], ma[long]
+            # 两条均线接近时滑动和的误差可能改变大小关系，与 calculate_ma 相同按窗口内的值精确比较
+            if abs(fast - slow) <= STREAMING_MA_GUARD * max(abs(fast), abs(slow)):
+                fast, slow = exact_mean_pair(self._window(short), self._window(long))
+            lines[(short, long)] = (fast, slow)
+            if prev is not None:
+                signal = _cross(*prev[(short, long)], fast, slow)
+                if signal is not None:
+                    signals[(short, long)] = signal
+        self._ma.append((ma, lines))
+        return {'time': bar[0], 'ma': ma, 'signals': signals, 'revised': revised}
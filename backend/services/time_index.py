@@ -0,0 +1,91 @@
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# K 线时间索引 (Time Index)
+# 行情数据统一以 datetime64[ns] 索引表示，底层即 int64 纳秒数 (K 线库中以 UTC 纪元纳秒存储)。
+# 帧内索引为上海时间的挂钟时间 (无时区): 交易时段判断、周期重采样与前端展示都依赖本地时间，
+# 时区只在输入 (解析查询时间) 与输出 (格式化) 两端处理。
+# 时间范围过滤统一换算为与索引相同单位的 int64 后在 asi8 上二分查找，
+# 输出时间字符串由 numpy 向量化格式化，不再逐行调用 strftime。
+# 查询边界 (通常为前端传入的时间字符串) 的解析与时区换算结果按 (值, 索引时区, 索引单位) 缓存，
+# 全市场扫描时各标的使用相同的时间范围，只需解析一次。
+MARKET_TZ = 'Asia/Shanghai'
+
+
+def to_index_value(value, index: pd.DatetimeIndex) -> int:
+    """
+    将查询时间换算为与 index 同单位、同时区基准的 int64 值。
+
+    无时区的时间视为上海时间；带时区的时间先转换到索引所在时区 (无时区索引为上海时间)。
+    """
+    try:
+        return _bound_value(value, index.tz, index.unit)
+    except TypeError:
+        # 不可哈希的值 (不常见) 不缓存
+        return _bound_value.__wrapped__(value, index.tz, index.unit)
+
+
+@lru_cache(maxsize=4096)
+def _bound_value(value, tz, unit: str) -> int:
+    ts = pd.Timestamp(value)
+    if tz is None:
+        if ts.tzinfo is not None:
+            ts = ts.tz_convert(MARKET_TZ).tz_localize(None)
+    elif ts.tzinfo is None:
+        ts = ts.tz_localize(tz)
+    else:
+        ts = ts.tz_convert(tz)
+    # to_datetime64 为 UTC (带时区) 或挂钟时间 (无时区)，与对应索引的 asi8 基准一致
+    return int(ts.to_datetime64().astype(f'datetime64[{unit}]').astype(np.int64))
+
+
+def search(index: pd.DatetimeIndex, value, side: str = 'left') -> int:
+    """在升序索引上二分查找 value 的插入位置 (同 searchsorted)"""
+    return int(np.searchsorted(index.asi8, to_index_value(value, index), side=side))
+
+
+def window(index: pd.DatetimeIndex, start=None, end=None, warmup_bars: int = 0) -> Tuple[int, int]:
+    """
+    返回 [start, end] 对应的行范围 [lo, hi)，lo 再向前保留 warmup_bars 行。
+
+    index 须按时间升序；start/end 为 None 时对应方向不截取。
+    """
+    lo, hi = 0, len(index)
+    if start is not None:
+        lo = max(0, search(index, start, 'left') - warmup_bars)
+    if end is not None:
+        hi = search(index, end, 'right')
+    return lo, hi
+
+
+def cross_window(index: pd.DatetimeIndex, start, end) -> Optional[Tuple[int, int, int]]:
+    """
+    返回 [start, end] 对应的行范围 (first, lo, hi)，范围内没有 K 线时返回 None。
+
+    [lo, hi) 为范围内的行；first 为 lo 向前多取的一行 (判断范围内第一根 K 线是否交叉需要前一根)，
+    lo 为第 0 行时 first 同为 0。
+    """
+    lo, hi = window(index, start, end)
+    if lo >= hi:
+        return None
+    return max(0, lo - 1), lo, hi
+
+
+def format_times(index: pd.DatetimeIndex, unit: str = 's') -> np.ndarray:
+    """
+    向量化格式化时间索引，返回字符串数组 (带时区的索引先转换为上海时间)。
+
+    unit 为 's' 时格式为 "YYYY-MM-DD HH:MM:SS"，为 'm' 时为 "YYYY-MM-DD HH:MM"。
+    """
+    if index.tz is not None:
+        index = index.tz_convert(MARKET_TZ).tz_localize(None)
+    values = index.to_numpy(dtype='datetime64[ns]')
+    text = np.datetime_as_string(values, unit=unit)
+    if len(text):
+        # ISO 格式日期与时间之间的 'T' 固定在第 11 个字符，直接改写定长字符串的 UCS-4 码元
+        text.view(np.uint32).reshape(len(text), -1)[:, 10] = ord(' ')
+    return text.astype(object)
+
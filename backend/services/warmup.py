@@ -0,0 +1,134 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from .fetch_scheduler import fetch_priority
+from .indicators import get_market_data
+from .metadata import get_default_hot_symbols, get_hs300_list
+
+# 缓存预热 (Cache Warmup)
+# 服务启动后在后台预先拉取热门品种与指数成分股的行情，写入本地 K 线库，
+# 避免部署后的首批请求全部冷启动。之后按 WARMUP_INTERVAL 定期重跑，
+# 未过期的序列 (见 bar_expiry) 直接命中本地库，重跑的开销很小。
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1') != '0'
+# 预热的标的池，逗号分隔: hot (默认热门期货) / hs300 (沪深300成分股)
+WARMUP_UNIVERSES = [u.strip() for u in os.environ.get('WARMUP_UNIVERSES', 'hot,hs300').split(',') if u.strip()]
+WARMUP_FUTURES_PERIODS = [p.strip() for p in os.environ.get('WARMUP_FUTURES_PERIODS', 'daily,60').split(',') if p.strip()]
+WARMUP_STOCK_PERIODS = [p.strip() for p in os.environ.get('WARMUP_STOCK_PERIODS', 'daily').split(',') if p.strip()]
+WARMUP_CONCURRENCY = max(1, int(os.environ.get('WARMUP_CONCURRENCY', '4')))
+# 定期重跑的间隔 (秒)，0 表示只在启动时运行一次
+WARMUP_INTERVAL = float(os.environ.get('WARMUP_INTERVAL', '1800'))
+
+WarmupTask = Tuple[str, str, str]  # (symbol, market, period)
+
+_lock = threading.Lock()
+_progress = {
+    "status": "idle",  # idle / running / done
+    "ready": not WARMUP_ENABLED,
+    "runs": 0,
+    "total": 0,
+    "done": 0,
+    "failed": 0,
+    "started_at": None,
+    "finished_at": None,
+    "last_error": None,
+}
+
+
+def build_tasks() -> List[WarmupTask]:
+    """根据配置的标的池与周期生成预热任务列表 (去重，保持顺序)"""
+    tasks = []
+    for universe in WARMUP_UNIVERSES:
+        if universe == 'hot':
+            tasks += [(s, 'futures', p) for s in get_default_hot_symbols() for p in WARMUP_FUTURES_PERIODS]
+        elif universe == 'hs300':
+            with fetch_priority('backfill'):
+                members = get_hs300_list()
+            tasks += [(item['value'], 'stock', p) for item in members for p in WARMUP_STOCK_PERIODS]
+        else:
+            print(f"未知的预热标的池: {universe}")
+    return list(dict.fromkeys(tasks))
+
+
+def _update(**kwargs):
+    with _lock:
+        _progress.update(kwargs)
+
+
+def _warm_one(task: WarmupTask) -> bool:
+    symbol, market, period = task
+    try:
+        # 预热为后台任务，数据源请求排在用户请求之后
+        with fetch_priority('backfill'):
+            df = get_market_data(symbol, market=market, period=period)
+        ok = not df.empty
+    except Exception as e:
+        _update(last_error=f"{symbol} {period}: {e}")
+        ok = False
+    with _lock:
+        _progress["done"] += 1
+        if not ok:
+            _progress["failed"] += 1
+    return ok
+
+
+async def run_warmup(executor: ThreadPoolExecutor = None) -> Dict:
+    """
+    执行一轮预热。
+
+    逻辑:
+        1. 在线程池中生成任务列表 (获取沪深300成分股可能需要访问网络)。
+        2. 以 WARMUP_CONCURRENCY 的并发度逐个拉取行情，实时更新进度。
+        3. 首轮完成后标记为 ready (个别标的失败不影响 ready，失败数见进度)。
+    """
+    loop = asyncio.get_running_loop()
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=WARMUP_CONCURRENCY, thread_name_prefix="warmup")
+    try:
+        _update(status="running", started_at=time.time(), finished_at=None, total=0, done=0, failed=0)
+        tasks = await loop.run_in_executor(executor, build_tasks)
+        _update(total=len(tasks))
+        await asyncio.gather(*(loop.run_in_executor(executor, _warm_one, t) for t in tasks))
+    finally:
+        with _lock:
+            _progress["status"] = "done"
+            _progress["ready"] = True
+            _progress["runs"] += 1
+            _progress["finished_at"] = time.time()
+        if own_executor:
+            executor.shutdown(wait=False)
+    return get_progress()
+
+
+async def warmup_loop():
+    """启动时预热一次，之后按 WARMUP_INTERVAL 定期重跑，直到任务被取消"""
+    executor = ThreadPoolExecutor(max_workers=WARMUP_CONCURRENCY, thread_name_prefix="warmup")
+    try:
+        while True:
+            try:
+                progress = await run_warmup(executor)
+                print(f"缓存预热完成: {progress['done'] - progress['failed']}/{progress['total']} 成功")
+            except Exception as e:
+                print(f"缓存预热失败: {e}")
+                _update(last_error=str(e))
+            if WARMUP_INTERVAL <= 0:
+                break
+            await asyncio.sleep(WARMUP_INTERVAL)
+    finally:
+        executor.shutdown(wait=False)
+
+
+def get_progress() -> Dict:
+    """返回预热进度 (副本)"""
+    with _lock:
+        return dict(_progress)
+
+
+def is_ready() -> bool:
+    """首轮预热是否已完成 (未启用预热时始终为 True)"""
+    with _lock:
+        return _progress["ready"]
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import bar_store
+
+
+def make_bars(periods: int, start: str = '2024-01-02', freq: str = 'B', base: float = 100.0,
+              close=None, **columns) -> pd.DataFrame:
+    """
+    测试用 K 线 (统一格式，见 bar_schema)，测试模块中以 from conftest import make_bars 使用。
+
+    close 默认从 base 起每根加 1；open 同 close，high / low 为 close ± 1，volume 为 1000。
+    columns 覆盖或追加列 (如 volume=10、hold=500)。
+    """
+    index = pd.DatetimeIndex(pd.date_range(start, periods=periods, freq=freq), name='date')
+    close = base + np.arange(periods, dtype=float) if close is None else np.asarray(close, dtype=float)
+    data = {'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 1000}
+    data.update(columns)
+    return pd.DataFrame(data, index=index)
+
+
+@pytest.fixture(autouse=True, scope="session")
+def isolated_bar_store():
+    """测试期间 K 线库写入临时目录，避免污染 backend/data 下的真实数据"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        original = bar_store.STORE_PATH
+        bar_store.STORE_PATH = os.path.join(tmpdir, "bar_store.db")
+        yield
+        bar_store.STORE_PATH = original
+
+
+@pytest.fixture
+def fresh_bar_store(request, tmp_path):
+    """
+    每个测试使用独立的空 K 线库，返回测试专用的临时目录。
+
+    unittest 测试类以 @pytest.mark.usefixtures("fresh_bar_store") 使用，目录同时记为 self.store_dir
+    (在 setUp 之前设置，可用于存放其他临时文件)。
+    """
+    if request.instance is not None:
+        request.instance.store_dir = str(tmp_path)
+    with patch.object(bar_store, 'STORE_PATH', str(tmp_path / "bars.db")):
+        yield str(tmp_path)
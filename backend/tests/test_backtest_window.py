@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import patch
+import pandas as pd
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import bar_store, indicators, backtest
+from services.period_derivation import trim_to_window
+from conftest import make_bars
+
+
+@pytest.mark.usefixtures("fresh_bar_store")
+class TestWindowPushdown(unittest.TestCase):
+    def setUp(self):
+        self.full = make_bars(500, '2022-01-03', close=100 + 10 * np.sin(np.arange(500) / 7.0), volume=10.0)
+        self.calls = []
+
+        def fake_fetch(symbol, market="stock", period="daily", adjust="qfq", start_date=None, end_date=None):
+            self.calls.append((start_date, end_date))
+            df = self.full
+            if start_date:
+                df = df[df.index >= pd.Timestamp(start_date)]
+            if end_date:
+                df = df[df.index <= pd.Timestamp(end_date)]
+            return df.copy()
+
+        self.patches = [
+            patch.object(indicators, 'BAR_STORE_ENABLED', True),
+            patch.object(indicators, '_fetch_market_data', side_effect=fake_fetch),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_trim_to_window_keeps_exact_warmup(self):
+        df = trim_to_window(self.full, pd.Timestamp('2023-06-01'), pd.Timestamp('2023-06-30'), 29)
+        in_window = df[df.index >= pd.Timestamp('2023-06-01')]
+        self.assertEqual(len(df) - len(in_window), 29)
+        self.assertEqual(df.index[-1], pd.Timestamp('2023-06-30'))
+
+    def test_cold_fetch_is_pushed_down_with_warmup(self):
+        df = indicators.get_market_data('600000', 'stock', 'daily', start_date='2023-06-01',
+                                        end_date='2023-06-30', warmup_bars=29)
+        # 只向数据源请求窗口 (含预热余量) 之后的数据
+        start_date, _ = self.calls[0]
+        self.assertGreater(pd.Timestamp(start_date), self.full.index[0])
+        self.assertLess(pd.Timestamp(start_date), pd.Timestamp('2023-06-01'))
+        self.assertEqual(int((df.index < pd.Timestamp('2023-06-01')).sum()), 29)
+        self.assertEqual(df.index[-1], pd.Timestamp('2023-06-30'))
+
+    def test_earlier_window_backfills_head(self):
+        indicators.get_market_data('600000', 'stock', 'daily', start_date='2023-06-01', end_date='2023-06-30')
+        df = indicators.get_market_data('600000', 'stock', 'daily', start_date='2022-06-01',
+                                        end_date='2022-06-30', warmup_bars=10)
+        expected = trim_to_window(self.full, pd.Timestamp('2022-06-01'), pd.Timestamp('2022-06-30'), 10)
+        self.assertEqual(list(df.index), list(expected.index))
+        # 不指定起点时补齐完整历史
+        df = indicators.get_market_data('600000', 'stock', 'daily')
+        self.assertEqual(len(df), len(self.full))
+        self.assertEqual(bar_store.get_coverage(bar_store.make_key('stock', '600000', 'daily')), (True, None))
+
+    @patch('services.backtest.get_market_data')
+    @patch('services.backtest.get_min_tick')
+    @patch('services.backtest.get_margin_rate')
+    def test_backtest_first_bar_has_indicators(self, mock_margin, mock_tick, mock_data):
+        mock_margin.return_value = 0.1
+        mock_tick.return_value = 0.01
+        mock_data.side_effect = lambda *a, **kw: trim_to_window(
+            self.full, pd.Timestamp(kw['start_date']), pd.Timestamp(kw['end_date']), kw['warmup_bars'])
+
+        with patch('services.backtest.calculate_dkx', wraps=backtest.calculate_dkx) as dkx:
+            backtest.run_backtest_dkx(['600000'], 'stock', 'daily', '2023-06-01', '2023-08-31')
+            self.assertEqual(mock_data.call_args.kwargs['warmup_bars'], backtest.DKX_WARMUP_BARS)
+            computed = backtest.calculate_dkx(dkx.call_args.args[0])
+        window = computed[computed.index >= pd.Timestamp('2023-06-01')]
+        self.assertFalse(window[['dkx', 'madkx']].isna().any().any())
+
+        backtest.run_backtest_ma(['600000'], 'stock', 'daily', '2023-06-01', '2023-08-31',
+                                 short_period=5, long_period=20)
+        self.assertEqual(mock_data.call_args.kwargs['warmup_bars'], 19)
+
+
+if __name__ == '__main__':
+    unittest.main()
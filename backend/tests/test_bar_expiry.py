@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import patch
+from datetime import datetime
+import pandas as pd
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import bar_expiry
+
+RB_INFO = {
+    'day_hours': ['09:00-10:15', '10:30-11:30', '13:30-15:00'],
+    'night_hours': ['21:00-23:00'],
+}
+AU_INFO = {
+    'day_hours': ['09:00-10:15', '10:30-11:30', '13:30-15:00'],
+    'night_hours': ['21:00-02:30'],
+}
+
+
+def epoch(text):
+    """上海时间字符串转纪元秒"""
+    return pd.Timestamp(text).tz_localize(bar_expiry.MARKET_TZ).timestamp()
+
+
+class TestBarExpiry(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch.object(bar_expiry, 'get_contract_info', side_effect=lambda s: AU_INFO if s.startswith('AU') else RB_INFO)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_futures_60min_closes_follow_sessions(self):
+        # 2024-01-08 为周一，夜盘为上周五 21:00-23:00
+        closes = bar_expiry.trading_day_closes('RB0', 'futures', '60', datetime(2024, 1, 8))
+        self.assertEqual([c.strftime('%m-%d %H:%M') for c in closes],
+                         ['01-05 22:00', '01-05 23:00', '01-08 10:00', '01-08 11:15', '01-08 14:15', '01-08 15:00'])
+
+    def test_night_session_across_midnight(self):
+        closes = bar_expiry.trading_day_closes('AU0', 'futures', '120', datetime(2024, 1, 9))
+        self.assertEqual(closes, [
+            datetime(2024, 1, 8, 23, 0), datetime(2024, 1, 9, 1, 0), datetime(2024, 1, 9, 9, 30),
+            datetime(2024, 1, 9, 13, 45), datetime(2024, 1, 9, 15, 0),
+        ])
+
+    def test_no_expiry_outside_trading_hours(self):
+        # 周五收盘后获取的日线，周末期间不过期，下周一收盘后才过期
+        fetched = epoch('2024-01-05 15:10:00')
+        self.assertFalse(bar_expiry.is_expired('600000', 'stock', 'daily', fetched, now=epoch('2024-01-07 20:00:00')))
+        self.assertFalse(bar_expiry.is_expired('600000', 'stock', 'daily', fetched, now=epoch('2024-01-08 14:59:00')))
+        self.assertTrue(bar_expiry.is_expired('600000', 'stock', 'daily', fetched, now=epoch('2024-01-08 15:01:00')))
+        # 日盘收盘后至夜盘首根 K 线收盘前不过期
+        fetched = epoch('2024-01-08 15:05:00')
+        self.assertFalse(bar_expiry.is_expired('RB0', 'futures', '5', fetched, now=epoch('2024-01-08 20:00:00')))
+
+    def test_intraday_expires_at_next_close(self):
+        fetched = epoch('2024-01-08 09:31:00')
+        self.assertFalse(bar_expiry.is_expired('RB0', 'futures', '15', fetched, now=epoch('2024-01-08 09:45:10')))
+        self.assertTrue(bar_expiry.is_expired('RB0', 'futures', '15', fetched, now=epoch('2024-01-08 09:45:31')))
+
+    def test_fetch_within_grace_does_not_cover_close(self):
+        # 收盘后数秒内获取的数据可能还不含该根 K 线，grace 结束后仍需补齐一次
+        fetched = epoch('2024-01-08 15:00:05')
+        self.assertTrue(bar_expiry.is_expired('600000', 'stock', 'daily', fetched, now=epoch('2024-01-08 15:00:31')))
+        self.assertTrue(bar_expiry.is_expired('600000', 'stock', 'daily', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
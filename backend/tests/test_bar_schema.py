@@ -0,0 +1,39 @@
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.bar_schema import normalize_bars, BAR_COLUMNS
+
+
+class TestBarSchema(unittest.TestCase):
+    def test_projection_and_dtypes(self):
+        raw = pd.DataFrame({
+            'open': ['10.1', '10.2'], 'high': [10.5, 10.6], 'low': [9.9, 10.0], 'close': [10.3, 10.4],
+            'volume': [1200.0, np.nan], '股票代码': ['600000', '600000'], '涨跌幅': [0.5, 0.97],
+        }, index=pd.to_datetime(['2024-01-03', '2024-01-02']))
+
+        df = normalize_bars(raw)
+
+        self.assertEqual(list(df.columns), ['open', 'high', 'low', 'close', 'volume'])
+        self.assertTrue(all(df[c].dtype == np.float64 for c in ['open', 'high', 'low', 'close']))
+        self.assertEqual(df['volume'].dtype, np.int64)
+        self.assertEqual(df.index.dtype, 'datetime64[ns]')
+        self.assertEqual(df.index.name, 'date')
+        # 按时间升序，缺失的成交量记为 0
+        self.assertEqual(list(df['volume']), [0, 1200])
+        self.assertEqual(df['open'].iloc[1], 10.1)
+
+    def test_futures_keep_hold(self):
+        raw = pd.DataFrame({c: [1.0] for c in BAR_COLUMNS}, index=pd.to_datetime(['2024-01-02 09:30']))
+        df = normalize_bars(raw)
+        self.assertEqual(list(df.columns), BAR_COLUMNS)
+        self.assertEqual(df['hold'].dtype, np.int64)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import patch
+import pandas as pd
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import bar_store
+from services import indicators
+from conftest import make_bars
+
+
+@pytest.mark.usefixtures("fresh_bar_store")
+class TestBarStore(unittest.TestCase):
+    def test_round_trip(self):
+        key = bar_store.make_key('stock', '600000', 'daily', 'qfq')
+        df = make_bars(10, '2024-01-01', freq='D')
+        bar_store.write_bars(key, df, replace=True)
+
+        out = bar_store.read_bars(key)
+        self.assertEqual(list(out.columns), ['open', 'high', 'low', 'close', 'volume'])
+        self.assertEqual(list(out.index), list(df.index))
+        np.testing.assert_allclose(out['close'].to_numpy(), df['close'].to_numpy())
+        self.assertEqual(bar_store.get_last_timestamp(key), df.index[-1])
+
+        # 区间读取
+        part = bar_store.read_bars(key, start=pd.Timestamp('2024-01-03'), end=pd.Timestamp('2024-01-05'))
+        self.assertEqual(len(part), 3)
+
+    def test_write_overwrites_tail_only(self):
+        key = bar_store.make_key('futures', 'RB0', '60')
+        bar_store.write_bars(key, make_bars(10, '2024-01-01 09:00', freq='h'), replace=True)
+        # 新窗口与旧数据重叠 3 根，且最后一根已更新
+        tail = make_bars(5, '2024-01-01 16:00', freq='h', base=200.0)
+        bar_store.write_bars(key, tail)
+
+        out = bar_store.read_bars(key)
+        self.assertEqual(len(out), 12)
+        self.assertEqual(out['close'].iloc[0], 100.0)
+        self.assertEqual(out['close'].iloc[-1], 204.0)
+        self.assertEqual(out.index.max(), pd.Timestamp('2024-01-01 20:00'))
+
+
+@pytest.mark.usefixtures("fresh_bar_store")
+class TestGetMarketDataStore(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            patch.object(indicators, 'BAR_STORE_ENABLED', True),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    @patch('services.indicators._fetch_market_data')
+    def test_repeat_calls_hit_store(self, mock_fetch):
+        mock_fetch.return_value = make_bars(50, '2024-01-01', freq='D')
+
+        first = indicators.get_market_data('600000', 'stock', 'daily')
+        second = indicators.get_market_data('600000', 'stock', 'daily')
+
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(len(first), 50)
+        pd.testing.assert_frame_equal(first, second)
+
+    @patch('services.indicators._fetch_market_data')
+    def test_incremental_top_up(self, mock_fetch):
+        full = make_bars(50, '2024-01-01', freq='D')
+        mock_fetch.return_value = full.iloc[:40]
+        indicators.get_market_data('600000', 'stock', 'daily')
+
+        # 过期后仅拉取最后一根之后的数据
+        mock_fetch.return_value = full.iloc[39:]
+        with patch.object(indicators.bar_expiry, 'is_expired', return_value=True):
+            df = indicators.get_market_data('600000', 'stock', 'daily')
+
+        self.assertEqual(mock_fetch.call_count, 2)
+        kwargs = mock_fetch.call_args.kwargs
+        self.assertEqual(kwargs['start_date'], full.index[39].strftime('%Y-%m-%d'))
+        self.assertEqual(len(df), 50)
+        np.testing.assert_allclose(df['close'].to_numpy(), full['close'].to_numpy())
+
+    @patch('services.indicators._fetch_market_data')
+    def test_adjustment_change_rebuilds(self, mock_fetch):
+        full = make_bars(50, '2024-01-01', freq='D')
+        mock_fetch.return_value = full.iloc[:40]
+        indicators.get_market_data('600000', 'stock', 'daily')
+
+        # 除权后历史价格整体变化
+        adjusted = full.copy()
+        adjusted[['open', 'high', 'low', 'close']] *= 0.9
+        mock_fetch.side_effect = [adjusted.iloc[35:], adjusted]
+        with patch.object(indicators.bar_expiry, 'is_expired', return_value=True):
+            df = indicators.get_market_data('600000', 'stock', 'daily')
+
+        self.assertEqual(mock_fetch.call_count, 3)
+        np.testing.assert_allclose(df['close'].to_numpy(), adjusted['close'].to_numpy())
+
+
+if __name__ == '__main__':
+    unittest.main()
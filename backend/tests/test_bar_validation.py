@@ -0,0 +1,85 @@
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import bar_validation
+from services.bar_expiry import trading_day_closes
+from services.indicators import check_dkx_signal
+
+
+def make_frame(index, close, **cols):
+    close = np.asarray(close, dtype='float64')
+    data = {'open': close, 'high': close + 1.0, 'low': close - 1.0, 'close': close, 'volume': np.full(len(close), 100)}
+    data.update(cols)
+    return pd.DataFrame(data, index=pd.DatetimeIndex(index, name='date'))
+
+
+class TestBarValidation(unittest.TestCase):
+    def setUp(self):
+        bar_validation.reset_quality()
+
+    def test_duplicates_removed_keeping_last(self):
+        index = pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-03', '2024-01-04'])
+        df = make_frame(index, [10.0, 11.0, 12.0, 13.0])
+        out = bar_validation.validate_bars(df, '600000', 'stock', 'daily')
+        self.assertTrue(out.index.is_unique and out.index.is_monotonic_increasing)
+        self.assertEqual(out['close'].tolist(), [10.0, 12.0, 13.0])
+        self.assertEqual(bar_validation.get_quality('600000')['stock:600000']['duplicates'], 1)
+
+    def test_prices_repaired_or_dropped(self):
+        index = pd.bdate_range('2024-01-02', periods=4)
+        df = make_frame(index, [10.0, 11.0, 0.0, 13.0])
+        df.loc[index[0], ['high', 'low']] = [9.0, 11.0]  # high < low
+        df.loc[index[1], 'open'] = np.nan
+        df.loc[index[3], 'volume'] = -5
+        df.attrs['data_age'] = 3.0
+
+        out = bar_validation.validate_bars(df, '600000', 'stock', 'daily')
+        self.assertEqual(len(out), 3)  # 收盘价为 0 的 K 线被丢弃
+        self.assertEqual((out['high'].iloc[0], out['low'].iloc[0]), (11.0, 9.0))
+        self.assertEqual(out['open'].iloc[1], 11.0)
+        self.assertEqual(out['volume'].iloc[-1], 0)
+        self.assertTrue((out['high'] >= out[['open', 'close', 'low']].max(axis=1)).all())
+        self.assertEqual(out.attrs['data_age'], 3.0)
+
+        quality = bar_validation.get_quality(market='stock')['stock:600000']
+        self.assertEqual((quality['repaired'], quality['dropped']), (2, 1))
+        self.assertEqual(quality['last_issue']['period'], 'daily')
+
+    def test_out_of_session_dropped_and_gaps_counted(self):
+        closes = trading_day_closes('600000', 'stock', '30', pd.Timestamp('2024-01-09').to_pydatetime())
+        index = list(closes)
+        del index[3]  # 11:30 缺失
+        index.append(pd.Timestamp('2024-01-09 12:15'))  # 午休时段
+        df = make_frame(sorted(index), np.arange(len(index)) + 10.0)
+
+        out = bar_validation.validate_bars(df, '600000', 'stock', '30')
+        self.assertNotIn(pd.Timestamp('2024-01-09 12:15'), out.index)
+        self.assertEqual(len(out), len(closes) - 1)
+        quality = bar_validation.get_quality('600000', 'stock')['stock:600000']
+        self.assertEqual((quality['out_of_session'], quality['gaps']), (1, 1))
+        self.assertEqual(quality['last_issue']['gap_samples'], ['2024-01-09 11:30:00'])
+
+    def test_night_session_across_midnight(self):
+        index = pd.to_datetime(['2024-01-08 23:59', '2024-01-09 00:30', '2024-01-09 03:00', '2024-01-09 09:30'])
+        mask = bar_validation._in_session_mask(pd.DatetimeIndex(index), [(540, 690), (1260, 1590)])
+        self.assertEqual(mask.tolist(), [True, True, False, True])
+
+    def test_signal_offsets_use_positions(self):
+        index = pd.bdate_range('2024-01-02', periods=6)
+        df = make_frame(index, np.full(6, 10.0))
+        df['dkx'] = [1.0, 1.0, 3.0, 3.0, 1.0, 1.0]
+        df['madkx'] = 2.0
+        signals = check_dkx_signal(df, lookback=0)
+        self.assertEqual([(s['signal'], s['offset']) for s in signals], [('BUY', 3), ('SELL', 1)])
+        ranged = check_dkx_signal(df, start_time='2024-01-04', end_time='2024-01-05')
+        self.assertEqual([s['offset'] for s in ranged], [3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.indicators import calculate_dkx, calculate_ma, check_dkx_signal, check_ma_signal
+
+
+def legacy_cross_signals(df, fast, slow, lookback=5, start_time=None, end_time=None):
+    """原实现: 逐行取 Series 比较 (用于校验向量化结果完全一致)"""
+    if start_time and end_time:
+        mask = (df.index >= pd.Timestamp(start_time)) & (df.index <= pd.Timestamp(end_time))
+        rows = np.flatnonzero(mask)
+        if len(rows) == 0:
+            return []
+        first, stop = max(0, int(rows[0]) - 1), int(rows[-1]) + 1
+    else:
+        first = 0 if lookback == 0 else max(0, len(df) - abs(lookback) - 1)
+        stop = len(df)
+    subset = df.iloc[first:stop]
+    signals = []
+    for i in range(1, len(subset)):
+        prev = subset.iloc[i - 1]
+        curr = subset.iloc[i]
+        offset = len(df) - 1 - (first + i)
+        if prev[fast] < prev[slow] and curr[fast] > curr[slow]:
+            signal = "BUY"
+        elif prev[fast] > prev[slow] and curr[fast] < curr[slow]:
+            signal = "SELL"
+        else:
+            continue
+        signals.append({"signal": signal, "date": curr.name.strftime("%Y-%m-%d %H:%M:%S"), "price": curr['close'],
+                        fast: curr[fast], slow: curr[slow], "offset": offset})
+    return signals
+
+
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 + np.cumsum(rng.normal(0, 0.5, n)), 1)
+    index = pd.date_range('2024-01-02 09:31', periods=n, freq='min', name='date')
+    return pd.DataFrame({'open': close, 'high': close + 0.5, 'low': close - 0.5, 'close': close,
+                         'volume': rng.integers(1, 1000, n)}, index=index)
+
+
+class TestCrossSignals(unittest.TestCase):
+    def setUp(self):
+        self.df = calculate_ma(calculate_dkx(make_bars(3000)), 5, 10)
+        # 缺失值与相等值不产生交叉
+        self.df.iloc[1500, self.df.columns.get_loc('ma_short')] = np.nan
+        self.df.iloc[2000, self.df.columns.get_loc('ma_short')] = self.df['ma_long'].iloc[2000]
+
+    def assert_same(self, actual, expected):
+        self.assertEqual(actual, expected)
+        for a, e in zip(actual, expected):
+            self.assertEqual([type(v) for v in a.values()], [type(v) for v in e.values()])
+
+    def test_identical_to_row_by_row_scan(self):
+        for lookback in (0, 5, 300):
+            self.assert_same(check_dkx_signal(self.df, lookback=lookback),
+                             legacy_cross_signals(self.df, 'dkx', 'madkx', lookback))
+            self.assert_same(check_ma_signal(self.df, lookback=lookback),
+                             legacy_cross_signals(self.df, 'ma_short', 'ma_long', lookback))
+        self.assertGreater(len(check_ma_signal(self.df, lookback=0)), 100)
+
+    def test_identical_within_time_range(self):
+        start, end = '2024-01-03 10:00:00', '2024-01-03 18:30:00'
+        self.assert_same(check_dkx_signal(self.df, start_time=start, end_time=end),
+                         legacy_cross_signals(self.df, 'dkx', 'madkx', start_time=start, end_time=end))
+        self.assert_same(check_ma_signal(self.df, start_time=start, end_time=end),
+                         legacy_cross_signals(self.df, 'ma_short', 'ma_long', start_time=start, end_time=end))
+        self.assertEqual(check_dkx_signal(self.df, start_time='2030-01-01', end_time='2030-01-02'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
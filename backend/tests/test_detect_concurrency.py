@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import patch
+import time
+import threading
+import zipfile
+import io
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+# Add backend path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from main import app
+
+
+class TestDetectConcurrency(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        dates = pd.date_range(start='2024-01-01', periods=100, freq='D')
+        self.df = pd.DataFrame({
+            'open': 100.0, 'high': 105.0, 'low': 95.0, 'close': 100.0, 'volume': 1000
+        }, index=pd.DatetimeIndex(dates, name='date'))
+        self.df['dkx'] = np.where(np.arange(100) < 99, 99.0, 101.0)
+        self.df['madkx'] = 100.0
+
+    @patch('main.save_signal')
+    @patch('main.get_symbol_name')
+    @patch('main.calculate_dkx')
+    @patch('main.get_market_data')
+    def test_results_keep_request_order(self, mock_get_data, mock_calc, mock_name, mock_save):
+        symbols = [f"{i:06d}" for i in range(6)]
+
+        def fake_get(symbol, market, period):
+            # 越靠前的标的越慢返回，验证结果仍按请求顺序排列
+            time.sleep(0.05 * (len(symbols) - symbols.index(symbol)))
+            return self.df.copy()
+
+        mock_get_data.side_effect = fake_get
+        mock_calc.side_effect = lambda x: x
+        mock_name.side_effect = lambda symbol, market: symbol
+
+        t0 = time.perf_counter()
+        response = self.client.post("/api/detect/dkx", json={
+            "symbols": symbols, "market": "stock", "period": "daily", "lookback": 5
+        })
+        elapsed = time.perf_counter() - t0
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['symbol'] for r in response.json()['results']], symbols)
+        # 串行需要 0.05 * (6+5+...+1) = 1.05s，并发执行应明显更快
+        if main.DETECT_CONCURRENCY > 1:
+            self.assertLess(elapsed, 0.9)
+
+    @patch('main.get_symbol_name')
+    @patch('main.calculate_dkx')
+    @patch('main.get_market_data')
+    def test_export_runs_on_worker_pool(self, mock_get_data, mock_calc, mock_name):
+        symbols = [f"{i:06d}" for i in range(6)]
+
+        threads = []
+
+        def fake_get(symbol, market, period):
+            threads.append(threading.current_thread().name)
+            return self.df.copy()
+
+        mock_get_data.side_effect = fake_get
+        mock_calc.side_effect = lambda x: x
+        mock_name.side_effect = lambda symbol, market: symbol
+
+        response = self.client.post("/api/export/dkx", json={
+            "symbols": symbols, "market": "stock", "period": "daily", "lookback": 5
+        })
+
+        self.assertEqual(response.status_code, 200)
+        names = zipfile.ZipFile(io.BytesIO(response.content)).namelist()
+        self.assertEqual(sorted(n for n in names if n.endswith('.png')),
+                         sorted(f"charts/{s}_2024-04-09_00-00-00.png" for s in symbols))
+        # 阻塞的数据获取与绘图在检测线程池中执行，不占用事件循环
+        self.assertTrue(all(name.startswith('detect') for name in threads))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
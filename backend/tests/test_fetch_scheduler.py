@@ -0,0 +1,132 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import threading
+import time
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import providers, fetch_scheduler
+from services.fetch_scheduler import FetchScheduler, PriorityBoost, fetch_priority, current_priority
+
+
+class FakeProvider:
+    name = 'fake'
+
+    def stock_zh_a_hist(self, **kwargs):
+        return 'hist'
+
+
+class TestFetchScheduler(unittest.TestCase):
+    def test_token_bucket_limits_rate(self):
+        scheduler = FetchScheduler(rates={'em': 20}, burst=1, enabled=True)
+        start = time.monotonic()
+        for _ in range(5):
+            scheduler.acquire('em')
+        # 首个请求使用初始令牌，其余 4 个各等待约 1/20 秒
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        stats = scheduler.stats()['sources']['em']['priorities']['interactive']
+        self.assertEqual(stats['acquired'], 5)
+        self.assertGreater(stats['max_wait'], 0.0)
+
+    def test_sources_and_zero_rate_are_independent(self):
+        scheduler = FetchScheduler(rates={'em': 1, 'sina': 0}, burst=1, enabled=True)
+        scheduler.acquire('em')
+        start = time.monotonic()
+        for _ in range(10):
+            scheduler.acquire('sina')
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_interactive_served_before_backfill(self):
+        scheduler = FetchScheduler(rates={'em': 10}, burst=1, enabled=True)
+        scheduler.acquire('em')
+        order = []
+
+        def worker(priority):
+            with fetch_priority(priority):
+                scheduler.acquire('em')
+            order.append(priority)
+
+        backfill = threading.Thread(target=worker, args=('backfill',))
+        backfill.start()
+        time.sleep(0.02)
+        self.assertEqual(scheduler.stats()['sources']['em']['queue_depth'], 1)
+        interactive = threading.Thread(target=worker, args=('interactive',))
+        interactive.start()
+        backfill.join(2)
+        interactive.join(2)
+
+        self.assertEqual(order, ['interactive', 'backfill'])
+        stats = scheduler.stats()['sources']['em']
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['priorities']['backfill']['acquired'], 1)
+
+    def test_boosted_request_jumps_queue(self):
+        scheduler = FetchScheduler(rates={'em': 10}, burst=1, enabled=True)
+        scheduler.acquire('em')
+        order = []
+        with fetch_priority('backfill'):
+            boost = PriorityBoost()
+
+        def backfill():
+            with boost.scope():
+                scheduler.acquire('em')
+            order.append('backfill')
+
+        def scan():
+            with fetch_priority('scan'):
+                scheduler.acquire('em')
+            order.append('scan')
+
+        threads = [threading.Thread(target=backfill), threading.Thread(target=scan)]
+        with patch.object(fetch_scheduler, 'scheduler', scheduler):
+            for t in threads:
+                t.start()
+                time.sleep(0.02)
+            # 用户请求合并到排队中的回填获取上，回填随即排到定时扫描之前
+            boost.join()
+            for t in threads:
+                t.join(2)
+
+        self.assertEqual(order, ['backfill', 'scan'])
+        stats = scheduler.stats()['sources']['em']['priorities']
+        self.assertEqual((stats['interactive']['acquired'], stats['backfill']['acquired']), (2, 0))
+        self.assertEqual(stats['backfill']['waiting'], 0)
+
+    def test_priority_context(self):
+        self.assertEqual(current_priority(), 'interactive')
+        with fetch_priority('scan'):
+            self.assertEqual(current_priority(), 'scan')
+        self.assertEqual(current_priority(), 'interactive')
+        with self.assertRaises(ValueError):
+            with fetch_priority('urgent'):
+                pass
+
+    def test_disabled_does_not_wait(self):
+        scheduler = FetchScheduler(rates={'em': 1}, burst=1, enabled=False)
+        start = time.monotonic()
+        for _ in range(5):
+            scheduler.acquire('em')
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_provider_calls_go_through_scheduler(self):
+        scheduler = FetchScheduler(rates={'em': 100}, burst=5, enabled=True)
+        previous = providers.set_provider(FakeProvider())
+        try:
+            with patch.object(providers, 'fetch_scheduler', scheduler):
+                with fetch_priority('backfill'):
+                    self.assertEqual(providers.provider.stock_zh_a_hist(symbol='600000'), 'hist')
+                self.assertEqual(scheduler.stats()['sources']['em']['priorities']['backfill']['acquired'], 1)
+
+                # 离线回放不访问网络，不经过调度
+                providers.set_provider(providers.ReplayProvider(synthetic=True))
+                providers.provider.stock_zh_a_hist(symbol='600000', period='daily', adjust='qfq')
+                self.assertEqual(scheduler.stats()['sources']['em']['priorities']['interactive']['acquired'], 0)
+        finally:
+            providers.set_provider(previous)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import patch
+import pandas as pd
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import bar_store, indicators
+from services.frame_cache import FrameCache
+from services.bar_schema import frame_nbytes
+from conftest import make_bars
+
+
+class TestFrameCache(unittest.TestCase):
+    def setUp(self):
+        self.frame = make_bars(50)
+        self.size = frame_nbytes(self.frame)
+
+    def test_budget_and_stats(self):
+        cache = FrameCache("t", self.size * 3)
+        for i in range(3):
+            self.assertTrue(cache.put(i, self.frame))
+        self.assertIs(cache.get(0), self.frame)
+        self.assertIsNone(cache.get('missing'))
+        self.assertFalse(cache.put('huge', self.frame, nbytes=self.size * 4))
+
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["bytes"]), (3, self.size * 3))
+        self.assertEqual((stats["hits"], stats["misses"], stats["rejections"]), (1, 1, 1))
+
+    def test_one_off_scan_does_not_evict_hot_entries(self):
+        cache = FrameCache("t", self.size * 4)
+        hot = ['600000', '600519']
+        for key in hot:
+            for _ in range(5):
+                if cache.get(key) is None:
+                    cache.put(key, self.frame)
+        # 全市场扫描: 每个标的只访问一次
+        for i in range(100):
+            key = f"scan{i}"
+            if cache.get(key) is None:
+                cache.put(key, self.frame)
+        for key in hot:
+            self.assertIsNotNone(cache.get(key))
+        stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], self.size * 4)
+        self.assertGreater(stats["rejections"], 0)
+
+        # 访问频率更高的新条目可以淘汰冷条目
+        for _ in range(5):
+            cache.get('new_hot')
+        self.assertTrue(cache.put('new_hot', self.frame))
+        self.assertGreater(cache.stats()["evictions"], 0)
+        for key in hot:
+            self.assertIsNotNone(cache.get(key))
+
+    def test_version_mismatch_is_a_miss(self):
+        cache = FrameCache("t", self.size * 2)
+        cache.put('k', self.frame, version=1)
+        self.assertIsNotNone(cache.get('k', 1))
+        self.assertIsNone(cache.get('k', 2))
+        self.assertEqual(cache.stats()["stale"], 1)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+@pytest.mark.usefixtures("fresh_bar_store")
+class TestMarketDataFrameCache(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            patch.object(indicators, 'BAR_STORE_ENABLED', True),
+            patch.object(indicators, 'bar_frames', FrameCache("bars", 1 << 24)),
+            patch.object(indicators, 'indicator_frames', FrameCache("indicators", 1 << 24)),
+            patch.object(indicators.bar_expiry, 'is_expired', return_value=False),
+        ]
+        for p in self.patches:
+            p.start()
+        self.key = bar_store.make_key('stock', '600000', 'daily')
+        bar_store.write_bars(self.key, make_bars(30), replace=True)
+        bar_store.set_coverage(self.key, None)
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_reads_cached_until_series_written(self):
+        first = indicators.get_market_data('600000', 'stock', 'daily')
+        first['close'] = 0.0  # 调用方修改的是副本
+        second = indicators.get_market_data('600000', 'stock', 'daily')
+        self.assertEqual(indicators.bar_frames.stats()["hits"], 1)
+        self.assertEqual(second['close'].iloc[0], 100.0)
+
+        bar_store.write_bars(self.key, make_bars(31, base=200.0))
+        third = indicators.get_market_data('600000', 'stock', 'daily')
+        self.assertEqual(len(third), 31)
+        self.assertEqual(indicators.bar_frames.stats()["stale"], 1)
+
+    def test_indicator_results_cached_by_series_version(self):
+        expected = indicators.calculate_dkx(indicators.get_market_data('600000', 'stock', 'daily'))
+        again = indicators.calculate_dkx(indicators.get_market_data('600000', 'stock', 'daily'))
+        self.assertEqual(indicators.indicator_frames.stats()["hits"], 1)
+        pd.testing.assert_frame_equal(expected, again)
+
+        # 切片 (行数或首末时间不同) 与库中序列更新后各自重新计算
+        df = indicators.get_market_data('600000', 'stock', 'daily')
+        np.testing.assert_array_equal(indicators.calculate_dkx(df.iloc[5:].copy())['dkx'].to_numpy(),
+                                      indicators.calculate_dkx(make_bars(30).iloc[5:])['dkx'].to_numpy())
+        bar_store.write_bars(self.key, make_bars(30, base=200.0))
+        changed = indicators.calculate_dkx(indicators.get_market_data('600000', 'stock', 'daily'))
+        self.assertEqual(indicators.indicator_frames.stats()["hits"], 1)
+        self.assertGreater(changed['dkx'].iloc[-1], 150.0)
+
+        ma = indicators.calculate_ma(indicators.get_market_data('600000', 'stock', 'daily'), 5, 10)
+        ma_again = indicators.calculate_ma(indicators.get_market_data('600000', 'stock', 'daily'), 5, 10)
+        pd.testing.assert_frame_equal(ma, ma_again)
+        indicators.calculate_ma(indicators.get_market_data('600000', 'stock', 'daily'), 5, 20)
+        self.assertEqual(indicators.indicator_frames.stats()["hits"], 2)
+
+        # 未经 K 线库的数据不缓存
+        indicators.calculate_dkx(make_bars(30))
+        indicators.calculate_dkx(make_bars(30))
+        self.assertEqual(indicators.indicator_frames.stats()["hits"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.indicator_kernels import weighted_window_mean, DKX_WEIGHTS, MADKX_WEIGHTS
+from services.indicators import calculate_dkx
+
+
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    index = pd.date_range('2024-01-02 09:31', periods=n, freq='min', name='date')
+    return pd.DataFrame({'open': close + rng.normal(0, 0.3, n), 'high': close + 1, 'low': close - 1,
+                         'close': close, 'volume': 100.0}, index=index)
+
+
+def legacy_dkx(df):
+    """原实现: rolling().apply 逐窗口加权求和"""
+    weights = np.arange(1, 21)
+    mid = (3 * df['close'] + df['low'] + df['open'] + df['high']) / 6
+    dkx = mid.rolling(window=20).apply(lambda x: np.dot(x, weights) / weights.sum(), raw=True)
+    return dkx, dkx.rolling(window=10).mean()
+
+
+class TestIndicatorKernels(unittest.TestCase):
+    def test_matches_rolling_implementation(self):
+        df = make_bars(2000)
+        df.iloc[500, df.columns.get_loc('close')] = np.nan
+        dkx, madkx = legacy_dkx(df)
+        out = calculate_dkx(df.copy())
+        np.testing.assert_allclose(out['dkx'].to_numpy(), dkx.to_numpy(), rtol=1e-12, atol=0)
+        np.testing.assert_allclose(out['madkx'].to_numpy(), madkx.to_numpy(), rtol=1e-12, atol=0)
+        # NaN 出现的位置完全一致 (预热期与含缺失值的窗口)
+        self.assertTrue(np.isnan(out['dkx'].to_numpy()[500:519]).all())
+        self.assertTrue(np.isnan(out['madkx'].to_numpy()[:28]).all())
+        self.assertFalse(np.isnan(out['madkx'].to_numpy()[28]))
+
+    def test_result_independent_of_series_start(self):
+        values = make_bars(300)['close'].to_numpy()
+        full = weighted_window_mean(values, DKX_WEIGHTS)
+        tail = weighted_window_mean(values[100:], DKX_WEIGHTS)
+        np.testing.assert_array_equal(full[119:], tail[19:])
+
+    def test_short_input(self):
+        self.assertTrue(np.isnan(weighted_window_mean(np.arange(5.0), MADKX_WEIGHTS)).all())
+        self.assertEqual(weighted_window_mean(np.ones(10), MADKX_WEIGHTS)[-1], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
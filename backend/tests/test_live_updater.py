@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import patch
+from datetime import datetime
+import pandas as pd
+import pytest
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import bar_store, live_updater
+
+
+def make_spot(rows):
+    return pd.DataFrame([
+        {'代码': code, '名称': code, '最新价': last, '今开': open_, '最高': high, '最低': low, '成交量': volume}
+        for code, last, open_, high, low, volume in rows
+    ])
+
+
+@pytest.mark.usefixtures("fresh_bar_store")
+class TestLiveUpdater(unittest.TestCase):
+    def setUp(self):
+        live_updater._last_volume.clear()
+
+        index = pd.DatetimeIndex(pd.bdate_range('2024-01-02', periods=5), name='date')
+        daily = pd.DataFrame({'open': 10.0, 'high': 11.0, 'low': 9.0, 'close': 10.5, 'volume': 1000}, index=index)
+        self.daily_key = bar_store.make_key('stock', '600000', 'daily')
+        bar_store.write_bars(self.daily_key, daily)
+
+        minute = pd.DataFrame({'open': 10.0, 'high': 10.0, 'low': 10.0, 'close': 10.0, 'volume': 5},
+                              index=pd.DatetimeIndex([pd.Timestamp('2024-01-09 09:35')], name='date'))
+        self.minute_key = bar_store.make_key('stock', '600000', '5')
+        bar_store.write_bars(self.minute_key, minute)
+        # 未缓存的标的不应被写入
+        self.other_key = bar_store.make_key('stock', '000001', 'daily')
+
+    def test_daily_and_minute_bars_updated_in_place(self):
+        now = datetime(2024, 1, 9, 9, 36, 10)
+        spot = make_spot([('600000', 10.8, 10.2, 10.9, 10.1, 20000), ('000001', 9.0, 9.0, 9.0, 9.0, 1)])
+        self.assertEqual(live_updater.apply_snapshot(spot, now), 2)
+
+        daily = bar_store.read_bars(self.daily_key)
+        self.assertEqual(len(daily), 6)
+        today = daily.iloc[-1]
+        self.assertEqual(daily.index[-1], pd.Timestamp('2024-01-09'))
+        self.assertEqual((today['open'], today['high'], today['low'], today['close'], today['volume']),
+                         (10.2, 10.9, 10.1, 10.8, 20000))
+        self.assertIsNone(bar_store.get_last_timestamp(self.other_key))
+
+        # 09:36 属于 09:40 收盘的 5 分钟 K 线: 新建一根
+        minute = bar_store.read_bars(self.minute_key)
+        self.assertEqual(minute.index[-1], pd.Timestamp('2024-01-09 09:40'))
+        self.assertEqual(minute['close'].iloc[-1], 10.8)
+
+        # 同一根 K 线内的下一次快照: 更新高低收，成交量累加增量
+        spot = make_spot([('600000', 11.0, 10.2, 11.0, 10.1, 20300)])
+        live_updater.apply_snapshot(spot, datetime(2024, 1, 9, 9, 38))
+        minute = bar_store.read_bars(self.minute_key)
+        last = minute.iloc[-1]
+        self.assertEqual(len(minute), 2)
+        self.assertEqual((last['open'], last['high'], last['low'], last['close'], last['volume']),
+                         (10.8, 11.0, 10.8, 11.0, 300))
+
+    def test_stale_snapshot_on_holiday_not_written(self):
+        # 工作日休市: 快照仍为上一交易日 (01-08) 收盘后的数据
+        spot = make_spot([('600000', 10.5, 10.0, 11.0, 9.0, 1000)])
+        self.assertEqual(live_updater.apply_snapshot(spot, datetime(2024, 1, 9, 10, 0)), 0)
+        self.assertEqual(bar_store.get_last_timestamp(self.daily_key), pd.Timestamp('2024-01-08'))
+        self.assertEqual(bar_store.get_last_timestamp(self.minute_key), pd.Timestamp('2024-01-09 09:35'))
+
+        # 前一交易日的最后一次快照同样作为参照 (库中没有该标的的日线时)
+        bar_store.delete_series(self.daily_key)
+        live_updater._last_volume['600000'] = (pd.Timestamp('2024-01-08'), 1000)
+        self.assertEqual(live_updater.apply_snapshot(spot, datetime(2024, 1, 9, 10, 0)), 0)
+        self.assertEqual(bar_store.get_last_timestamp(self.minute_key), pd.Timestamp('2024-01-09 09:35'))
+
+    def test_update_skipped_outside_session(self):
+        with patch.object(live_updater.provider, 'stock_zh_a_spot_em') as spot:
+            self.assertEqual(live_updater.update_once(datetime(2024, 1, 9, 12, 0)), 0)
+            self.assertEqual(live_updater.update_once(datetime(2024, 1, 13, 10, 0)), 0)
+            spot.assert_not_called()
+
+    def test_update_skipped_without_stored_stock_series(self):
+        with patch.object(live_updater.provider, 'stock_zh_a_spot_em',
+                          return_value=make_spot([('600000', 10.8, 10.2, 10.9, 10.1, 20000)])) as spot:
+            self.assertEqual(live_updater.update_once(datetime(2024, 1, 9, 10, 0)), 2)
+            spot.assert_called_once()
+            # 库中只有期货序列时不拉取全市场快照
+            with patch.object(bar_store, 'STORE_PATH', os.path.join(self.store_dir, 'futures.db')):
+                bar_store.write_bars(bar_store.make_key('futures', 'RB0', 'daily'), bar_store.read_bars(self.daily_key))
+                self.assertEqual(live_updater.update_once(datetime(2024, 1, 9, 10, 0)), 0)
+            spot.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
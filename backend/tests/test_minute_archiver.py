@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import patch
+import pandas as pd
+import pytest
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import indicators, minute_archiver
+from conftest import make_bars
+
+
+def make_minute_window(start, n):
+    return make_bars(n, start, freq='min', base=3500.0, volume=10, hold=1000)
+
+
+@pytest.mark.usefixtures("fresh_bar_store")
+class TestMinuteArchiver(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            patch.object(indicators, 'BAR_STORE_ENABLED', True),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_windows_accumulate_beyond_provider_history(self):
+        # 数据源每次只返回最近 100 根，窗口逐次后移 60 根
+        windows = [make_minute_window('2024-01-02 09:01', 100),
+                   make_minute_window('2024-01-02 10:01', 100),
+                   make_minute_window('2024-01-02 11:01', 100)]
+        with patch.object(minute_archiver, 'fetch_from_source', side_effect=windows):
+            for _ in windows:
+                status = minute_archiver.archive_once(['RB0'], ['1'])
+
+        info = status['series']['RB0/1']
+        self.assertEqual(info['bars'], 220)
+        self.assertEqual(info['appended'], 60)
+        self.assertFalse(info['gap'])
+        self.assertEqual(info['first'], '2024-01-02 09:01:00')
+
+        # 回测读取时数据源只有最近窗口，但本地库提供完整历史
+        with patch.object(indicators, '_fetch_market_data', return_value=windows[-1]), \
+             patch.object(indicators.bar_expiry, 'is_expired', return_value=True):
+            df = indicators.get_market_data('RB0', 'futures', '1', start_date='2024-01-02 09:00', end_date='2024-01-02 14:00')
+        self.assertEqual(len(df), 220)
+        self.assertEqual(df.index[0], pd.Timestamp('2024-01-02 09:01'))
+
+    def test_gap_is_reported(self):
+        windows = [make_minute_window('2024-01-02 09:01', 10), make_minute_window('2024-01-03 09:01', 10)]
+        with patch.object(minute_archiver, 'fetch_from_source', side_effect=windows):
+            minute_archiver.archive_once(['RB0'], ['1'])
+            status = minute_archiver.archive_once(['RB0'], ['1'])
+        self.assertTrue(status['series']['RB0/1']['gap'])
+        self.assertEqual(status['series']['RB0/1']['bars'], 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
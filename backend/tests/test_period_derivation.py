@@ -0,0 +1,137 @@
+import unittest
+from unittest.mock import patch
+import pandas as pd
+import numpy as np
+import pytest
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import indicators, period_derivation
+from services.resample_utils import resample_data
+from conftest import make_bars
+
+
+def make_minute_bars(days=40, freq_min=30):
+    """生成纯日盘期货的分钟数据: 09:00-10:15, 10:30-11:30, 13:30-15:00"""
+    stamps = []
+    for day in pd.bdate_range('2024-01-02', periods=days):
+        for start, end in [('09:00', '10:15'), ('10:30', '11:30'), ('13:30', '15:00')]:
+            t = day + pd.Timedelta(start + ':00') + pd.Timedelta(minutes=freq_min)
+            stop = day + pd.Timedelta(end + ':00')
+            while t <= stop:
+                stamps.append(t)
+                t += pd.Timedelta(minutes=freq_min)
+    index = pd.DatetimeIndex(stamps, name='date')
+    close = 100 + np.arange(len(index), dtype=float) * 0.1
+    return pd.DataFrame({
+        'open': close, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 10.0, 'hold': 500.0
+    }, index=index)
+
+
+def stock_minute_stamps(days, freq_min):
+    """股票原生分钟线的时间戳: 09:30-11:30、13:00-15:00，以 K 线结束时间标记"""
+    stamps = []
+    for day in pd.bdate_range('2024-01-02', periods=days):
+        for start, end in [('09:30', '11:30'), ('13:00', '15:00')]:
+            stamps.extend(pd.date_range(day + pd.Timedelta(start + ':00') + pd.Timedelta(minutes=freq_min),
+                                        day + pd.Timedelta(end + ':00'), freq=f'{freq_min}min'))
+    return pd.DatetimeIndex(stamps, name='date')
+
+
+def make_stock_minute_bars(days=10):
+    """股票 1 分钟线: 每日以 09:30 集合竞价 K 线开始"""
+    auction = pd.DatetimeIndex([d + pd.Timedelta('09:30:00') for d in pd.bdate_range('2024-01-02', periods=days)])
+    index = stock_minute_stamps(days, 1).append(auction).sort_values()
+    index.name = 'date'
+    close = 10 + np.arange(len(index), dtype=float) * 0.01
+    return pd.DataFrame({'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+                         'volume': np.arange(len(index)) + 1}, index=index)
+
+
+@pytest.mark.usefixtures("fresh_bar_store")
+class TestPeriodDerivation(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            patch.object(indicators, 'BAR_STORE_ENABLED', True),
+            patch.object(period_derivation, 'DERIVE_MIN_BARS', 50),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_fetch_base_without_cache(self):
+        self.assertEqual(period_derivation.select_base_period('RB0', 'futures', '120'), '60')
+        self.assertEqual(period_derivation.select_base_period('RB0', 'futures', '180'), '30')
+        self.assertEqual(period_derivation.select_base_period('RB0', 'futures', 'weekly'), 'daily')
+        self.assertEqual(period_derivation.select_base_period('RB0', 'futures', '60'), '60')
+        # 股票 240 分钟按日线获取
+        self.assertEqual(period_derivation.select_base_period('600000', 'stock', '240'), '240')
+
+    @patch('services.indicators._fetch_market_data')
+    def test_periods_derived_from_one_cached_base(self, mock_fetch):
+        base = make_minute_bars()
+        mock_fetch.return_value = base
+
+        df_30 = indicators.get_market_data('RB0', 'futures', '30')
+        self.assertEqual(mock_fetch.call_count, 1)
+
+        # 60/90/120/180/240 均由已缓存的 30 分钟数据本地派生，不再访问数据源
+        for period in ['60', '90', '120', '180', '240']:
+            derived = indicators.get_market_data('RB0', 'futures', period)
+            expected = resample_data(df_30, period)
+            self.assertEqual(list(derived.index), list(expected.index), period)
+            np.testing.assert_allclose(derived['close'].to_numpy(), expected['close'].to_numpy())
+            self.assertNotIn('cum_mins', derived.columns)
+        self.assertEqual(mock_fetch.call_count, 1)
+
+    @patch('services.indicators._fetch_market_data')
+    def test_stock_minutes_derived_from_1m_match_native_labels(self, mock_fetch):
+        base = make_stock_minute_bars()
+        mock_fetch.return_value = base
+        indicators.get_market_data('600000', 'stock', '1')
+
+        for period in ['5', '30']:
+            derived = indicators.get_market_data('600000', 'stock', period)
+            self.assertEqual(list(derived.index), list(stock_minute_stamps(10, int(period))), period)
+        self.assertEqual(mock_fetch.call_count, 1)
+
+        # 集合竞价 K 线计入当日第一根 5 分钟 K 线
+        derived = indicators.get_market_data('600000', 'stock', '5')
+        first = base.loc['2024-01-02 09:30':'2024-01-02 09:35']
+        self.assertEqual(derived.index[0], pd.Timestamp('2024-01-02 09:35'))
+        self.assertEqual(derived['open'].iloc[0], first['open'].iloc[0])
+        self.assertEqual(derived['volume'].iloc[0], first['volume'].sum())
+
+    @patch('services.indicators._fetch_market_data')
+    def test_weekly_monthly_from_daily(self, mock_fetch):
+        mock_fetch.return_value = make_bars(400, '2022-01-03', volume=10.0)
+
+        indicators.get_market_data('RB0', 'futures', 'daily')
+        weekly = indicators.get_market_data('RB0', 'futures', 'weekly')
+        monthly = indicators.get_market_data('RB0', 'futures', 'monthly')
+
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(len(weekly), 80)
+        self.assertGreater(len(monthly), 17)
+        # 周线以当周最后一个交易日为时间戳
+        self.assertEqual(weekly.index[0], pd.Timestamp('2022-01-07'))
+
+    @patch('services.indicators._fetch_market_data')
+    def test_uncached_custom_period_fetches_base_once(self, mock_fetch):
+        mock_fetch.return_value = make_minute_bars(freq_min=60)
+
+        indicators.get_market_data('CU0', 'futures', '120')
+        indicators.get_market_data('CU0', 'futures', '240')
+
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(mock_fetch.call_args.args[2], '60')
+
+
+if __name__ == '__main__':
+    unittest.main()
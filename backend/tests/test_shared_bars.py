@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+import pandas as pd
+import numpy as np
+import sys
+import os
+import mmap
+import subprocess
+import pytest
+
+# Add backend directory to path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from services import bar_store, indicators, shared_bars
+from conftest import make_bars
+
+
+def is_mapped(arr) -> bool:
+    """数组是否直接引用内存映射的文件 (沿 base 链查找)"""
+    while arr is not None:
+        if isinstance(arr, (np.memmap, mmap.mmap)):
+            return True
+        arr = getattr(arr, 'base', None)
+    return False
+
+
+@pytest.mark.usefixtures("fresh_bar_store")
+class TestSharedBars(unittest.TestCase):
+    def setUp(self):
+        self.shared_dir = os.path.join(self.store_dir, 'shared')
+        self.patches = [
+            patch.object(indicators, 'BAR_STORE_ENABLED', True),
+            patch.object(indicators.bar_expiry, 'is_expired', return_value=False),
+            patch.object(shared_bars, 'SHARED_BAR_CACHE_ENABLED', True),
+            patch.object(shared_bars, 'SHARED_BAR_CACHE_DIR', self.shared_dir),
+        ]
+        for p in self.patches:
+            p.start()
+        shared_bars._mapped.clear()
+        self.key = bar_store.make_key('stock', '600000', 'daily')
+        bar_store.write_bars(self.key, make_bars(30), replace=True)
+        bar_store.set_coverage(self.key, None)
+
+    def tearDown(self):
+        shared_bars._mapped.clear()
+        for p in self.patches:
+            p.stop()
+
+    def test_window_is_a_view_of_the_mapped_series(self):
+        df = indicators.get_market_data('600000', 'stock', 'daily', start_date='2024-01-10', end_date='2024-01-20', warmup_bars=2)
+        self.assertEqual(df.index[0], pd.Timestamp('2024-01-08'))
+        self.assertEqual(df.index[-1], pd.Timestamp('2024-01-19'))
+
+        version = bar_store.get_version(self.key)
+        mapped = shared_bars.map_series(self.key, version)
+        self.assertTrue(is_mapped(mapped['close'].to_numpy()))
+        self.assertTrue(np.shares_memory(df['close'].to_numpy(), shared_bars._mapped[self.key][1]['close'].to_numpy()))
+
+        # 调用方的修改不影响共享数据
+        df['close'] = 0.0
+        again = indicators.get_market_data('600000', 'stock', 'daily')
+        self.assertEqual(again['close'].iloc[0], 100.0)
+        self.assertEqual(shared_bars.get_stats()["reused"], 1)
+
+    def test_other_process_maps_without_reading_the_store(self):
+        indicators.get_market_data('600000', 'stock', 'daily')
+        version = bar_store.get_version(self.key)
+        code = "\n".join([
+            "import mmap",
+            "from services import shared_bars",
+            "def loader(): raise RuntimeError('不应读取 K 线库')",
+            f"df = shared_bars.load_series({tuple(self.key)!r}, {version!r}, loader)",
+            "arr = df['close'].to_numpy()",
+            "while not isinstance(arr, mmap.mmap) and getattr(arr, 'base', None) is not None: arr = arr.base",
+            "print(len(df), df['close'].sum(), type(arr).__name__)",
+        ])
+        env = dict(os.environ, SHARED_BAR_CACHE='1', SHARED_BAR_CACHE_DIR=self.shared_dir)
+        out = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60)
+        self.assertEqual(out.returncode, 0, out.stderr)
+        self.assertEqual(out.stdout.split(), ['30', str(float(sum(100 + i for i in range(30)))), 'mmap'])
+
+    def test_new_version_replaces_old_files(self):
+        indicators.get_market_data('600000', 'stock', 'daily')
+        old_version = bar_store.get_version(self.key)
+        bar_store.write_bars(self.key, make_bars(31, base=200.0))
+        df = indicators.get_market_data('600000', 'stock', 'daily')
+        self.assertEqual(len(df), 31)
+        self.assertEqual(df['close'].iloc[-1], 230.0)
+        versions = os.listdir(shared_bars._series_dir(self.key))
+        self.assertEqual(versions, [str(bar_store.get_version(self.key))])
+        self.assertNotEqual(versions[0], str(old_version))
+
+
+if __name__ == '__main__':
+    unittest.main()
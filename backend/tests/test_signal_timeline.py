@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import indicators
+from services.frame_cache import FrameCache
+from services.indicators import calculate_dkx, calculate_ma, check_dkx_signal, check_ma_signal, signal_timeline
+from services.signal_timeline import SignalTimeline
+
+
+def make_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 + np.cumsum(rng.normal(0, 0.5, n)), 1)
+    index = pd.date_range('2024-01-02 09:31', periods=n, freq='min', name='date')
+    return pd.DataFrame({'open': close, 'high': close + 0.5, 'low': close - 0.5, 'close': close,
+                         'volume': rng.integers(1, 1000, n)}, index=index)
+
+
+class TestSignalTimeline(unittest.TestCase):
+    def setUp(self):
+        self.df = calculate_ma(calculate_dkx(make_bars(3000)), 5, 10)
+
+    def assert_same(self, actual, expected):
+        self.assertEqual(actual, expected)
+        for a, e in zip(actual, expected):
+            self.assertEqual([type(v) for v in a.values()], [type(v) for v in e.values()])
+
+    def test_queries_match_check_functions(self):
+        for check, fast, slow in ((check_dkx_signal, 'dkx', 'madkx'), (check_ma_signal, 'ma_short', 'ma_long')):
+            timeline = SignalTimeline(self.df, fast, slow)
+            self.assertGreater(len(timeline), 100)
+            for lookback in (0, 1, 5, 300, -20, 5000):
+                expected = check(self.df, lookback=lookback)
+                self.assert_same(timeline.query(lookback), expected)
+                self.assertEqual(timeline.latest(lookback), expected[-1] if expected else None)
+            for start, end in (('2024-01-03 10:00', '2024-01-03 18:30'), ('2024-01-01', '2024-01-02 12:00'),
+                               ('2030-01-01', '2030-01-02'), ('2024-01-02T03:00:00Z', '2024-01-02T05:00:00Z')):
+                self.assert_same(timeline.query(0, start, end), check(self.df, 0, start, end))
+            self.assertEqual(timeline.query(0, 'not a time', '2024-01-03'), [])
+
+    def test_in_rows_matches_time_range(self):
+        timeline = SignalTimeline(self.df, 'dkx', 'madkx')
+        for start, stop in ((0, 1000), (1200, 2100), (2999, 3000)):
+            c_start = self.df.index[start].strftime('%Y-%m-%d %H:%M:%S')
+            c_end = self.df.index[stop - 1].strftime('%Y-%m-%d %H:%M:%S')
+            self.assert_same(timeline.in_rows(start, stop), check_dkx_signal(self.df, 0, c_start, c_end))
+
+    def test_empty_indicator(self):
+        df = make_bars(10)
+        timeline = SignalTimeline(df, 'dkx', 'madkx')
+        self.assertEqual((len(timeline), timeline.query(0), timeline.latest(0)), (0, [], None))
+
+
+class TestSignalTimelineCache(unittest.TestCase):
+    def setUp(self):
+        self.patch = patch.object(indicators, 'indicator_frames', FrameCache("indicators", 1 << 24))
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def bars(self, version):
+        # 模拟 get_market_data 从 K 线库读取的数据 (带写入版本)
+        df = make_bars(2000)
+        df.attrs['series_version'] = (('stock', '600000', '1', 'qfq'), version)
+        return df
+
+    def test_shared_between_calls_on_same_series_version(self):
+        first = signal_timeline(calculate_dkx(self.bars(1)), 'dkx')
+        second = signal_timeline(calculate_dkx(self.bars(1)), 'dkx')
+        self.assertIs(first, second)
+        # 不同指标参数与不同版本各自构建
+        self.assertIsNot(signal_timeline(calculate_ma(self.bars(1), 5, 10), 'ma'),
+                         signal_timeline(calculate_ma(self.bars(1), 5, 20), 'ma'))
+        self.assertIsNot(signal_timeline(calculate_dkx(self.bars(2)), 'dkx'), first)
+        # 未经 K 线库的数据不缓存
+        self.assertIsNot(signal_timeline(calculate_dkx(make_bars(2000)), 'dkx'),
+                         signal_timeline(calculate_dkx(make_bars(2000)), 'dkx'))
+
+    def test_rebuilt_for_other_frames(self):
+        df = calculate_dkx(self.bars(1))
+        cached = signal_timeline(df, 'dkx')
+        # 切片沿用 attrs 中的缓存键，但与缓存的时间线不对应
+        tail = df.iloc[-500:]
+        timeline = signal_timeline(tail, 'dkx')
+        self.assertIsNot(timeline, cached)
+        self.assertEqual(timeline.query(0), check_dkx_signal(tail, lookback=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
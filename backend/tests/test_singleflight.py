@@ -0,0 +1,151 @@
+import unittest
+import asyncio
+import threading
+import time
+import sys
+import os
+from unittest.mock import patch
+
+import pandas as pd
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.singleflight import SingleFlight
+from services.fetch_scheduler import PriorityBoost, current_priority, fetch_priority
+from services import indicators
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_threaded_callers_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+        gate = threading.Event()
+
+        def slow_fetch():
+            calls.append(1)
+            gate.wait(2)
+            return "data"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow_fetch))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        gate.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([r[0] for r in results], ["data"] * 8)
+        self.assertTrue(all(r[1] for r in results))
+        self.assertEqual(flight.stats()["in_flight"], 0)
+
+    def test_errors_are_shared_and_key_released(self):
+        flight = SingleFlight()
+
+        def boom():
+            raise ValueError("upstream down")
+
+        with self.assertRaises(ValueError):
+            flight.do("k", boom)
+        # 失败后 key 被释放，下一次调用重新执行
+        self.assertEqual(flight.do("k", lambda: 1), (1, False))
+
+    def test_async_callers_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow_fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return 42
+
+        async def main():
+            return await asyncio.gather(*[flight.do_async("k", slow_fetch) for _ in range(5)])
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([r[0] for r in results], [42] * 5)
+
+    def test_cancelled_leader_does_not_cancel_waiters(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow_fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return 42
+
+        async def main():
+            leader = asyncio.ensure_future(flight.do_async("k", slow_fetch))
+            await asyncio.sleep(0.05)
+            waiter = asyncio.ensure_future(flight.do_async("k", slow_fetch))
+            await asyncio.sleep(0.05)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await waiter
+
+        self.assertEqual(asyncio.run(main()), (42, True))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats()["in_flight"], 0)
+
+    def test_higher_priority_waiter_boosts_leader(self):
+        flight = SingleFlight(boost_factory=PriorityBoost)
+        gate = threading.Event()
+        seen = []
+
+        def fetch():
+            gate.wait(2)
+            seen.append(current_priority())
+            return "data"
+
+        def backfill():
+            with fetch_priority('backfill'):
+                flight.do("k", fetch)
+
+        leader = threading.Thread(target=backfill)
+        leader.start()
+        time.sleep(0.05)
+        waiter = threading.Thread(target=lambda: flight.do("k", fetch))
+        waiter.start()
+        time.sleep(0.05)
+        gate.set()
+        leader.join(2)
+        waiter.join(2)
+        # 用户请求 (interactive) 合并后，在途获取按 interactive 领取令牌
+        self.assertEqual(seen, ['interactive'])
+
+    def test_distinct_keys_not_merged(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do("a", lambda: 1)[0], 1)
+        self.assertEqual(flight.do("b", lambda: 2)[0], 2)
+        self.assertEqual(flight.stats()["executions"], 2)
+
+
+class TestMarketDataCoalescing(unittest.TestCase):
+    @patch('services.indicators._load_market_data')
+    def test_concurrent_get_market_data_returns_independent_copies(self, mock_load):
+        df = pd.DataFrame({'close': [1.0, 2.0]}, index=pd.date_range('2024-01-01', periods=2))
+
+        def slow_load(*args):
+            time.sleep(0.2)
+            return df
+
+        mock_load.side_effect = slow_load
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(indicators.get_market_data('RB0', 'futures', '60'))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(mock_load.call_count, 1)
+        # 每个调用者拿到独立副本
+        results[0]['close'] = 0.0
+        self.assertEqual(results[1]['close'].tolist(), [1.0, 2.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import unittest
+from unittest.mock import patch
+import time
+import pandas as pd
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import source_registry as sr
+from services import indicators
+
+
+def make_daily_frame():
+    return pd.DataFrame({
+        '日期': ['2024-01-02', '2024-01-03'], '开盘': [1.0, 2.0], '收盘': [1.5, 2.5],
+        '最高': [2.0, 3.0], '最低': [0.5, 1.5], '成交量': [100, 200],
+    })
+
+
+class TestSourceRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = sr.SourceRegistry()
+
+    def test_circuit_opens_and_half_opens(self):
+        def boom():
+            raise ConnectionError('timeout')
+
+        for _ in range(sr.SOURCE_FAILURE_THRESHOLD):
+            with self.assertRaises(ConnectionError):
+                self.registry.call('em', boom)
+        self.assertEqual(self.registry.snapshot()['em']['circuit'], 'open')
+        with self.assertRaises(sr.SourceUnavailable):
+            self.registry.call('em', lambda: 1)
+
+        # 冷却期后放行一次试探调用，成功则恢复
+        with patch.object(sr, 'SOURCE_COOLDOWN', 0):
+            self.assertEqual(self.registry.call('em', lambda: 1), 1)
+        self.assertEqual(self.registry.snapshot()['em']['circuit'], 'closed')
+
+    def test_empty_results_leave_circuit_closed(self):
+        # 没有数据时链继续尝试下一个数据源，但不降级返回空结果的数据源
+        self.assertEqual(self.registry.run_chain([('a', lambda: ''), ('b', lambda: 'ok')], accept=bool), 'ok')
+        self.assertEqual(self.registry.order(['a', 'b']), ['a', 'b'])
+        # 空结果 (停牌、代码错误等) 不计入失败，也不会熔断
+        for _ in range(sr.SOURCE_FAILURE_THRESHOLD * 2):
+            with self.assertRaises(sr.SourceRejected):
+                self.registry.call('a', lambda: '', accept=bool)
+        snapshot = self.registry.snapshot()['a']
+        self.assertEqual((snapshot['failures'], snapshot['consecutive_failures'], snapshot['circuit']), (0, 0, 'closed'))
+
+    def test_chain_orders_by_health(self):
+        calls = []
+
+        def failing():
+            calls.append('a')
+            raise ConnectionError('down')
+
+        def healthy():
+            calls.append('b')
+            return 'ok'
+
+        chain = [('a', failing), ('b', healthy)]
+        self.assertEqual(self.registry.run_chain(chain), 'ok')
+        self.assertEqual(calls, ['a', 'b'])
+        # a 的成功率下降后排到 b 之后，不再每次先等待 a 失败
+        calls.clear()
+        self.assertEqual(self.registry.run_chain(chain), 'ok')
+        self.assertEqual(calls, ['b'])
+        self.assertEqual(self.registry.order(['a', 'b']), ['b', 'a'])
+
+
+class TestHedgedRequests(unittest.TestCase):
+    def setUp(self):
+        self.registry = sr.SourceRegistry()
+        self.patches = [
+            patch.object(sr, 'SOURCE_HEDGE_ENABLED', True),
+            patch.object(sr, 'SOURCE_HEDGE_DEFAULT_DELAY', 0.05),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_slow_primary_is_hedged(self):
+        def slow():
+            time.sleep(0.5)
+            return 'primary'
+
+        start = time.perf_counter()
+        result = self.registry.run_chain([('em', slow), ('tx', lambda: 'secondary')], hedge=True)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(result, 'secondary')
+        self.assertLess(elapsed, 0.3)
+        stats = self.registry.hedge_stats()
+        self.assertEqual(stats['fired'], 1)
+        self.assertEqual(stats['secondary_wins'], 1)
+        self.assertEqual(stats['fire_rate'], 1.0)
+        # 主数据源的请求已在执行，无法取消
+        self.assertEqual(stats['cancelled'], 0)
+
+    def test_fast_primary_does_not_fire(self):
+        calls = []
+
+        def secondary():
+            calls.append(1)
+            return 'secondary'
+
+        result = self.registry.run_chain([('em', lambda: 'primary'), ('tx', secondary)], hedge=True)
+        self.assertEqual(result, 'primary')
+        self.assertEqual(calls, [])
+        stats = self.registry.hedge_stats()
+        self.assertEqual((stats['requests'], stats['fired'], stats['primary_wins']), (1, 0, 0))
+
+    def test_invalid_first_response_does_not_win(self):
+        def empty_fast():
+            return ''
+
+        def slow_valid():
+            time.sleep(0.1)
+            return 'ok'
+
+        result = self.registry.run_chain([('em', slow_valid), ('tx', empty_fast)], accept=bool, hedge=True)
+        self.assertEqual(result, 'ok')
+
+
+class TestFetchFailover(unittest.TestCase):
+    def setUp(self):
+        sr.registry.reset()
+
+    def tearDown(self):
+        sr.registry.reset()
+
+    def test_outage_latency_falls_back_to_healthy_source(self):
+        em_calls = []
+
+        def slow_down(**kwargs):
+            em_calls.append(1)
+            time.sleep(0.05)
+            raise ConnectionError('em timeout')
+
+        with patch.object(indicators.provider, 'stock_zh_a_hist', side_effect=slow_down), \
+             patch.object(indicators.provider, 'stock_zh_a_hist_tx', return_value=make_daily_frame()):
+            for _ in range(5):
+                df = indicators._fetch_market_data('600000', 'stock', 'daily')
+                self.assertEqual(len(df), 2)
+            start = time.perf_counter()
+            indicators._fetch_market_data('600000', 'stock', 'daily')
+            elapsed = time.perf_counter() - start
+
+        # 东方财富连续失败后被降级/熔断，之后的请求直接走腾讯接口
+        self.assertLessEqual(len(em_calls), sr.SOURCE_FAILURE_THRESHOLD)
+        self.assertLess(elapsed, 0.05)
+        health = sr.registry.snapshot()
+        self.assertEqual(health['tx_hist']['failures'], 0)
+        self.assertLess(health['em_hist']['success_rate'], sr.SOURCE_HEALTHY_RATE)
+
+    def test_empty_minute_response_is_not_retried(self):
+        with patch.object(indicators.provider, 'stock_zh_a_hist_min_em', return_value=pd.DataFrame()) as em, \
+             patch.object(indicators.time, 'sleep') as sleep:
+            self.assertTrue(indicators._fetch_market_data('600000', 'stock', '5').empty)
+        self.assertEqual(em.call_count, 1)
+        sleep.assert_not_called()
+        health = sr.registry.snapshot()['em_minute']
+        self.assertEqual((health['consecutive_failures'], health['circuit']), (0, 'closed'))
+
+    def test_stock_weekly_not_fetched_natively(self):
+        # 股票周线/月线由日线派生，不再单独请求东方财富周线接口
+        with patch.object(indicators.provider, 'stock_zh_a_hist', return_value=make_daily_frame()) as em:
+            self.assertTrue(indicators._fetch_market_data('600000', 'stock', 'weekly').empty)
+        em.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch
+import pytest
+import sys
+import os
+import threading
+import time
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import bar_store
+from services import indicators
+from conftest import make_bars
+
+
+@pytest.mark.usefixtures("fresh_bar_store")
+class TestStaleWhileRevalidate(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            patch.object(indicators, 'BAR_STORE_ENABLED', True),
+            patch.object(indicators, 'MARKET_DATA_SWR', True),
+            patch.object(indicators, 'MARKET_DATA_MAX_STALENESS', 60.0),
+            patch.object(indicators.bar_expiry, 'is_expired', return_value=True),
+        ]
+        for p in self.patches:
+            p.start()
+        self.key = bar_store.make_key('stock', '600000', 'daily')
+        bar_store.write_bars(self.key, make_bars(10), replace=True)
+        bar_store.set_coverage(self.key, None)
+        # 数据源返回的补齐数据: 覆盖最后一根并新增一根
+        self.fresh = make_bars(2, '2024-01-15', base=109.0)
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def wait_revalidated(self):
+        deadline = time.time() + 5
+        while indicators._revalidating and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(indicators._revalidating)
+
+    def test_stale_served_immediately_and_refreshed_in_background(self):
+        release = threading.Event()
+
+        def slow_fetch(*args, **kwargs):
+            release.wait(5)
+            return self.fresh
+
+        with patch.object(indicators.bar_expiry, 'expires_at', return_value=time.time() - 10), \
+             patch.object(indicators, '_fetch_market_data', side_effect=slow_fetch) as fetch:
+            df = indicators.get_market_data('600000', 'stock', 'daily')
+            # 不等待数据源，直接返回库中数据并上报过期时长
+            self.assertEqual(len(df), 10)
+            self.assertGreaterEqual(df.attrs['data_age'], 10)
+            self.assertLess(df.attrs['data_age'], 60)
+
+            # 刷新进行中时再次请求不会重复提交
+            indicators.get_market_data('600000', 'stock', 'daily')
+            release.set()
+            self.wait_revalidated()
+            self.assertEqual(fetch.call_count, 1)
+
+        self.assertEqual(bar_store.get_last_timestamp(self.key), self.fresh.index[-1])
+
+    def test_too_stale_waits_for_fresh_data(self):
+        with patch.object(indicators.bar_expiry, 'expires_at', return_value=time.time() - 600), \
+             patch.object(indicators, '_fetch_market_data', return_value=self.fresh) as fetch:
+            df = indicators.get_market_data('600000', 'stock', 'daily')
+        fetch.assert_called_once()
+        self.assertEqual(len(df), 11)
+        self.assertEqual(df.attrs['data_age'], 0.0)
+
+    def test_disabled_refreshes_synchronously(self):
+        with patch.object(indicators, 'MARKET_DATA_SWR', False), \
+             patch.object(indicators.bar_expiry, 'expires_at', return_value=time.time() - 10), \
+             patch.object(indicators, '_fetch_market_data', return_value=self.fresh):
+            df = indicators.get_market_data('600000', 'stock', 'daily')
+        self.assertEqual(len(df), 11)
+        self.assertEqual(df.attrs['data_age'], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+from unittest.mock import patch
+from datetime import datetime
+import pandas as pd
+import numpy as np
+import sys
+import os
+import pytest
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import bar_store, live_updater
+from services.indicators import calculate_dkx, check_dkx_signal, calculate_ma, check_ma_signal
+from services.streaming_indicators import StreamingDKX, StreamingMA
+
+
+def make_bars(n, seed=0, start='2024-01-02 09:31', freq='min'):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    index = pd.date_range(start, periods=n, freq=freq, name='date')
+    return pd.DataFrame({'open': close + rng.normal(0, 0.3, n), 'high': close + 1, 'low': close - 1,
+                         'close': close, 'volume': 100.0}, index=index)
+
+
+class TestStreamingDKX(unittest.TestCase):
+    def setUp(self):
+        self.df = make_bars(1500)
+        self.expected = calculate_dkx(self.df.copy())
+
+    def test_matches_full_calculation_exactly(self):
+        stream = StreamingDKX()
+        dkx, madkx, signals = [], [], []
+        for ts, row in zip(self.df.index, self.df.itertuples()):
+            # 先以形成中的价格写入，再改写为收盘后的价格
+            stream.update(ts, row.open, row.high + 2, row.low, row.close + 1)
+            event = stream.update(ts, row.open, row.high, row.low, row.close)
+            self.assertTrue(event['revised'])
+            dkx.append(event['dkx'])
+            madkx.append(event['madkx'])
+            if event['signal']:
+                signals.append((ts.strftime('%Y-%m-%d %H:%M:%S'), event['signal']))
+        np.testing.assert_array_equal(np.array(dkx), self.expected['dkx'].to_numpy())
+        np.testing.assert_array_equal(np.array(madkx), self.expected['madkx'].to_numpy())
+        expected_signals = [(s['date'], s['signal']) for s in check_dkx_signal(self.expected, lookback=0)]
+        self.assertEqual(signals, expected_signals)
+
+    def test_seed_from_frame_then_append(self):
+        stream = StreamingDKX.from_frame(self.df.iloc[:1000])
+        self.assertEqual(stream.last_time, self.df.index[999])
+        self.assertEqual(stream.madkx, self.expected['madkx'].iloc[999])
+        for i in range(1000, 1100):
+            row = self.df.iloc[i]
+            event = stream.update(self.df.index[i], row['open'], row['high'], row['low'], row['close'])
+            self.assertFalse(event['revised'])
+            self.assertEqual((event['dkx'], event['madkx']),
+                             (self.expected['dkx'].iloc[i], self.expected['madkx'].iloc[i]))
+        with self.assertRaises(ValueError):
+            stream.update(self.df.index[0], 1.0, 1.0, 1.0, 1.0)
+
+
+class TestStreamingMA(unittest.TestCase):
+    def test_crosses_match_check_ma_signal(self):
+        # 价格取到 0.1 元，两条均线经常相等，交叉判断对舍入误差最敏感
+        df = make_bars(6000, seed=3)
+        df['close'] = df['close'].round(1)
+        pairs = [(5, 10), (10, 60)]
+        stream = StreamingMA(pairs, reanchor_every=500)
+        signals = {pair: [] for pair in pairs}
+        ma10 = []
+        for ts, close in zip(df.index, df['close'].to_numpy()):
+            stream.update(ts, close, close + 0.3, close, close + 0.3)
+            event = stream.update(ts, close, close, close, close)
+            ma10.append(event['ma'][10])
+            for pair, signal in event['signals'].items():
+                signals[pair].append((ts.strftime('%Y-%m-%d %H:%M:%S'), signal))
+
+        ties = 0
+        for short, long in pairs:
+            full = calculate_ma(df.copy(), short, long)
+            expected = [(s['date'], s['signal']) for s in check_ma_signal(full, lookback=0)]
+            self.assertGreater(len(expected), 100)
+            # 包括两条均线数学上相等的 K 线 (按窗口内的值精确比较，见 indicator_kernels.resolve_ma_ties)
+            self.assertEqual(signals[(short, long)], expected)
+            ties += int((full['ma_short'] == full['ma_long']).sum())
+        self.assertGreater(ties, 10)
+        np.testing.assert_allclose(ma10, calculate_ma(df.copy(), 5, 10)['ma_long'].to_numpy(), rtol=1e-12)
+
+    def test_constructed_tie(self):
+        # 最后 10 根中前 5 根与后 5 根之和相等 (37.1)，MA5 与 MA10 在数学上相等，
+        # 但 rolling().mean() 的结果相差 1 ulp (与序列起点有关)，按窗口重新求和后两者相等、不构成交叉
+        closes = [6.0, 4.4, 0.4, 10.5, 10.1, 5.2, 10.9, 6.0, 6.5, 11.0, 5.0, 8.6, 12.0, 3.0]
+        tie = 11
+        index = pd.date_range('2024-01-02', periods=len(closes), freq='D', name='date')
+        df = pd.DataFrame({'open': closes, 'high': closes, 'low': closes, 'close': closes}, index=index)
+        raw = df['close'].rolling(5).mean().iloc[tie] - df['close'].rolling(10).mean().iloc[tie]
+        self.assertNotEqual(raw, 0.0)
+
+        for start in (0, 1, 2):
+            full = calculate_ma(df.iloc[start:].copy(), 5, 10)
+            self.assertEqual(full['ma_short'].iloc[tie - start], full['ma_long'].iloc[tie - start])
+            self.assertEqual(full['ma_short'].iloc[tie - start], 7.42)
+
+        stream = StreamingMA([(5, 10)])
+        streamed = []
+        for ts, close in zip(index, closes):
+            event = stream.update(ts, close, close, close, close)
+            streamed.extend((ts.strftime('%Y-%m-%d %H:%M:%S'), s) for s in event['signals'].values())
+            if ts == index[tie]:
+                self.assertEqual(stream._ma[-1][1][(5, 10)], (7.42, 7.42))
+        full = calculate_ma(df.copy(), 5, 10)
+        self.assertEqual(streamed, [(s['date'], s['signal']) for s in check_ma_signal(full, lookback=0)])
+
+    def test_seed_nan_and_validation(self):
+        df = make_bars(100)
+        df.iloc[80, df.columns.get_loc('close')] = np.nan
+        stream = StreamingMA.from_frame(df.iloc[:85], [(3, 5)])
+        self.assertEqual(stream.last_time, df.index[84])
+        self.assertTrue(np.isnan(stream.ma(5)))
+        row = df.iloc[85]
+        event = stream.update(df.index[85], row['open'], row['high'], row['low'], row['close'])
+        self.assertAlmostEqual(event['ma'][5], df['close'].iloc[81:86].mean(), places=9)
+        with self.assertRaises(ValueError):
+            StreamingMA([(0, 5)])
+
+
+@pytest.mark.usefixtures("fresh_bar_store")
+class TestLiveSignalStreams(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            patch.object(live_updater, 'LIVE_DKX_STREAMS', True),
+            patch.object(live_updater, 'LIVE_MA_PAIRS', [(5, 10)]),
+        ]
+        for p in self.patches:
+            p.start()
+        live_updater._last_volume.clear()
+        live_updater._streams.clear()
+        live_updater._signal_events.clear()
+        live_updater._last_signal.clear()
+        # 持续下跌的日线，DKX 位于 MADKX 下方
+        index = pd.DatetimeIndex(pd.bdate_range('2023-11-01', periods=48), name='date')
+        close = np.linspace(20.0, 10.0, len(index))
+        self.key = bar_store.make_key('stock', '600000', 'daily')
+        bar_store.write_bars(self.key, pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close,
+                                                     'volume': 1000.0}, index=index))
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def snapshot(self, last, now):
+        spot = pd.DataFrame([{'代码': '600000', '名称': '浦发银行', '最新价': last, '今开': 10.0,
+                              '最高': max(last, 10.0), '最低': 10.0, '成交量': 5000}])
+        return live_updater.apply_snapshot(spot, now)
+
+    def test_cross_event_recorded_once_per_bar(self):
+        self.snapshot(30.0, datetime(2024, 1, 9, 9, 40))
+        self.snapshot(31.0, datetime(2024, 1, 9, 10, 0))
+        events = live_updater.get_signal_events()
+        self.assertEqual([(e['indicator'], e['symbol'], e['time'], e['signal']) for e in events],
+                         [('dkx', '600000', '2024-01-09 00:00:00', 'BUY'), ('ma', '600000', '2024-01-09 00:00:00', 'BUY')])
+        self.assertEqual((events[1]['short'], events[1]['long']), (5, 10))
+
+        # 增量结果与按库中全部 K 线重新计算一致
+        expected = calculate_dkx(bar_store.read_bars(self.key))
+        stream = live_updater._streams[('dkx', self.key)]
+        self.assertEqual((stream.dkx, stream.madkx), (expected['dkx'].iloc[-1], expected['madkx'].iloc[-1]))
+        self.assertEqual(live_updater.get_signal_events(since=events[-1]['at']), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import time_index
+from services.period_derivation import trim_to_window
+
+
+class TestTimeIndex(unittest.TestCase):
+    def setUp(self):
+        # pandas 3 的 date_range 默认为微秒精度，覆盖非纳秒单位的索引
+        self.index = pd.date_range('2024-01-02 09:31', periods=10, freq='min', name='date')
+
+    def test_window_on_naive_index(self):
+        self.assertEqual(time_index.window(self.index, '2024-01-02 09:33', '2024-01-02 09:35'), (2, 5))
+        self.assertEqual(time_index.window(self.index, '2024-01-02 09:33', None, warmup_bars=5), (0, 10))
+        self.assertEqual(time_index.window(self.index.as_unit('ns'), '2024-01-02 09:32:30', '2024-01-02 09:33'), (2, 3))
+        # 带时区的边界按上海时间对齐
+        self.assertEqual(time_index.window(self.index, '2024-01-02T01:33:00Z', '2024-01-02T01:35:00+00:00'), (2, 5))
+
+    def test_window_on_aware_index(self):
+        aware = self.index.tz_localize('Asia/Shanghai')
+        self.assertEqual(time_index.window(aware, '2024-01-02 09:33', '2024-01-02 09:35'), (2, 5))
+        self.assertEqual(time_index.window(aware, '2024-01-02T01:33:00Z', '2024-01-02T01:35:00Z'), (2, 5))
+
+    def test_cross_window_extends_one_bar_back(self):
+        self.assertEqual(time_index.cross_window(self.index, '2024-01-02 09:33', '2024-01-02 09:35'), (1, 2, 5))
+        self.assertEqual(time_index.cross_window(self.index, '2024-01-02 09:00', '2024-01-02 09:31'), (0, 0, 1))
+        self.assertIsNone(time_index.cross_window(self.index, '2024-01-02 09:35:30', '2024-01-02 09:35:50'))
+
+    def test_bounds_parsed_once_per_index_tz(self):
+        time_index._bound_value.cache_clear()
+        aware = self.index.tz_localize('Asia/Shanghai')
+        for _ in range(3):
+            time_index.search(self.index, '2024-01-02 09:33')
+            time_index.search(aware, '2024-01-02 09:33')
+        info = time_index._bound_value.cache_info()
+        self.assertEqual((info.misses, info.hits), (2, 4))
+        self.assertEqual(time_index.search(aware, '2024-01-02 09:33'), 2)
+
+    def test_format_times(self):
+        expected = [ts.strftime('%Y-%m-%d %H:%M:%S') for ts in self.index]
+        self.assertEqual(list(time_index.format_times(self.index)), expected)
+        minutes = time_index.format_times(self.index.tz_localize('Asia/Shanghai').tz_convert('UTC'), 'm')
+        self.assertEqual(minutes[0], '2024-01-02 09:31')
+        self.assertIsInstance(minutes[0], str)
+        self.assertEqual(len(time_index.format_times(self.index[:0])), 0)
+
+    def test_trim_to_window_keeps_warmup(self):
+        df = pd.DataFrame({'close': np.arange(10.0)}, index=self.index)
+        out = trim_to_window(df, pd.Timestamp('2024-01-02 09:35'), pd.Timestamp('2024-01-02 09:37'), warmup_bars=2)
+        self.assertEqual(out['close'].tolist(), [2.0, 3.0, 4.0, 5.0, 6.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import threading
+import time
+import pandas as pd
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from main import app
+from services import warmup
+
+
+class TestWarmup(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        self.saved = warmup.get_progress()
+        self.patches = [
+            patch.object(warmup, 'WARMUP_UNIVERSES', ['hot', 'hs300']),
+            patch.object(warmup, 'WARMUP_FUTURES_PERIODS', ['daily', '60']),
+            patch.object(warmup, 'WARMUP_STOCK_PERIODS', ['daily']),
+            patch.object(warmup, 'WARMUP_CONCURRENCY', 3),
+            patch.object(warmup, 'get_default_hot_symbols', return_value=['RB0', 'CU0']),
+            patch.object(warmup, 'get_hs300_list', return_value=[{'value': '600000', 'label': ''}, {'value': '000001', 'label': ''}]),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        warmup._progress.clear()
+        warmup._progress.update(self.saved)
+
+    def test_build_tasks(self):
+        tasks = warmup.build_tasks()
+        self.assertEqual(len(tasks), 6)
+        self.assertIn(('RB0', 'futures', '60'), tasks)
+        self.assertIn(('000001', 'stock', 'daily'), tasks)
+
+    def test_run_warmup_bounded_and_reports_progress(self):
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def fake_get(symbol, market, period):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.05)
+            with lock:
+                state['active'] -= 1
+            if symbol == 'CU0':
+                raise RuntimeError('source down')
+            return pd.DataFrame({'close': [1.0]})
+
+        warmup._update(ready=False, status='idle')
+        self.assertEqual(self.client.get('/api/ready').status_code, 503)
+
+        with patch.object(warmup, 'get_market_data', side_effect=fake_get):
+            progress = asyncio.run(warmup.run_warmup())
+
+        self.assertLessEqual(state['peak'], 3)
+        self.assertEqual(progress['total'], 6)
+        self.assertEqual(progress['done'], 6)
+        self.assertEqual(progress['failed'], 2)
+        self.assertTrue(progress['ready'])
+
+        resp = self.client.get('/api/ready')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.client.get('/api/warmup').json()['status'], 'done')
+
+
+if __name__ == '__main__':
+    unittest.main()